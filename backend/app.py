@@ -7,6 +7,7 @@ from flask import Flask, send_from_directory
 from flask_cors import CORS
 
 from config import config
+from models.models import init_database
 from routes.auth import auth_bp
 from routes.student import student_bp
 from routes.teacher import teacher_bp
@@ -20,6 +21,9 @@ def create_app(config_name='default'):
     # 加载配置
     app.config.from_object(config[config_name])
     
+    # 初始化数据库
+    init_database(app.config)
+    
     # 启用 CORS
     CORS(app, supports_credentials=True)
     
@@ -52,7 +56,7 @@ def create_app(config_name='default'):
 
 
 if __name__ == '__main__':
-    app = create_app('development')
+    app = create_app(os.environ.get('APP_CONFIG', 'development'))
     print('=' * 50)
     print('学生教务管理系统')
     print('=' * 50)
@@ -0,0 +1,134 @@
+"""
+成绩分析基准：全校加权平均绩点与班级、专业排名，比较向量化计算与逐条计算
+
+用法（在 backend 目录下）：
+    python -m benchmarks.analytics [--scale 1] [--updates 1000]
+
+先按规模系数生成合成数据，记录 GradeAnalytics 全量建立列数组与一次计算（全部学期、单个学期）的耗时，
+以及按原先 get_grades 的方式逐个学生计算平均绩点的耗时；再修改 updates 条成绩、删除一批选课、修改一门课的学分，
+记录增量维护与重新计算的耗时。每一步都与逐条计算的全校绩点与名次核对，不一致时以退出码 1 结束。
+"""
+
+import argparse
+import random
+import sys
+import time
+
+
+def naive(database, semester=None):
+    """逐条计算：每名学生的 (加权平均绩点, 学分)，以及按班级、专业排序得出的名次"""
+    selections = {s['id']: s for s in database.course_selections}
+    schedules = {s['id']: s for s in database.schedules}
+    credits = {c['id']: c['credit'] or 0 for c in database.courses}
+    points, totals = {}, {}
+    for grade in database.grades:
+        selection = selections.get(grade['selection_id'])
+        schedule = schedules.get(selection['schedule_id']) if selection else None
+        if schedule is None or (semester is not None and schedule['semester'] != semester):
+            continue
+        credit = credits.get(schedule['course_id'], 0)
+        student_id = selection['student_id']
+        points[student_id] = points.get(student_id, 0) + credit * grade['gpa']
+        totals[student_id] = totals.get(student_id, 0) + credit
+    gpa = {sid: round(points[sid] / total, 9) for sid, total in totals.items() if total > 0}
+    ranks = {}
+    for by, field in (('class', 'class_name'), ('major', 'major')):
+        groups = {}
+        for student in database.students:
+            if student['id'] in gpa:
+                groups.setdefault(student[field] or '', []).append(gpa[student['id']])
+        for values in groups.values():
+            values.sort(reverse=True)
+        for student in database.students:
+            if student['id'] in gpa:
+                values = groups[student[field] or '']
+                ranks[student['id'], by] = values.index(gpa[student['id']]) + 1
+    return gpa, ranks
+
+
+def verify(database, cohorts, semester=None):
+    """与逐条计算核对全部学生的绩点与名次，返回不一致的学生数"""
+    gpa, ranks = naive(database, semester)
+    mismatches = 0
+    for student in database.students:
+        result = cohorts.student(student['id'])
+        expected = gpa.get(student['id'])
+        if expected is None:
+            mismatches += result['class']['rank'] is not None
+            continue
+        mismatches += (abs(result['gpa'] - expected) > 0.005 + 1e-9
+                       or result['class']['rank'] != ranks[student['id'], 'class']
+                       or result['major']['rank'] != ranks[student['id'], 'major'])
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description='成绩分析基准')
+    parser.add_argument('--scale', type=float, default=1.0)
+    parser.add_argument('--updates', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=2024)
+    args = parser.parse_args()
+
+    from models.grading import score_to_gpa
+    from models.models import MockDatabase
+    from models.synthetic import populate
+
+    database = MockDatabase()
+    populate(database, scale=args.scale, seed=args.seed)
+    analytics = database.grade_analytics
+    rng = random.Random(args.seed)
+    semester = database.schedules.all()[0]['semester']
+
+    def timed(action):
+        started = time.perf_counter()
+        value = action()
+        return value, time.perf_counter() - started
+
+    _, build = timed(analytics.rebuild)
+    cohorts, compute_all = timed(analytics.result)
+    semester_cohorts, compute_term = timed(lambda: analytics.result(semester))
+    _, cached = timed(analytics.result)
+    print(f"规模 {args.scale}  学生 {len(database.students):,}  成绩 {len(database.grades):,}  "
+          f"班级 {len(cohorts.cohorts('class'))}  专业 {len(cohorts.cohorts('major'))}")
+    print(f"  建立列数组 {build:.2f} s；计算全部学期 {compute_all * 1000:.0f} ms，"
+          f"{semester} {compute_term * 1000:.0f} ms；未变化时读取 {cached * 1e6:.0f} µs")
+
+    sample = rng.sample(database.students.all(), min(200, len(database.students)))
+    _, per_student = timed(lambda: [database.get_grades_by_student(s['id']) for s in sample])
+    _, lookup = timed(lambda: [cohorts.student(s['id']) for s in sample])
+    print(f"  单个学生：逐条汇总成绩 {per_student / len(sample) * 1000:.2f} ms，读取计算结果 {lookup / len(sample) * 1e6:.0f} µs")
+
+    mismatches = verify(database, cohorts) + verify(database, semester_cohorts, semester)
+
+    grades = rng.sample(database.grades.all(), min(args.updates, len(database.grades)))
+
+    def update():
+        for grade in grades:
+            score = rng.randint(40, 100)
+            database.grades.update(grade['id'], {'score': score, 'gpa': score_to_gpa(score)})
+
+    _, elapsed = timed(update)
+    cohorts, compute = timed(analytics.result)
+    print(f"  修改 {len(grades):,} 条成绩：维护 {elapsed * 1000:.0f} ms，重新计算 {compute * 1000:.0f} ms")
+    mismatches += verify(database, cohorts)
+
+    graded = {g['selection_id'] for g in rng.sample(database.grades.all(), 100)}
+    _, elapsed = timed(lambda: [database.course_selections.delete(sid) for sid in graded])
+    cohorts, compute = timed(analytics.result)
+    print(f"  删除 {len(graded)} 条有成绩的选课：维护 {elapsed * 1000:.0f} ms，重新计算 {compute * 1000:.0f} ms")
+    mismatches += verify(database, cohorts)
+
+    course = database.courses.all()[0]
+    _, elapsed = timed(lambda: database.courses.update(course['id'], {'credit': (course['credit'] or 0) + 1}))
+    cohorts, compute = timed(analytics.result)
+    print(f"  修改一门课的学分：维护 {elapsed * 1000:.2f} ms，重新推导并计算 {compute * 1000:.0f} ms")
+    mismatches += verify(database, cohorts)
+
+    if mismatches:
+        print(f'  ✗ 与逐条计算不一致 {mismatches} 人次', file=sys.stderr)
+        sys.exit(1)
+    print('  ✓ 全部学生的绩点与班级、专业名次与逐条计算一致')
+
+
+if __name__ == '__main__':
+    main()
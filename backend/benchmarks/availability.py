@@ -0,0 +1,160 @@
+"""
+空闲教室查询基准：在合成数据上比较占用索引与逐行扫描
+
+用法（在 backend 目录下）：
+    python -m benchmarks.availability [--scale 1] [--queries 500]
+
+先按规模系数生成合成数据，在随机日期（学期内与考试周）与随机时段上查询全校空闲教室，
+分别用 RoomAvailability 与扫描全部排课、考试、已批准借用的朴素实现计时；
+随后批准一批借用申请（经索引检查冲突，再由变更通知增量更新索引），重新比较两者的结果；
+最后改动一批排课的教室与上课时间、考试的教室，把一批已批准的借用改为拒绝，核对原先占用的时段都已空出。
+结果不一致或旧时段仍被占用时以退出码 1 结束。
+"""
+
+import argparse
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+
+def scan_free(database, day, start_time, end_time):
+    """朴素实现：逐行扫描全部排课、考试与已批准的借用"""
+    from models.availability import query_spans
+    from models.exams import exam_span
+    from models.invigilation import teaching_span
+
+    span, _ = query_spans(day, start_time, end_time)
+
+    def overlaps(other):
+        return other is not None and other[0] < span[1] and span[0] < other[1]
+
+    busy_rooms = {schedule['classroom'] for schedule in database.schedules
+                  if overlaps(teaching_span(schedule, day))}
+    busy_rooms.update(exam['classroom'] for exam in database.exam_arrangements if overlaps(exam_span(exam)))
+    busy_ids = {borrow['classroom_id'] for borrow in database.classroom_borrow_records
+                if borrow['status'] == 'approved' and overlaps(exam_span(borrow))}
+    return [room['id'] for room in database.classrooms
+            if room['room_no'] not in busy_rooms and room['id'] not in busy_ids]
+
+
+def first_class(schedule):
+    """排课第一次上课的日期与时段 (day, start_time, end_time)，无法确定时返回 None"""
+    from models.timetable import period_span
+    from models.weeks import parse_weeks, semester_start
+
+    start, span = semester_start(schedule['semester']), period_span(schedule['start_period'], schedule['end_period'])
+    try:
+        week = min(parse_weeks(schedule['weeks']))
+    except (TypeError, ValueError):
+        return None
+    if start is None or span is None:
+        return None
+    day = start + timedelta(weeks=week - 1, days=int(schedule['weekday']) - 1)
+    return day.isoformat(), *(f'{minutes // 60:02d}:{minutes % 60:02d}' for minutes in span)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='空闲教室查询基准')
+    parser.add_argument('--scale', type=float, default=1.0)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=2024)
+    args = parser.parse_args()
+
+    from models.exams import EXAM_TIMES
+    from models.models import MockDatabase
+    from models.synthetic import populate
+    from models.timetable import PERIOD_TIMES
+
+    database = MockDatabase()
+    populate(database, scale=args.scale, seed=args.seed)
+    started = time.perf_counter()
+    database.room_availability.rebuild()
+    build_seconds = time.perf_counter() - started
+
+    rng = random.Random(args.seed)
+    windows = [(PERIOD_TIMES[i][0], PERIOD_TIMES[j][1]) for i in range(len(PERIOD_TIMES))
+               for j in range(i, min(i + 4, len(PERIOD_TIMES)))] + list(EXAM_TIMES)
+    first = date(2024, 9, 2)
+    queries = [((first + timedelta(days=rng.randrange(140))).isoformat(), *rng.choice(windows))
+               for _ in range(args.queries)]
+
+    def compare(label):
+        indexed, scanned, mismatches = [], [], 0
+        for day, start_time, end_time in queries:
+            begin = time.perf_counter()
+            free = [room['id'] for room in database.find_free_classrooms(day, start_time, end_time)]
+            indexed.append(time.perf_counter() - begin)
+        for day, start_time, end_time in queries[:max(1, len(queries) // 10)]:
+            begin = time.perf_counter()
+            expected = scan_free(database, day, start_time, end_time)
+            scanned.append(time.perf_counter() - begin)
+            free = [room['id'] for room in database.find_free_classrooms(day, start_time, end_time)]
+            mismatches += free != expected
+        indexed.sort()
+        print(f"  {label}：索引查询 p50 {indexed[len(indexed) // 2] * 1000:.2f} ms，"
+              f"p99 {indexed[int(len(indexed) * 0.99)] * 1000:.2f} ms；"
+              f"逐行扫描平均 {sum(scanned) / len(scanned) * 1000:.1f} ms；抽查 {len(scanned)} 次，不一致 {mismatches} 次")
+        return mismatches
+
+    print(f"规模 {args.scale}  教室 {len(database.classrooms):,}  排课 {len(database.schedules):,}  "
+          f"考试 {len(database.exam_arrangements):,}  借用 {len(database.classroom_borrow_records):,}  "
+          f"建索引 {build_seconds:.2f} s")
+    mismatches = compare('初始')
+
+    approved = rejected = 0
+    begin = time.perf_counter()
+    for record in database.classroom_borrow_records.all():
+        if record['status'] != 'pending':
+            continue
+        if database.find_room_conflicts(record['classroom_id'], record['date'], record['start_time'],
+                                        record['end_time'], exclude_borrow_id=record['id']):
+            rejected += 1
+            continue
+        database.classroom_borrow_records.update(record['id'], {'status': 'approved'})
+        approved += 1
+    elapsed = time.perf_counter() - begin
+    print(f"  审批 {approved + rejected:,} 个借用申请 {elapsed * 1000:.0f} ms：批准 {approved:,}，因冲突拒绝 {rejected:,}")
+    queries.extend((record['date'], record['start_time'], record['end_time'])
+                   for record in rng.sample(database.classroom_borrow_records.all(),
+                                            min(50, len(database.classroom_borrow_records))))
+    mismatches += compare('审批后')
+
+    # 改动后原先的占用必须从索引中移除：(种类, 行 id, 原教室 id, 日期, 开始, 结束)
+    room_ids = {room['room_no']: room['id'] for room in database.classrooms}
+    room_nos = list(room_ids)
+    vacated = []
+    for schedule in rng.sample(database.schedules.all(), min(50, len(database.schedules))):
+        slot = first_class(schedule)
+        if slot is None or schedule['classroom'] not in room_ids:
+            continue
+        vacated.append(('teaching', schedule['id'], room_ids[schedule['classroom']], *slot))
+        database.schedules.update(schedule['id'], {
+            'classroom': rng.choice([room for room in room_nos if room != schedule['classroom']]),
+            'weekday': int(schedule['weekday']) % 7 + 1})
+    for exam in rng.sample(database.exam_arrangements.all(), min(50, len(database.exam_arrangements))):
+        if exam['classroom'] in room_ids:
+            vacated.append(('exam', exam['id'], room_ids[exam['classroom']],
+                            exam['date'], exam['start_time'], exam['end_time']))
+            database.exam_arrangements.update(exam['id'], {
+                'classroom': rng.choice([room for room in room_nos if room != exam['classroom']])})
+    lent = [record for record in database.classroom_borrow_records if record['status'] == 'approved']
+    for record in rng.sample(lent, min(50, len(lent))):
+        vacated.append(('borrow', record['id'], record['classroom_id'],
+                        record['date'], record['start_time'], record['end_time']))
+        database.classroom_borrow_records.update(record['id'], {'status': 'rejected'})
+    stale = sum(any(clash['kind'] == kind and clash['row']['id'] == row_id
+                    for clash in database.find_room_conflicts(room_id, day, start_time, end_time))
+                for kind, row_id, room_id, day, start_time, end_time in vacated)
+    print(f"  改动 {len(vacated)} 项排课、考试与借用后，原时段仍被占用 {stale} 项")
+    queries.extend(slot[3:] for slot in vacated)
+    mismatches += stale + compare('改动后')
+
+    if mismatches:
+        print(f'  ✗ 索引与逐行扫描的结果不一致 {mismatches} 次', file=sys.stderr)
+        sys.exit(1)
+    print('  ✓ 索引与逐行扫描的结果一致')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,515 @@
+"""
+接口基准：通过 Flask 测试客户端逐个调用 auth / student / teacher / admin 蓝图的全部路由
+
+用法（在 backend 目录下）：
+    python -m benchmarks.endpoints [--scale 1.0] [--requests 30] [--filter /api/admin]
+                                   [--output result.json] [--baseline baseline.json]
+
+先用 models.synthetic 生成指定规模的数据，选取选课最多的学生、课程最多的教师和教务管理员作为调用者。
+每个路由报告 p50 / p95 / p99 延迟、吞吐量（单线程顺序请求）和单次请求的峰值内存分配（tracemalloc）。
+--revalidate 时 GET 请求带上一次响应的 ETag，测量条件请求（304）的开销。
+--output 保存 JSON 结果；--baseline 与之前保存的结果比较，p95 变慢超过阈值的路由标记为退化，
+存在退化时以退出码 1 结束，便于在持续集成中使用。
+"""
+
+import argparse
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from types import SimpleNamespace
+
+
+class Case:
+    """一个被测路由
+
+    path / body 为 (ctx, i) -> URL / JSON 请求体 的函数，i 是第几次请求；
+    files 为 (ctx, i) -> {表单字段: (文件内容, 文件名)} 的函数，给出时以 multipart 表单上传；
+    setup(ctx, n) 在计时前准备 n 次请求需要的数据（如待审批的申请），直接写入数据库；
+    after(ctx, i) 在每次请求之后调用（如等待请求提交的后台任务结束），不计入延迟与吞吐量。
+    """
+
+    def __init__(self, method, rule, role, path=None, body=None, setup=None, files=None, after=None):
+        self.method = method
+        self.rule = rule
+        self.role = role
+        self.path = path or (lambda ctx, i: rule)
+        self.body = body
+        self.setup = setup
+        self.files = files
+        self.after = after
+
+    @property
+    def name(self):
+        return f'{self.method} {self.rule}'
+
+
+# ==================== 数据准备 ====================
+
+def _pending(ctx, n, table, rows):
+    """插入 n 条待处理记录，返回其 id 列表"""
+    return [row['id'] for row in getattr(ctx.db, table).insert_many(rows(i) for i in range(n))]
+
+
+def setup_free_schedules(ctx, n):
+    # 只选与已选课程不冲突、仍有余量的排课；每次选课后立即退掉（drop_free），候选之间互相冲突也不影响
+    taken = {s['schedule_id'] for s in ctx.db.course_selections.find('student_id', ctx.student_id)}
+    candidates = [s for s in ctx.db.schedules.find('semester', ctx.semester) if s['id'] not in taken]
+    clashing = ctx.db.get_timetable_conflicts(ctx.student_id, candidates)
+    seats = {s['id']: ctx.db.get_schedule_seats(s['id']) for s in candidates if s['id'] not in clashing}
+    ctx.free_schedules = [schedule_id for schedule_id, seat in seats.items()
+                          if seat and seat['remaining'] != 0][:n]
+
+
+def setup_selected_free(ctx, n):
+    select_free(ctx, -1)
+
+
+def drop_free(ctx, i):
+    """选课用例的 after 回调：退掉本次选上的课"""
+    ctx.db.drop_selection(ctx.student_id, _cycle(ctx.free_schedules, i))
+
+
+def select_free(ctx, i):
+    """退课用例的 after 回调：选上下一次请求要退的课"""
+    ctx.db.enroll(ctx.student_id, _cycle(ctx.free_schedules, i + 1), '2024-12-14')
+
+
+def setup_job(ctx, n):
+    from models.jobs import jobs
+    ctx.job_id = jobs.submit('benchmark', lambda: None)['id']
+
+
+def setup_review_grades(ctx, n):
+    reviewed = {r['grade_id'] for r in ctx.db.grade_reviews.all()}
+    ctx.review_grades = [g['id'] for g in ctx.db.grades.all() if g['id'] not in reviewed][:n]
+
+
+def setup_topics(ctx, n):
+    applied = {a['topic_id'] for a in ctx.db.topic_applications.find('student_id', ctx.student_id)}
+    ctx.free_topics = [t['id'] for t in ctx.db.graduation_topics.all() if t['id'] not in applied][:n]
+
+
+def setup_teacher_reviews(ctx, n):
+    ctx.teacher_reviews = _pending(ctx, n, 'grade_reviews', lambda i: {
+        'grade_id': ctx.teacher_grades[i % len(ctx.teacher_grades)], 'student_id': ctx.student_id,
+        'reason': '压测', 'status': 'pending', 'created_at': '2024-12-14'})
+
+
+def setup_topic_applications(ctx, n):
+    ctx.topic_applications = _pending(ctx, n, 'topic_applications', lambda i: {
+        'student_id': ctx.student_id, 'topic_id': ctx.teacher_topic, 'status': 'pending', 'created_at': '2024-12-14'})
+
+
+def setup_victims(ctx, n):
+    with ctx.db.transaction('users', 'students'):
+        users = ctx.db.users.insert_many({'username': f'bench-victim-{i}', 'password': '123456',
+                                          'role': 'student', 'name': '压测'} for i in range(n))
+        ctx.victims = [row['id'] for row in ctx.db.students.insert_many({
+            'user_id': user['id'], 'student_no': user['username'], 'class_name': '压测班', 'major': '压测',
+            'grade': '2024级', 'status': 'normal'} for user in users)]
+
+
+def setup_invigilation_exams(ctx, n):
+    # 每次请求一场新考试：逐日排在晚间，教师在这些时段既无课程也无监考
+    from datetime import date, timedelta
+    first = date(2025, 3, 1)
+    ctx.invigilation_exams = _pending(ctx, n, 'exam_arrangements', lambda i: {
+        'schedule_id': ctx.teacher_schedule, 'date': (first + timedelta(days=i)).isoformat(),
+        'start_time': '22:00', 'end_time': '23:00', 'classroom': f'Z{i:04d}'})
+
+
+def wait_jobs(kind):
+    """返回等待某类后台任务全部结束的 after 回调"""
+    def after(ctx, i):
+        from models.jobs import jobs
+        while jobs.running(kind):
+            time.sleep(0.001)
+    return after
+
+
+def setup_borrows(ctx, n):
+    # 每条申请借用不同的空闲教室或时段，批准时不与先前批准的申请冲突
+    from datetime import date, timedelta
+    first = date(2025, 3, 1)
+    rooms = [room['id'] for room in ctx.db.classrooms.all()]
+    slots = []
+    day = 0
+    while len(slots) < n:
+        for start_time, end_time in (('19:00', '20:00'), ('20:00', '21:00'), ('21:00', '22:00')):
+            when = ((first + timedelta(days=day)).isoformat(), start_time, end_time)
+            slots.extend((room, *when) for room in rooms if not ctx.db.find_room_conflicts(room, *when))
+        day += 1
+    ctx.borrows = _pending(ctx, n, 'classroom_borrow_records', lambda i: {
+        'classroom_id': slots[i][0], 'applicant': '压测', 'purpose': '压测', 'date': slots[i][1],
+        'start_time': slots[i][2], 'end_time': slots[i][3], 'status': 'pending'})
+
+
+def setup_status_changes(ctx, n):
+    ctx.status_changes = _pending(ctx, n, 'status_changes', lambda i: {
+        'student_id': ctx.student_id, 'type': '休学', 'reason': '压测', 'status': 'pending',
+        'created_at': '2024-12-14'})
+
+
+def _cycle(items, i):
+    return items[i % len(items)]
+
+
+CASES = [
+    # ---------- 认证 ----------
+    Case('POST', '/api/login', None, body=lambda ctx, i: {'username': ctx.student_username, 'password': '123456'}),
+    Case('POST', '/api/logout', None),
+    Case('GET', '/api/user/info', 'student'),
+
+    # ---------- 学生端 ----------
+    Case('GET', '/api/student/profile', 'student'),
+    Case('GET', '/api/student/schedule', 'student'),
+    Case('GET', '/api/student/courses', 'student'),
+    Case('POST', '/api/student/select-course', 'student', setup=setup_free_schedules,
+         body=lambda ctx, i: {'schedule_id': _cycle(ctx.free_schedules, i)}, after=drop_free),
+    Case('POST', '/api/student/drop-course', 'student', setup=setup_selected_free,
+         body=lambda ctx, i: {'schedule_id': _cycle(ctx.free_schedules, i)}, after=select_free),
+    Case('GET', '/api/student/grades', 'student'),
+    Case('GET', '/api/student/ranking', 'student'),
+    Case('POST', '/api/student/grade-review', 'student', setup=setup_review_grades,
+         body=lambda ctx, i: {'grade_id': _cycle(ctx.review_grades, i), 'reason': '压测'}),
+    Case('GET', '/api/student/evaluations', 'student'),
+    Case('POST', '/api/student/evaluate', 'student',
+         body=lambda ctx, i: {'evaluation_id': _cycle(ctx.evaluations, i), 'rating': 5, 'comment': '压测'}),
+    Case('GET', '/api/student/status-changes', 'student'),
+    Case('POST', '/api/student/status-changes', 'student', body=lambda ctx, i: {'type': '休学', 'reason': '压测'}),
+    Case('GET', '/api/student/retakes', 'student'),
+    Case('POST', '/api/student/retakes', 'student',
+         body=lambda ctx, i: {'course_id': ctx.course_id, 'reason': '压测'}),
+    Case('GET', '/api/student/topics', 'student'),
+    Case('POST', '/api/student/apply-topic', 'student', setup=setup_topics,
+         body=lambda ctx, i: {'topic_id': _cycle(ctx.free_topics, i)}),
+    Case('GET', '/api/student/my-topic', 'student'),
+    Case('GET', '/api/student/documents', 'student'),
+    Case('POST', '/api/student/documents', 'student',
+         body=lambda ctx, i: {'type': '中期报告', 'file_name': f'bench_{i}.pdf'}),
+
+    # ---------- 教师端 ----------
+    Case('GET', '/api/teacher/profile', 'teacher'),
+    Case('GET', '/api/teacher/schedule', 'teacher'),
+    Case('GET', '/api/teacher/courses', 'teacher'),
+    Case('GET', '/api/teacher/students/<int:schedule_id>', 'teacher',
+         path=lambda ctx, i: f'/api/teacher/students/{ctx.teacher_schedule}'),
+    Case('POST', '/api/teacher/grades', 'teacher',
+         body=lambda ctx, i: {'grades': [{'selection_id': s, 'score': 60 + (s + i) % 40}
+                                         for s in ctx.teacher_selections]}),
+    Case('POST', '/api/teacher/grades/import/<int:schedule_id>', 'teacher',
+         path=lambda ctx, i: f'/api/teacher/grades/import/{ctx.teacher_schedule}',
+         files=lambda ctx, i: {'file': (('学号,成绩\n' + ''.join(f'{no},{60 + (k + i) % 40}\n' for k, no
+                                                               in enumerate(ctx.teacher_roster))).encode(),
+                                        'roster.csv')}),
+    Case('GET', '/api/teacher/reviews', 'teacher'),
+    Case('PUT', '/api/teacher/reviews/<int:review_id>', 'teacher', setup=setup_teacher_reviews,
+         path=lambda ctx, i: f'/api/teacher/reviews/{ctx.teacher_reviews[i]}',
+         body=lambda ctx, i: {'action': 'reject'}),
+    Case('GET', '/api/teacher/topics', 'teacher'),
+    Case('POST', '/api/teacher/topics', 'teacher',
+         body=lambda ctx, i: {'title': f'压测课题{i}', 'description': '压测', 'max_students': 1}),
+    Case('PUT', '/api/teacher/topics/<int:topic_id>', 'teacher',
+         path=lambda ctx, i: f'/api/teacher/topics/{ctx.teacher_topic}',
+         body=lambda ctx, i: {'description': '课题研究内容与技术路线见任务书'}),
+    Case('GET', '/api/teacher/topic-applications', 'teacher'),
+    Case('PUT', '/api/teacher/topic-applications/<int:app_id>', 'teacher', setup=setup_topic_applications,
+         path=lambda ctx, i: f'/api/teacher/topic-applications/{ctx.topic_applications[i]}',
+         body=lambda ctx, i: {'action': 'reject'}),
+    Case('GET', '/api/teacher/students-thesis', 'teacher'),
+    Case('GET', '/api/teacher/exams', 'teacher'),
+
+    # ---------- 教务端 ----------
+    Case('GET', '/api/admin/students', 'admin'),
+    Case('POST', '/api/admin/students', 'admin',
+         body=lambda ctx, i: {'student_no': f'B{i:08d}', 'name': '压测', 'class_name': '压测班',
+                              'major': '压测', 'grade': '2024级'}),
+    Case('PUT', '/api/admin/students/<int:student_id>', 'admin',
+         path=lambda ctx, i: f'/api/admin/students/{ctx.student_id}',
+         body=lambda ctx, i: {'status': 'normal'}),
+    Case('DELETE', '/api/admin/students/<int:student_id>', 'admin', setup=setup_victims,
+         path=lambda ctx, i: f'/api/admin/students/{ctx.victims[i]}'),
+    Case('GET', '/api/admin/teachers', 'admin'),
+    Case('POST', '/api/admin/teachers', 'admin',
+         body=lambda ctx, i: {'teacher_no': f'BT{i:06d}', 'name': '压测', 'department': '计算机学院'}),
+    Case('GET', '/api/admin/courses', 'admin'),
+    Case('POST', '/api/admin/courses', 'admin',
+         body=lambda ctx, i: {'code': f'BK{i:05d}', 'name': '压测课程', 'teacher_id': ctx.teacher_id}),
+    Case('PUT', '/api/admin/courses/<int:course_id>', 'admin',
+         path=lambda ctx, i: f'/api/admin/courses/{ctx.course_id}',
+         body=lambda ctx, i: {'hours': ctx.course_hours}),
+    Case('GET', '/api/admin/classrooms', 'admin'),
+    Case('POST', '/api/admin/classrooms', 'admin',
+         body=lambda ctx, i: {'building': 'Z楼', 'room_no': f'Z{i:04d}', 'capacity': 60}),
+    Case('GET', '/api/admin/schedule', 'admin'),
+    # 同一门课反复新建排课，按请求序号错开周次与节次，避免与上一次请求产生教师冲突
+    Case('POST', '/api/admin/schedule', 'admin',
+         body=lambda ctx, i: {'course_id': ctx.course_id, 'semester': ctx.semester, 'weekday': 6 + i // 24 % 2,
+                              'start_period': 9 + i // 48 % 2 * 2, 'end_period': 10 + i // 48 % 2 * 2,
+                              'weeks': str(i % 24 + 1), 'classroom': f'Z{i:04d}'}),
+    Case('POST', '/api/admin/schedule/auto', 'admin',
+         body=lambda ctx, i: {'semester': ctx.semester, 'course_ids': [ctx.course_id], 'workers': 1}),
+    Case('PUT', '/api/admin/schedule/<int:schedule_id>', 'admin',
+         path=lambda ctx, i: f'/api/admin/schedule/{ctx.teacher_schedule}',
+         body=lambda ctx, i: {'weeks': ctx.teacher_schedule_weeks}),
+    Case('GET', '/api/admin/exams', 'admin'),
+    Case('POST', '/api/admin/exams', 'admin',
+         body=lambda ctx, i: {'schedule_id': ctx.teacher_schedule, 'date': '2025-01-20', 'start_time': '19:00',
+                              'end_time': '21:00', 'classroom': f'Z{i:04d}'}),
+    Case('POST', '/api/admin/exams/auto', 'admin',
+         body=lambda ctx, i: {'exam_ids': [ctx.exam_id], 'start_date': '2025-01-20', 'days': 2}),
+    Case('GET', '/api/admin/exams/conflicts', 'admin'),
+    Case('GET', '/api/admin/invigilators', 'admin'),
+    Case('POST', '/api/admin/invigilators', 'admin', setup=setup_invigilation_exams,
+         body=lambda ctx, i: {'exam_id': ctx.invigilation_exams[i], 'teacher_id': ctx.teacher_id, 'role': '副监考'}),
+    # 同类任务进行中时会返回 409，每次请求后等任务结束再发下一次
+    Case('POST', '/api/admin/invigilators/auto', 'admin', body=lambda ctx, i: {'exam_ids': [ctx.exam_id]},
+         after=wait_jobs('invigilators')),
+    Case('GET', '/api/admin/jobs/<int:job_id>', 'admin', setup=setup_job,
+         path=lambda ctx, i: f'/api/admin/jobs/{ctx.job_id}'),
+    Case('GET', '/api/admin/classroom-borrow', 'admin'),
+    Case('PUT', '/api/admin/classroom-borrow/<int:record_id>', 'admin', setup=setup_borrows,
+         path=lambda ctx, i: f'/api/admin/classroom-borrow/{ctx.borrows[i]}',
+         body=lambda ctx, i: {'action': 'approve'}),
+    Case('GET', '/api/admin/classrooms/free', 'admin',
+         path=lambda ctx, i: f'/api/admin/classrooms/free?date=2024-10-{i % 28 + 1:02d}&start_time=14:00&end_time=17:40'),
+    Case('GET', '/api/admin/approvals', 'admin'),
+    Case('PUT', '/api/admin/approve', 'admin', setup=setup_status_changes,
+         body=lambda ctx, i: {'type': 'status_change', 'id': ctx.status_changes[i], 'action': 'reject'}),
+    Case('GET', '/api/admin/statistics', 'admin'),
+    Case('GET', '/api/admin/analytics/gpa', 'admin'),
+    Case('GET', '/api/admin/analytics/gpa?by=major&name=计算机科学与技术', 'admin'),
+    Case('GET', '/api/admin/cache-stats', 'admin'),
+]
+
+
+# ==================== 运行 ====================
+
+def build_context(database):
+    """选取数据量最大的学生与教师作为调用者"""
+    selections = Counter(s['student_id'] for s in database.course_selections.all())
+    student_id = max(selections, key=selections.get) if selections else 1
+    student = database.students.get(student_id)
+    courses = database.courses.all()
+    by_teacher = Counter(c['teacher_id'] for c in courses)
+    teacher_id = max(by_teacher, key=by_teacher.get)
+    teacher = database.teachers.get(teacher_id)
+
+    teacher_schedules = database.get_schedules_by_teacher(teacher_id)
+    enrolled = Counter(s['schedule_id'] for s in database.course_selections.all())
+    schedule = max(teacher_schedules, key=lambda s: enrolled.get(s['id'], 0))
+    teacher_selections = [s['id'] for s in database.course_selections.find('schedule_id', schedule['id'])]
+    teacher_grades = [g['id'] for s in teacher_selections for g in database.grades.find('selection_id', s)]
+    if not teacher_grades:
+        teacher_grades = [g['id'] for g in database.grades.all()[:1]]
+    topics = database.graduation_topics.find('teacher_id', teacher_id)
+    if not topics:
+        topics = [database.graduation_topics.insert({'teacher_id': teacher_id, 'title': '压测课题',
+                                                     'description': '', 'max_students': 1, 'status': 'open'})]
+    course = database.courses.get(schedule['course_id'])
+    exams = database.exam_arrangements.all()
+
+    return SimpleNamespace(
+        db=database,
+        student_id=student_id,
+        student_username=database.users.get(student['user_id'])['username'],
+        teacher_id=teacher_id,
+        teacher_username=database.users.get(teacher['user_id'])['username'],
+        admin_username=next(u['username'] for u in database.users.all() if u['role'] == 'admin'),
+        semester=schedule['semester'],
+        teacher_schedule=schedule['id'],
+        teacher_schedule_weeks=schedule['weeks'],
+        teacher_selections=teacher_selections,
+        teacher_grades=teacher_grades,
+        teacher_roster=[item['student']['student_no'] for item in database.get_course_students(schedule['id'])
+                        if item['student']],
+        teacher_topic=topics[0]['id'],
+        course_id=course['id'],
+        course_hours=course['hours'],
+        evaluations=[e['id'] for e in database.evaluations.find('student_id', student_id)] or [1],
+        exam_id=exams[0]['id'],
+    )
+
+
+def percentile(samples, q):
+    """最近秩法百分位数"""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered) + 0.5)) - 1))]
+
+
+def run_case(case, clients, ctx, requests, warmup, alloc_requests, revalidate=False):
+    total = warmup + requests + alloc_requests
+    if case.setup:
+        case.setup(ctx, total)
+    client = clients[case.role]
+    call = getattr(client, case.method.lower())
+
+    etags = {}
+    paused = 0.0
+
+    def settle(i):
+        nonlocal paused
+        if case.after:
+            begin = time.perf_counter()
+            case.after(ctx, i)
+            paused += time.perf_counter() - begin
+
+    def request(i):
+        kwargs = {}
+        if case.body:
+            kwargs['json'] = case.body(ctx, i)
+        if case.files:
+            kwargs['data'] = {field: (io.BytesIO(content), filename)
+                              for field, (content, filename) in case.files(ctx, i).items()}
+            kwargs['content_type'] = 'multipart/form-data'
+        path = case.path(ctx, i)
+        if revalidate and path in etags:
+            kwargs['headers'] = {'If-None-Match': etags[path]}
+        response = call(path, **kwargs)
+        if revalidate and 'ETag' in response.headers:
+            etags[path] = response.headers['ETag']
+        return response.status_code
+
+    statuses = Counter()
+    for i in range(warmup):
+        request(i)
+        settle(i)
+
+    latencies = []
+    paused = 0.0
+    started = time.perf_counter()
+    for i in range(warmup, warmup + requests):
+        begin = time.perf_counter_ns()
+        statuses[request(i)] += 1
+        latencies.append((time.perf_counter_ns() - begin) / 1e6)
+        settle(i)
+    elapsed = time.perf_counter() - started - paused
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        for i in range(warmup + requests, total):
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            request(i)
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+            settle(i)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'requests': requests,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'throughput_rps': round(requests / elapsed, 1) if elapsed else None,
+        'alloc_peak_kib': round(sum(peaks) / len(peaks) / 1024, 1) if peaks else None,
+        'statuses': {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+def compare(results, baseline, threshold, min_delta_ms):
+    """返回 p95 退化的路由列表 [(路由, 基线 p95, 当前 p95)]"""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get('routes', {}).get(name)
+        if not before:
+            continue
+        old, new = before['p95_ms'], result['p95_ms']
+        if new > old * threshold and new - old > min_delta_ms:
+            regressions.append((name, old, new))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='接口基准')
+    parser.add_argument('--scale', type=float, default=1.0, help='合成数据规模系数，0 表示只用种子数据')
+    parser.add_argument('--seed', type=int, default=2024)
+    parser.add_argument('--columnar', action='store_true', help='选课、成绩、评教使用列式存储')
+    parser.add_argument('--no-query-cache', action='store_true', help='关闭查询结果缓存')
+    parser.add_argument('--revalidate', action='store_true',
+                        help='像浏览器缓存一样带上次响应的 ETag 发送条件请求，测量 304 路径')
+    parser.add_argument('--requests', type=int, default=30, help='每个路由计时的请求数')
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--alloc-requests', type=int, default=3, help='每个路由用于统计内存分配的请求数')
+    parser.add_argument('--filter', default='', help='只运行路由中包含该字符串的用例')
+    parser.add_argument('--output', help='结果保存为 JSON')
+    parser.add_argument('--baseline', help='与之前保存的 JSON 结果比较')
+    parser.add_argument('--threshold', type=float, default=1.25, help='p95 超过基线的倍数视为退化')
+    parser.add_argument('--min-delta-ms', type=float, default=0.5, help='p95 增加小于该值时忽略')
+    args = parser.parse_args()
+
+    from app import create_app
+    from models.cache import QueryCache
+    from models.models import MockDatabase, db
+    from models.synthetic import populate
+
+    app = create_app('development')
+    app.testing = True
+    database = MockDatabase(columnar=args.columnar)
+    started = time.perf_counter()
+    if args.scale:
+        populate(database, args.scale, args.seed)
+    if app.config['QUERY_CACHE_ENTRIES'] and not args.no_query_cache:
+        database.query_cache = QueryCache(app.config['QUERY_CACHE_ENTRIES'], app.config['QUERY_CACHE_BYTES'])
+    db.use(database)
+    print(f'数据准备完成（规模 {args.scale}），耗时 {time.perf_counter() - started:.1f} s', file=sys.stderr)
+
+    ctx = build_context(database)
+    clients = {None: app.test_client()}
+    for role, username in (('student', ctx.student_username), ('teacher', ctx.teacher_username),
+                           ('admin', ctx.admin_username)):
+        client = clients[role] = app.test_client()
+        response = client.post('/api/login', json={'username': username, 'password': '123456'})
+        if response.status_code != 200:
+            raise SystemExit(f'{role} {username} 登录失败')
+
+    covered = {case.name for case in CASES}
+    missing = [f'{method} {rule.rule}' for rule in app.url_map.iter_rules() if rule.rule.startswith('/api/')
+               and rule.rule != '/api/health'
+               for method in sorted(rule.methods - {'HEAD', 'OPTIONS'}) if f'{method} {rule.rule}' not in covered]
+    if missing:
+        print(f'以下路由没有基准用例: {", ".join(missing)}', file=sys.stderr)
+
+    results = {}
+    print(f'{"路由":<52}{"p50":>9}{"p95":>9}{"p99":>9}{"req/s":>9}{"峰值KiB":>10}  状态码')
+    for case in CASES:
+        if args.filter not in case.name:
+            continue
+        result = results[case.name] = run_case(case, clients, ctx, args.requests, args.warmup,
+                                               args.alloc_requests, args.revalidate)
+        statuses = ' '.join(f'{code}×{count}' for code, count in result['statuses'].items())
+        print(f'{case.name:<52}{result["p50_ms"]:>9.2f}{result["p95_ms"]:>9.2f}{result["p99_ms"]:>9.2f}'
+              f'{result["throughput_rps"]:>9.0f}{result["alloc_peak_kib"] or 0:>10.1f}  {statuses}')
+
+    report = {
+        'meta': {
+            'scale': args.scale, 'seed': args.seed, 'columnar': args.columnar, 'requests': args.requests,
+            'query_cache': database.query_cache.stats() if database.query_cache else None,
+            'revalidate': args.revalidate,
+            'python': platform.python_version(), 'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'routes': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        for name, old, new in regressions:
+            print(f'退化: {name}  p95 {old:.2f} ms -> {new:.2f} ms（{new / old:.2f}x）')
+        if regressions:
+            sys.exit(1)
+        print(f'与基线相比没有退化（阈值 {args.threshold}x）')
+
+
+if __name__ == '__main__':
+    main()
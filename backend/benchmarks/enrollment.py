@@ -0,0 +1,163 @@
+"""
+选课并发压测：验证高并发下不超员、不重复选课
+
+用法（在 backend 目录下）：
+    python -m benchmarks.enrollment [--threads 64] [--ops 200000] [--schedules 200] [--students 20000]
+                                    [--backend mock|sqlite]
+
+新建 schedules 个小容量排课，threads 个线程随机为 students 名学生选课 / 退课（约 3:1，退掉本线程之前选上的课），
+热门排课（前 10%）承受一半的请求，模拟抢课。结束后逐一核对：
+每个排课的选课记录数不超过容量、与引擎计数一致，同一学生不会重复选同一排课，也没有时间冲突的两门课。
+发现问题时以退出码 1 结束。
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+
+from models.enrollment import CONFLICT, DUPLICATE, ENROLLED, FULL, NOT_FOUND
+from models.timetable import schedule_mask
+
+
+# 排课时间在这些节次与周次组合中轮换，学生随机选课时有一部分会冲突
+PERIOD_PAIRS = ((1, 2), (3, 4), (5, 6), (7, 8), (9, 10))
+WEEK_PATTERNS = ('1-16', '1-8', '9-16', '1-16单', '1-16双')
+
+
+def make_database(backend):
+    if backend == 'mock':
+        from models.models import MockDatabase
+        return MockDatabase(), None
+    from models.repository import SqlDatabase
+    path = os.path.join(tempfile.mkdtemp(prefix='edu-enroll-'), 'enroll.db')
+    return SqlDatabase(f'sqlite:///{path}', pool_size=16), path
+
+
+def create_schedules(database, count, rng):
+    """新建排课：上课时间在节次与周次组合中轮换，一半显式指定容量，一半使用新建教室的容量"""
+    slots = [(weekday, pair, weeks) for weekday in range(1, 8) for pair in PERIOD_PAIRS for weeks in WEEK_PATTERNS]
+    schedule_ids = []
+    for i in range(count):
+        room_no = f'Z{i:04d}'
+        capacity = rng.randint(1, 40)
+        if i % 2:
+            database.classrooms.insert({'building': 'Z楼', 'room_no': room_no, 'capacity': capacity,
+                                        'type': '压测教室'})
+            explicit = None
+        else:
+            explicit = capacity
+        weekday, (start, end), weeks = slots[i % len(slots)]
+        row = database.schedules.insert({
+            'course_id': 1, 'semester': '2099-2100-1', 'weekday': weekday, 'start_period': start,
+            'end_period': end, 'classroom': room_no, 'weeks': weeks, 'capacity': explicit
+        })
+        schedule_ids.append((row['id'], capacity))
+    return schedule_ids
+
+
+def worker(database, schedule_ids, students, ops, seed, results, latencies):
+    rng = random.Random(seed)
+    hot = schedule_ids[:max(len(schedule_ids) // 10, 1)]
+    outcome = Counter()
+    samples = []
+    # 本线程选上的课，退课优先从中挑选，让名额不断释放、被其他线程争抢
+    mine = []
+    for i in range(ops):
+        begin = time.perf_counter_ns()
+        if rng.random() < 0.75 or not mine:
+            schedule_id = rng.choice(hot if rng.random() < 0.5 else schedule_ids)
+            student_id = rng.randrange(1, students + 1) + 1_000_000
+            result, _ = database.enroll(student_id, schedule_id, '2024-12-14')
+            outcome[result] += 1
+            if result == ENROLLED:
+                mine.append((student_id, schedule_id))
+        else:
+            student_id, schedule_id = mine.pop(rng.randrange(len(mine)))
+            outcome['dropped' if database.drop_selection(student_id, schedule_id) else 'not_selected'] += 1
+        if i % 16 == 0:
+            samples.append(time.perf_counter_ns() - begin)
+    results.append(outcome)
+    latencies.extend(samples)
+
+
+def verify(database, schedules):
+    """返回发现的问题列表"""
+    problems = []
+    capacities = dict(schedules)
+    rows = [s for s in database.course_selections.all() if s['schedule_id'] in capacities]
+    per_schedule = Counter(s['schedule_id'] for s in rows)
+    pairs = Counter((s['student_id'], s['schedule_id']) for s in rows)
+    for schedule_id, capacity in schedules:
+        enrolled = per_schedule.get(schedule_id, 0)
+        if enrolled > capacity:
+            problems.append(f'排课 {schedule_id} 超员: {enrolled} > {capacity}')
+        seats = database.get_schedule_seats(schedule_id)
+        if seats['enrolled'] != enrolled or seats['capacity'] != capacity:
+            problems.append(f'排课 {schedule_id} 计数不一致: {seats} 实际 {enrolled}/{capacity}')
+    duplicates = [pair for pair, count in pairs.items() if count > 1]
+    if duplicates:
+        problems.append(f'{len(duplicates)} 组重复选课，例如 {duplicates[:3]}')
+    masks = {s['id']: schedule_mask(s) for s in database.schedules.all() if s['id'] in capacities}
+    timetables = defaultdict(list)
+    for s in rows:
+        timetables[s['student_id']].append(s['schedule_id'])
+    clashes = [student_id for student_id, chosen in timetables.items()
+               if any(masks[a] & masks[b] for i, a in enumerate(chosen) for b in chosen[i + 1:])]
+    if clashes:
+        problems.append(f'{len(clashes)} 名学生选了时间冲突的课程，例如 {clashes[:3]}')
+    return problems, len(rows), sum(capacities.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='选课并发压测')
+    parser.add_argument('--threads', type=int, default=64)
+    parser.add_argument('--ops', type=int, default=200_000, help='总操作数（选课 + 退课）')
+    parser.add_argument('--schedules', type=int, default=200)
+    parser.add_argument('--students', type=int, default=20_000)
+    parser.add_argument('--backend', choices=('mock', 'sqlite'), default='mock')
+    parser.add_argument('--seed', type=int, default=2024)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    database, path = make_database(args.backend)
+    schedules = create_schedules(database, args.schedules, rng)
+    schedule_ids = [schedule_id for schedule_id, _ in schedules]
+
+    results, latencies = [], []
+    per_thread = max(args.ops // args.threads, 1)
+    threads = [threading.Thread(target=worker, args=(database, schedule_ids, args.students, per_thread,
+                                                     args.seed + i, results, latencies))
+               for i in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    outcome = sum(results, Counter())
+    problems, enrolled, seats = verify(database, schedules)
+    latencies.sort()
+    total = per_thread * args.threads
+    print(f'后端 {args.backend}  线程 {args.threads}  排课 {args.schedules}（共 {seats} 座）  学生 {args.students}')
+    print(f'  {total:,} 次操作，耗时 {elapsed:.2f} s，{total / elapsed:,.0f} ops/s，'
+          f'p50 {latencies[len(latencies) // 2] / 1e3:.1f} µs，p99 {latencies[int(len(latencies) * 0.99)] / 1e3:.1f} µs')
+    print(f'  选课成功 {outcome[ENROLLED]:,}  已满 {outcome[FULL]:,}  重复 {outcome[DUPLICATE]:,}  '
+          f'冲突 {outcome[CONFLICT]:,}  不存在 {outcome[NOT_FOUND]:,}  退课 {outcome["dropped"]:,}  未选退课 {outcome["not_selected"]:,}')
+    print(f'  结束时已选 {enrolled:,} / {seats:,} 座')
+    if path:
+        database.close()
+    if problems:
+        for problem in problems[:20]:
+            print(f'  ✗ {problem}', file=sys.stderr)
+        sys.exit(1)
+    print('  ✓ 无超员、无重复选课、无时间冲突，计数与选课记录一致')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+考试排期基准：在合成数据上为一学期的全部考试重新排期并核对结果
+
+用法（在 backend 目录下）：
+    python -m benchmarks.exams [--scale 1] [--semester 2024-2025-1] [--start-date 2025-01-06] [--days 24]
+
+先按规模系数生成合成数据（当前学期每个排课一场考试，日期与时段随机，存在大量考生冲突），
+用 find_conflicts 检查原有安排并计时，再在 days 天 × 4 个时段内重新排期。
+合成数据中学生从全部课程中随机选课，冲突图远比按培养方案选课时稠密（规模 1 时约 160 万条边），
+需要 90 个以上的时段才能全部排开，因此默认 24 天。
+结束后用同一检查核对新方案：没有考生冲突、教室冲突与容量不足。发现问题时以退出码 1 结束。
+"""
+
+import argparse
+import sys
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description='考试排期基准')
+    parser.add_argument('--scale', type=float, default=1.0)
+    parser.add_argument('--semester', default='2024-2025-1')
+    parser.add_argument('--start-date', default='2025-01-06')
+    parser.add_argument('--days', type=int, default=24)
+    parser.add_argument('--time-limit', type=float, default=60, help='求解的秒数上限')
+    parser.add_argument('--seed', type=int, default=2024)
+    args = parser.parse_args()
+
+    from models.exams import build_exam_problem, exam_days, find_conflicts, solve_exams
+    from models.models import MockDatabase
+    from models.synthetic import populate
+
+    database = MockDatabase()
+    populate(database, scale=args.scale, seed=args.seed)
+    offered = {s['id'] for s in database.schedules.find('semester', args.semester)}
+    exams = [exam for exam in database.get_all_exams() if exam['schedule_id'] in offered]
+    capacities = {room['room_no']: room['capacity'] for room in database.classrooms}
+
+    started = time.perf_counter()
+    students = database.get_students_by_schedules({exam['schedule_id'] for exam in exams})
+    before = find_conflicts(exams, students, capacities)
+    check_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    problem = build_exam_problem(database, semester=args.semester,
+                                 dates=exam_days(args.start_date, args.days))
+    build_seconds = time.perf_counter() - started
+    result = solve_exams(problem, time_limit=args.time_limit)
+    stats = result['stats']
+
+    # 按方案生成考试行（多考场的考试每个教室一行）后用同一检查核对
+    planned = []
+    for exam in result['exams']:
+        for classroom in exam['classrooms']:
+            planned.append({'id': len(planned) + 1, 'schedule_id': exam['schedule_id'], 'date': exam['date'],
+                            'start_time': exam['start_time'], 'end_time': exam['end_time'], 'classroom': classroom})
+    after = find_conflicts(planned, students, capacities)
+
+    print(f"规模 {args.scale}  学期 {args.semester}  考试 {stats['exams']:,}  考生 {stats['students']:,}  "
+          f"冲突边 {stats['conflict_edges']:,}  时段 {stats['slots']}  教室 {stats['rooms']}")
+    print(f"  原安排检查 {check_seconds:.2f} s：考生冲突 {before['stats']['student_conflicts']:,} 对"
+          f"（{before['stats']['students_affected']:,} 人次），教室冲突 {before['stats']['room_conflicts']:,}，"
+          f"连考 {before['stats']['back_to_back']:,} 人次")
+    print(f"  整理问题 {build_seconds:.2f} s，求解 {stats['elapsed']:.2f} s（改进移动 {stats['moves']:,} 次）")
+    print(f"  安排 {stats['placed']:,}，未安排 {stats['unplaced']:,}；同一天两场 {stats['same_day']:,} 人次，"
+          f"相邻时段连考 {stats['back_to_back']:,} 人次")
+    problems = [f"{key} × {after['stats'][key]}" for key in ('student_conflicts', 'room_conflicts',
+                                                              'capacity_issues', 'invalid') if after['stats'][key]]
+    if stats['unplaced']:
+        problems.append(f"未安排 {stats['unplaced']} 场考试")
+    if problems:
+        for problem_text in problems:
+            print(f'  ✗ {problem_text}', file=sys.stderr)
+        sys.exit(1)
+    print('  ✓ 新方案没有考生冲突、教室冲突与容量不足')
+
+
+if __name__ == '__main__':
+    main()
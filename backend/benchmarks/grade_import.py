@@ -0,0 +1,153 @@
+"""
+成绩单导入基准：生成大班补考成绩单（CSV 与 XLSX），通过上传接口导入并计时
+
+用法（在 backend 目录下）：
+    python -m benchmarks.grade_import [--scale 0.2] [--rows 5000]
+
+先按规模系数生成合成数据，为一名教师的一个排课补选 rows 名学生，生成同样行数的成绩单
+（其中约 1% 的行学号不存在、成绩越界或重复，用于检验逐行报错），
+分别以 CSV 与 XLSX 上传到 POST /api/teacher/grades/import/<schedule_id>，记录耗时与结果；
+再单独解析 rows 行与 10 × rows 行的文件，比较解析过程的内存峰值，检验内存占用与行数无关。
+导入行数或报错行数与预期不符时以退出码 1 结束。
+"""
+
+import argparse
+import csv
+import io
+import random
+import sys
+import time
+import tracemalloc
+import zipfile
+from xml.sax.saxutils import escape
+
+
+def write_xlsx(rows):
+    """最小的 XLSX 文件：一张工作表，文本单元格使用共享字符串表"""
+    strings, index = [], {}
+
+    def cell(ref, value):
+        if isinstance(value, (int, float)):
+            return f'<c r="{ref}"><v>{value}</v></c>'
+        if value not in index:
+            index[value] = len(strings)
+            strings.append(value)
+        return f'<c r="{ref}" t="s"><v>{index[value]}</v></c>'
+
+    body = ''.join(f'<row r="{r}">' + ''.join(cell(f'{"ABCDEFGHIJ"[c]}{r}', value) for c, value in enumerate(row))
+                   + '</row>' for r, row in enumerate(rows, start=1))
+    main = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+    rel = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/></Types>'))
+        archive.writestr('xl/workbook.xml', (
+            f'<workbook xmlns="{main}" xmlns:r="{rel}"><sheets>'
+            '<sheet name="成绩" sheetId="1" r:id="rId1"/></sheets></workbook>'))
+        archive.writestr('xl/_rels/workbook.xml.rels', (
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'<Relationship Id="rId1" Type="{rel}/worksheet" Target="worksheets/sheet1.xml"/></Relationships>'))
+        archive.writestr('xl/worksheets/sheet1.xml', f'<worksheet xmlns="{main}"><sheetData>{body}</sheetData></worksheet>')
+        archive.writestr('xl/sharedStrings.xml', f'<sst xmlns="{main}">' + ''.join(
+            f'<si><t>{escape(text)}</t></si>' for text in strings) + '</sst>')
+    return buffer.getvalue()
+
+
+def write_csv(rows):
+    text = io.StringIO()
+    csv.writer(text).writerows(rows)
+    return text.getvalue().encode('utf-8-sig')
+
+
+def parse_peak(data, filename):
+    """逐行解析文件（不导入）的内存峰值（字节）"""
+    from models.roster import read_rows
+
+    tracemalloc.start()
+    try:
+        for _ in read_rows(io.BytesIO(data), filename):
+            pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='成绩单导入基准')
+    parser.add_argument('--scale', type=float, default=0.2)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=2024)
+    args = parser.parse_args()
+
+    from app import create_app
+    from models.models import MockDatabase, db
+    from models.synthetic import populate
+
+    app = create_app('development')
+    app.testing = True
+    database = MockDatabase()
+    populate(database, scale=args.scale, seed=args.seed)
+    db.use(database)
+
+    rng = random.Random(args.seed)
+    schedule = database.schedules.all()[0]
+    teacher = database.teachers.get(database.courses.get(schedule['course_id'])['teacher_id'])
+    taken = {s['student_id'] for s in database.course_selections.find('schedule_id', schedule['id'])}
+    students = [s for s in database.students.all() if s['id'] not in taken][:args.rows]
+    database.course_selections.insert_many({'student_id': s['id'], 'schedule_id': schedule['id'],
+                                            'status': 'confirmed', 'selected_at': '2024-09-01'} for s in students)
+    names = {user['id']: user['name'] for user in database.users.all()}
+
+    rows, bad = [['学号', '姓名', '成绩']], 0
+    for student in students:
+        roll = rng.random()
+        if roll < 0.004:
+            rows.append([f"X{student['student_no']}", names[student['user_id']], 80])
+            bad += 1
+        elif roll < 0.008:
+            rows.append([student['student_no'], names[student['user_id']], 120])
+            bad += 1
+        else:
+            rows.append([student['student_no'], names[student['user_id']], rng.randint(30, 100)])
+            if roll < 0.01:
+                rows.append(rows[-1])
+                bad += 1
+    expected = len(rows) - 1 - bad
+
+    client = app.test_client()
+    user = database.users.get(teacher['user_id'])
+    client.post('/api/login', json={'username': user['username'], 'password': '123456'})
+
+    print(f"规模 {args.scale}  排课 {schedule['id']} 选课 {len(students) + len(taken):,} 人  "
+          f"成绩单 {len(rows) - 1:,} 行（其中有误 {bad} 行）")
+    failed = False
+    for filename, data in (('roster.csv', write_csv(rows)), ('roster.xlsx', write_xlsx(rows))):
+        started = time.perf_counter()
+        response = client.post(f"/api/teacher/grades/import/{schedule['id']}",
+                               data={'file': (io.BytesIO(data), filename)}, content_type='multipart/form-data')
+        elapsed = time.perf_counter() - started
+        result = response.get_json().get('data') or {}
+        print(f"  {filename:<12} {len(data) / 1024:7.0f} KiB  {elapsed:.2f} s  状态 {response.status_code}  "
+              f"导入 {result.get('imported', 0):,}（新增 {result.get('inserted', 0):,}，更新 {result.get('updated', 0):,}）"
+              f"  有误 {result.get('error_count', 0)}")
+        if result.get('imported') != expected or result.get('error_count') != bad:
+            print(f'  ✗ {filename} 导入 {result.get("imported")} 行、有误 {result.get("error_count")} 行，'
+                  f'预期 {expected} 行、{bad} 行', file=sys.stderr)
+            failed = True
+
+    big = rows + rows[1:] * 9
+    for filename, writer in (('roster.csv', write_csv), ('roster.xlsx', write_xlsx)):
+        small_peak, big_peak = parse_peak(writer(rows), filename), parse_peak(writer(big), filename)
+        print(f"  解析 {filename:<12} {len(rows) - 1:,} 行峰值 {small_peak / 1024:.0f} KiB，"
+              f"{len(big) - 1:,} 行峰值 {big_peak / 1024:.0f} KiB")
+    if failed:
+        sys.exit(1)
+    print('  ✓ 导入行数与逐行报错符合预期')
+
+
+if __name__ == '__main__':
+    main()
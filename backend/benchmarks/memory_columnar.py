@@ -0,0 +1,77 @@
+"""
+选课表内存占用基准：行存储 Table 与列式存储 ColumnarTable 对比
+
+用法（在 backend 目录下）：
+    python -m benchmarks.memory_columnar [--rows 1000000]
+
+每种存储在独立子进程中构建，比较构建前后的常驻内存（RSS）增量。
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+
+def read_rss():
+    """读取当前进程的常驻内存（字节），仅支持 Linux"""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) * 1024
+    raise RuntimeError('无法读取 VmRSS')
+
+
+def build(storage, rows):
+    """在当前进程中构建 rows 条选课记录，返回 RSS 增量"""
+    from models.columnar import ColumnarTable
+    from models.models import MockDatabase
+    from models.table import Table
+
+    indexes = MockDatabase.INDEXES['course_selections']
+    before = read_rss()
+    if storage == 'columnar':
+        table = ColumnarTable('course_selections', MockDatabase.COLUMNAR_SCHEMAS['course_selections'],
+                              indexes=indexes)
+    else:
+        table = Table('course_selections', indexes=indexes)
+
+    students = max(rows // 25, 1)
+    schedules = max(rows // 200, 1)
+    table.insert_many({
+        'student_id': i % students + 1,
+        'schedule_id': (i * 7919) % schedules + 1,
+        'status': 'confirmed',
+        'selected_at': f'2024-09-{i % 28 + 1:02d}',
+    } for i in range(rows))
+    after = read_rss()
+    assert len(table) == rows
+    return after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description='选课表内存占用基准')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--child', choices=['row', 'columnar'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps({'rss': build(args.child, args.rows)}))
+        return
+
+    results = {}
+    for storage in ('row', 'columnar'):
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.memory_columnar', '--rows', str(args.rows), '--child', storage],
+            check=True, capture_output=True, text=True
+        ).stdout
+        results[storage] = json.loads(output)['rss']
+
+    print(f'选课记录数: {args.rows:,}')
+    for storage, rss in results.items():
+        print(f'  {storage:<9} RSS 增量 {rss / 2 ** 20:8.1f} MiB  每行 {rss / args.rows:6.1f} 字节')
+    print(f'  列式存储内存为行存储的 {results["columnar"] / results["row"]:.1%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+持久化基准：写入延迟与重启恢复时间
+
+用法（在 backend 目录下）：
+    python -m benchmarks.persistence [--rows 1000000] [--writes 20000] [--columnar]
+
+先向选课表写入 rows 条记录并生成快照，测量单次 update 在开启日志前后的延迟，
+再在新的 MockDatabase 上从快照与日志恢复，报告恢复耗时。
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+
+
+def fill(database, rows):
+    students = max(rows // 25, 1)
+    schedules = max(rows // 200, 1)
+    database.course_selections.insert_many({
+        'student_id': i % students + 1,
+        'schedule_id': (i * 7919) % schedules + 1,
+        'status': 'confirmed',
+        'selected_at': f'2024-09-{i % 28 + 1:02d}',
+    } for i in range(rows))
+
+
+def update_latency(database, writes):
+    """返回单次 update 的平均耗时（微秒）"""
+    table = database.course_selections
+    ids = [row['id'] for row in table.find('student_id', 1)] or [1]
+    started = time.perf_counter()
+    for i in range(writes):
+        table.update(ids[i % len(ids)], {'status': 'confirmed' if i % 2 else 'dropped'})
+    return (time.perf_counter() - started) / writes * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='持久化基准')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--writes', type=int, default=20_000)
+    parser.add_argument('--columnar', action='store_true', help='选课、成绩、评教使用列式存储')
+    args = parser.parse_args()
+
+    from models.models import MockDatabase
+    from models.persistence import Persistence
+
+    directory = tempfile.mkdtemp(prefix='edu-persist-')
+    try:
+        database = MockDatabase(columnar=args.columnar)
+        fill(database, args.rows)
+        plain = update_latency(database, args.writes)
+
+        persistence = Persistence(database, directory, compact_interval=0).open()
+        journaled = update_latency(database, args.writes)
+        started = time.perf_counter()
+        persistence.compact()
+        compact_seconds = time.perf_counter() - started
+        update_latency(database, args.writes)
+        persistence.close()
+
+        started = time.perf_counter()
+        restored = MockDatabase(columnar=args.columnar)
+        Persistence(restored, directory, compact_interval=0).open().close()
+        restore_seconds = time.perf_counter() - started
+        assert len(restored.course_selections) == len(database.course_selections)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(f'选课记录数: {args.rows:,}  存储: {"列式" if args.columnar else "行式"}')
+    print(f'  update 延迟  无日志 {plain:6.1f} µs   写日志 {journaled:6.1f} µs')
+    print(f'  生成快照     {compact_seconds:6.2f} s')
+    print(f'  重启恢复     {restore_seconds:6.2f} s（快照 + {args.writes:,} 条日志）')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,6 @@
 """
 数据库配置文件
-当前使用模拟数据，后续替换为真实 MySQL 连接
+默认使用模拟数据；USE_MOCK_DATA 为假时连接 SQLALCHEMY_DATABASE_URI 指定的数据库（MySQL 或 SQLite）
 """
 
 import os
@@ -9,7 +9,7 @@ class Config:
     """基础配置"""
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     
-    # MySQL 数据库配置（待替换）
+    # MySQL 数据库配置
     MYSQL_HOST = os.environ.get('MYSQL_HOST') or 'localhost'
     MYSQL_PORT = int(os.environ.get('MYSQL_PORT') or 3306)
     MYSQL_USER = os.environ.get('MYSQL_USER') or 'root'
@@ -17,11 +17,44 @@ class Config:
     MYSQL_DATABASE = os.environ.get('MYSQL_DATABASE') or 'education_system'
     
     # SQLAlchemy 配置
-    SQLALCHEMY_DATABASE_URI = f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DATABASE}"
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
+        f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DATABASE}"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # 数据库连接池大小
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE') or 8)
+    
     # 是否使用模拟数据
     USE_MOCK_DATA = True
+    
+    # 模拟数据中的选课、成绩、评教表是否使用列式存储（大数据量时显著降低内存占用）
+    MOCK_COLUMNAR_TABLES = os.environ.get('MOCK_COLUMNAR_TABLES', '0') == '1'
+    
+    # 合成数据规模系数：大于 0 时在种子数据之外按该规模生成学生、课程、选课等数据（1.0 约 250 万行）
+    MOCK_SCALE = float(os.environ.get('MOCK_SCALE') or 0)
+    MOCK_SEED = int(os.environ.get('MOCK_SEED') or 2024)
+    
+    # 模拟数据持久化目录：设置后写操作记入日志并定期生成快照，重启时恢复；为空则仅保存在内存中
+    PERSIST_DIR = os.environ.get('PERSIST_DIR') or None
+    # 日志组提交间隔（秒）：期间的写入合并为一次 fsync
+    JOURNAL_FLUSH_INTERVAL = float(os.environ.get('JOURNAL_FLUSH_INTERVAL') or 0.01)
+    # 快照压缩：达到时间间隔（秒）或日志大小（字节）时生成新快照
+    SNAPSHOT_INTERVAL = int(os.environ.get('SNAPSHOT_INTERVAL') or 300)
+    SNAPSHOT_JOURNAL_BYTES = int(os.environ.get('SNAPSHOT_JOURNAL_BYTES') or 64 * 1024 * 1024)
+    
+    # 模拟数据的查询结果缓存：最多条目数（0 表示关闭）与估算内存上限（字节）
+    QUERY_CACHE_ENTRIES = int(os.environ.get('QUERY_CACHE_ENTRIES') or 4096)
+    QUERY_CACHE_BYTES = int(os.environ.get('QUERY_CACHE_BYTES') or 64 * 1024 * 1024)
+    
+    # 自动排课：并行求解的最大进程数与单次求解的秒数上限
+    TIMETABLING_WORKERS = int(os.environ.get('TIMETABLING_WORKERS') or min(os.cpu_count() or 1, 4))
+    TIMETABLING_TIME_LIMIT = float(os.environ.get('TIMETABLING_TIME_LIMIT') or 60)
+    
+    # 导入成绩单时每批写入的行数
+    GRADE_IMPORT_CHUNK = int(os.environ.get('GRADE_IMPORT_CHUNK') or 500)
+    
+    # 后台任务（如批量安排监考）的工作线程数
+    BACKGROUND_JOB_WORKERS = int(os.environ.get('BACKGROUND_JOB_WORKERS') or 2)
 
 
 class DevelopmentConfig(Config):
@@ -36,9 +69,17 @@ class ProductionConfig(Config):
     USE_MOCK_DATA = False
 
 
+class SqliteConfig(Config):
+    """本地 SQLite 配置，用于在没有 MySQL 的环境下验证 SQL 后端"""
+    DEBUG = True
+    USE_MOCK_DATA = False
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///education_system.db'
+
+
 # 配置映射
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
+    'sqlite': SqliteConfig,
     'default': DevelopmentConfig
 }
@@ -0,0 +1,431 @@
+"""
+成绩分析
+按学生汇总学分加权平均绩点，计算班级、专业内的名次与百分位，以及各班级、专业的绩点与成绩分布。
+
+成绩保存为列数组（每条成绩一个位置：学生、学分、绩点、成绩、学期），一次计算用 NumPy 对全部学生向量化完成：
+bincount 按学生累加学分与学分 × 绩点；lexsort 按（组，绩点降序）排序后比较相邻元素得出组内名次（并列同名次）；
+成绩分段按（组 × BINS + 分段）bincount 计数。score_summary 对一门课的成绩做同样分段，并给出均值、中位数、标准差与及格率。
+
+GradeAnalytics 由数据表变更通知增量维护这些数组，改一条成绩只改写它所在的位置；
+计算结果按学期缓存，成绩等数据变化后在下次读取时重新计算。
+"""
+
+import threading
+
+import numpy as np
+
+
+BINS = 10           # 成绩分段：[0, 10)、[10, 20) …… [90, 100]
+PASS_SCORE = 60
+GROUPS = {'class': 'class_name', 'major': 'major'}
+
+
+class Cohorts:
+    """一次计算的结果：每名学生的加权平均绩点、班级与专业内的名次，每个班级、专业的分布（只读）
+
+    students 为 [(学生 id, 班级, 专业)]；owner、credit、gpa、score 为各条成绩的学生 id、学分、绩点、成绩
+    （成绩为空时为 NaN），学生 id 不在 students 中的成绩不计入。没有计学分成绩的学生不参与排名。
+    """
+
+    def __init__(self, students, owner, credit, gpa, score):
+        students = sorted(students, key=lambda s: s[0])
+        self._ids = np.fromiter((s[0] for s in students), dtype=np.int64, count=len(students))
+        n = len(students)
+        # 学生 id -> 位置的稠密查找表；末位保持 -1，不认识的 id 都映射到末位
+        index = np.full(int(self._ids[-1]) + 2 if n else 1, -1, dtype=np.int64)
+        index[self._ids] = np.arange(n)
+        slot = index[np.where((owner >= 0) & (owner < len(index)), owner, -1)]
+        known = slot >= 0
+        if not known.all():
+            slot, credit, gpa, score = slot[known], credit[known], gpa[known], score[known]
+
+        self.credits = np.bincount(slot, weights=credit, minlength=n)
+        points = np.bincount(slot, weights=credit * gpa, minlength=n)
+        self.ranked = self.credits > 0
+        # 舍入到 9 位小数，避免累加顺序带来的浮点误差把相同绩点排成先后
+        self.gpa = np.round(np.divide(points, self.credits, out=np.zeros(n), where=self.ranked), 9)
+
+        # 成绩分段与及格数先按学生汇总，各分组再按学生累加
+        scored = ~np.isnan(score)
+        values, owners = (score, slot) if scored.all() else (score[scored], slot[scored])
+        histogram = np.bincount(owners * BINS + score_bins(values), minlength=n * BINS).reshape(n, BINS)
+        passed = np.bincount(owners, weights=values >= PASS_SCORE, minlength=n)
+        self.groups = {by: _Grouping([s[i] for s in students], self.gpa, self.ranked, histogram, passed)
+                       for i, by in enumerate(GROUPS, start=1)}
+
+    def student(self, student_id):
+        """学生的加权平均绩点、已修学分及在班级、专业内的名次；学生不存在时返回 None
+
+        名次为 {'name': 班级或专业, 'rank': 名次, 'size': 参与排名人数, 'percentile': 绩点低于本人的人数占比（%）}，
+        没有成绩时 rank 与 percentile 为 None。
+        """
+        i = int(np.searchsorted(self._ids, student_id))
+        if i >= len(self._ids) or self._ids[i] != student_id:
+            return None
+        ranked = bool(self.ranked[i])
+        result = {'gpa': round(float(self.gpa[i]), 2), 'credits': _plain(self.credits[i])}
+        for by, grouping in self.groups.items():
+            code = grouping.codes[i]
+            size = int(grouping.size[code])
+            result[by] = {
+                'name': grouping.names[code],
+                'rank': int(grouping.rank[i]) if ranked else None,
+                'size': size,
+                'percentile': round(100 * float(grouping.below[i]) / size, 1) if ranked else None,
+            }
+        return result
+
+    def cohorts(self, by):
+        """各班级（by='class'）或专业（by='major'）的人数、绩点统计、及格率与成绩分段，按名称排序
+
+        列表在第一次读取时生成并随结果保存，调用方不得修改。
+        """
+        grouping = self.groups[by]
+        if grouping.summaries is None:
+            grouping.summaries = [grouping.summary(code) for code in range(len(grouping.names))]
+        return grouping.summaries
+
+    def cohort(self, by, name):
+        """一个班级或专业的统计；不存在时返回 None"""
+        grouping = self.groups[by]
+        code = grouping.code_of(name)
+        return None if code is None else grouping.summary(code)
+
+    def members(self, by, name, offset=0, limit=None):
+        """班级或专业内参与排名的学生，按名次排列，取第 offset 名起的 limit 人：
+        [{'student_id', 'gpa', 'credits', 'rank', 'percentile'}]
+        """
+        grouping = self.groups[by]
+        code = grouping.code_of(name)
+        if code is None:
+            return []
+        start, size = int(grouping.starts[code]), int(grouping.size[code])
+        end = start + size if limit is None else min(start + size, start + offset + limit)
+        return [{'student_id': int(self._ids[i]),
+                 'gpa': round(float(self.gpa[i]), 2),
+                 'credits': _plain(self.credits[i]),
+                 'rank': int(grouping.rank[i]),
+                 'percentile': round(100 * float(grouping.below[i]) / size, 1)}
+                for i in grouping.order[start + offset:end].tolist()]
+
+
+class _Grouping:
+    """按一个字段（班级或专业）分组的名次与分布"""
+
+    def __init__(self, labels, gpa, ranked, histogram, passed):
+        self.names = sorted({label or '' for label in labels})
+        self._codes = {name: code for code, name in enumerate(self.names)}
+        self.summaries = None
+        self.codes = np.fromiter((self._codes[label or ''] for label in labels), dtype=np.int64, count=len(labels))
+        k, n = len(self.names), len(labels)
+
+        # 参与排名的学生按（组，绩点降序）排序，组内每段相同绩点的起点即名次
+        members = np.flatnonzero(ranked)
+        self.order = members[np.lexsort((-gpa[members], self.codes[members]))]
+        g, v = self.codes[self.order], gpa[self.order]
+        m = len(self.order)
+        position = np.arange(m)
+        first = np.ones(m, dtype=bool)
+        first[1:] = g[1:] != g[:-1]
+        run = first.copy()
+        run[1:] |= v[1:] != v[:-1]
+        last = np.ones(m, dtype=bool)
+        last[:-1] = run[1:]
+        group_start = np.maximum.accumulate(np.where(first, position, 0)) if m else position
+        run_start = np.maximum.accumulate(np.where(run, position, 0)) if m else position
+        run_end = np.minimum.accumulate(np.where(last, position, m)[::-1])[::-1] + 1 if m else position
+
+        self.size = np.bincount(g, minlength=k)
+        self.starts = np.searchsorted(g, np.arange(k))
+        self.rank = np.zeros(n, dtype=np.int64)
+        self.rank[self.order] = run_start - group_start + 1
+        self.below = np.zeros(n, dtype=np.int64)
+        self.below[self.order] = group_start + self.size[g] - run_end
+
+        has = self.size > 0
+        lo = self.starts + (self.size - 1) // 2
+        hi = self.starts + self.size // 2
+        self.mean = np.divide(np.bincount(g, weights=v, minlength=k), self.size, out=np.zeros(k), where=has)
+        self.median, self.max, self.min = np.zeros(k), np.zeros(k), np.zeros(k)
+        self.median[has] = (v[lo[has]] + v[hi[has]]) / 2
+        self.max[has] = v[self.starts[has]]
+        self.min[has] = v[self.starts[has] + self.size[has] - 1]
+
+        cells = (self.codes[:, None] * BINS + np.arange(BINS)).ravel()
+        self.histogram = np.bincount(cells, weights=histogram.ravel(), minlength=k * BINS).reshape(k, BINS)
+        self.histogram = self.histogram.astype(np.int64)
+        self.scored = self.histogram.sum(axis=1)
+        self.passed = np.bincount(self.codes, weights=passed, minlength=k)
+
+    def code_of(self, name):
+        return self._codes.get(name)
+
+    def summary(self, code):
+        scored = int(self.scored[code])
+        return {
+            'name': self.names[code],
+            'students': int(self.size[code]),
+            'avg_gpa': round(float(self.mean[code]), 2),
+            'median_gpa': round(float(self.median[code]), 2),
+            'max_gpa': round(float(self.max[code]), 2),
+            'min_gpa': round(float(self.min[code]), 2),
+            'grade_count': scored,
+            'pass_rate': round(float(self.passed[code]) / scored, 4) if scored else 0.0,
+            'histogram': self.histogram[code].tolist(),
+        }
+
+
+def score_bins(values):
+    """各成绩所在的分段序号（0～BINS-1），满分计入最后一段"""
+    return np.clip(values // (100 / BINS), 0, BINS - 1).astype(np.int64)
+
+
+def score_summary(scores):
+    """一组成绩的人数、平均分、中位数、标准差（总体）、最高与最低分、及格率和 10 分一段的分布
+
+    scores 中的 None 不计入；没有成绩时各统计量为 None，分布全为 0。
+    """
+    values = np.fromiter((score for score in scores if score is not None), dtype=np.float64)
+    histogram = np.bincount(score_bins(values), minlength=BINS).tolist()
+    if not len(values):
+        return {'count': 0, 'mean': None, 'median': None, 'std': None, 'max': None, 'min': None,
+                'pass_rate': None, 'histogram': histogram}
+    return {
+        'count': len(values),
+        'mean': round(float(values.mean()), 2),
+        'median': _plain(np.median(values)),
+        'std': round(float(values.std()), 2),
+        'max': _plain(values.max()),
+        'min': _plain(values.min()),
+        'pass_rate': round(float(np.count_nonzero(values >= PASS_SCORE)) / len(values), 4),
+        'histogram': histogram,
+    }
+
+
+def _plain(value):
+    """数组中的学分、成绩转为 JSON 数值，整数值返回 int"""
+    value = float(value)
+    return int(value) if value.is_integer() else round(value, 1)
+
+
+class GradeAnalytics:
+    """成绩分析的列数组，由 students、courses、schedules、course_selections、grades 的变更通知增量维护
+
+    与 StatisticsCounters 一样，回调只使用视图保存的副本：学生 -> (班级, 专业)、选课 -> (学生, 排课)、
+    排课 -> (课程, 学期)、课程 -> 学分。新增或修改成绩只改写该成绩的位置；
+    选课、排课、课程修改了已有成绩所依赖的字段时，标记为过期，下次读取前按副本重新推导全部位置。
+    与排名无关的变更（如排课换教室、新增选课）不作废已算好的结果。
+    """
+
+    def __init__(self, database):
+        self._db = database
+        self._lock = threading.Lock()
+        self.rebuild()
+        database.students.subscribe(self._on_student)
+        database.courses.subscribe(self._on_course)
+        database.schedules.subscribe(self._on_schedule)
+        database.course_selections.subscribe(self._on_selection)
+        database.grades.subscribe(self._on_grade)
+
+    # ---------- 读 ----------
+
+    def result(self, semester=None):
+        """全体学生的 Cohorts；semester 为空时统计全部学期"""
+        with self._lock:
+            cohorts = self._results.get(semester)
+            if cohorts is None:
+                if self._stale:
+                    self._derive_all()
+                columns = [column[:self._size] for column in (self._owner, self._credit, self._gpa, self._score)]
+                # 没有空位且不限学期时直接使用数组切片，免去按掩码复制
+                if self._free or semester is not None:
+                    used = self._live[:self._size]
+                    if semester is not None:
+                        used = used & (self._term[:self._size] == self._terms.get(semester, -2))
+                    columns = [column[used] for column in columns]
+                cohorts = Cohorts([(sid, *labels) for sid, labels in self._students.items()], *columns)
+                self._results[semester] = cohorts
+            return cohorts
+
+    # ---------- 维护 ----------
+
+    def rebuild(self):
+        """从数据表全量重建"""
+        db = self._db
+        students, courses, schedules = db.students.all(), db.courses.all(), db.schedules.all()
+        selections, grades = db.course_selections.all(), db.grades.all()
+        with self._lock:
+            self._students = {s['id']: (s['class_name'], s['major']) for s in students}
+            self._credits = {c['id']: c['credit'] for c in courses}
+            self._schedules = {s['id']: (s['course_id'], s['semester']) for s in schedules}
+            self._selections = {s['id']: (s['student_id'], s['schedule_id']) for s in selections}
+            self._terms = {}
+            n = len(grades)
+            self._slots = {g['id']: i for i, g in enumerate(grades)}
+            self._free = []
+            self._size = n
+            self._live = np.ones(n, dtype=bool)
+            self._selection = np.fromiter((g['selection_id'] or -1 for g in grades), dtype=np.int64, count=n)
+            self._gpa = np.fromiter((g['gpa'] or 0.0 for g in grades), dtype=np.float64, count=n)
+            self._score = np.fromiter((np.nan if g['score'] is None else g['score'] for g in grades),
+                                      dtype=np.float64, count=n)
+            self._owner = np.full(n, -1, dtype=np.int64)
+            self._credit = np.zeros(n)
+            self._term = np.full(n, -1, dtype=np.int32)
+            self._derive_all()
+
+    def _derive_all(self):
+        """按副本重新推导全部位置的学生、学分与学期（调用方持有 _lock）"""
+        size = self._size
+        selection_ids, (owners, schedule_ids) = _arrays(self._selections, 2)
+        found, at = _lookup(selection_ids, self._selection[:size])
+        schedule_of = np.where(found, schedule_ids[at], -1)
+        schedule_keys, (course_ids, terms) = _arrays(
+            {key: (course, self._terms.setdefault(semester, len(self._terms)))
+             for key, (course, semester) in self._schedules.items()}, 2)
+        scheduled, at_schedule = _lookup(schedule_keys, schedule_of)
+        course_keys, (credits,) = _arrays({key: (credit,) for key, credit in self._credits.items()}, 1,
+                                          np.float64, missing=0.0)
+        credited, at_course = _lookup(course_keys, np.where(scheduled, course_ids[at_schedule], -1))
+
+        self._owner[:size] = np.where(scheduled, owners[at], -1)
+        self._term[:size] = np.where(scheduled, terms[at_schedule], -1)
+        self._credit[:size] = np.where(credited, credits[at_course], 0.0)
+        self._orphans = set(np.flatnonzero(self._live[:size] & ~scheduled).tolist())
+        self._stale = False
+        self._results = {}
+
+    def _derive(self, slot):
+        """由选课、排课、课程副本推导一个位置的学生、学分与学期（调用方持有 _lock）"""
+        selection = self._selections.get(int(self._selection[slot]))
+        schedule = self._schedules.get(selection[1]) if selection else None
+        if schedule is None:
+            self._owner[slot], self._credit[slot], self._term[slot] = -1, 0.0, -1
+            self._orphans.add(slot)
+            return
+        self._orphans.discard(slot)
+        self._owner[slot] = selection[0] if selection[0] is not None else -1
+        self._credit[slot] = self._credits.get(schedule[0]) or 0.0
+        self._term[slot] = self._terms.setdefault(schedule[1], len(self._terms))
+
+    def _allocate(self):
+        if self._free:
+            return self._free.pop()
+        if self._size == len(self._live):
+            grow = max(1024, len(self._live))
+            self._live = np.concatenate([self._live, np.zeros(grow, dtype=bool)])
+            self._selection = np.concatenate([self._selection, np.full(grow, -1, dtype=np.int64)])
+            self._gpa = np.concatenate([self._gpa, np.zeros(grow)])
+            self._score = np.concatenate([self._score, np.full(grow, np.nan)])
+            self._owner = np.concatenate([self._owner, np.full(grow, -1, dtype=np.int64)])
+            self._credit = np.concatenate([self._credit, np.zeros(grow)])
+            self._term = np.concatenate([self._term, np.full(grow, -1, dtype=np.int32)])
+        self._size += 1
+        return self._size - 1
+
+    # ---------- 变更回调 ----------
+
+    def _on_grade(self, old, new):
+        if old is None and new is None:
+            return self.rebuild()
+        with self._lock:
+            if new is None:
+                slot = self._slots.pop(old['id'], None)
+                if slot is not None:
+                    self._live[slot] = False
+                    self._orphans.discard(slot)
+                    self._free.append(slot)
+            else:
+                slot = self._slots.get(new['id'])
+                if slot is None:
+                    slot = self._slots[new['id']] = self._allocate()
+                    self._live[slot] = True
+                self._selection[slot] = new['selection_id'] if new['selection_id'] is not None else -1
+                self._gpa[slot] = new['gpa'] or 0.0
+                self._score[slot] = np.nan if new['score'] is None else new['score']
+                if not self._stale:
+                    self._derive(slot)
+            self._results = {}
+
+    def _on_student(self, old, new):
+        if old is None and new is None:
+            return self.rebuild()
+        with self._lock:
+            if new is None:
+                self._students.pop(old['id'], None)
+            else:
+                self._students[new['id']] = (new['class_name'], new['major'])
+            self._results = {}
+
+    def _on_course(self, old, new):
+        if old is None and new is None:
+            return self.rebuild()
+        self._on_reference(self._credits, old, new, ('credit',), lambda row: row['credit'])
+
+    def _on_schedule(self, old, new):
+        if old is None and new is None:
+            return self.rebuild()
+        self._on_reference(self._schedules, old, new, ('course_id', 'semester'),
+                           lambda row: (row['course_id'], row['semester']))
+
+    def _on_selection(self, old, new):
+        if old is None and new is None:
+            return self.rebuild()
+        with self._lock:
+            row = new or old
+            if new is None:
+                self._selections.pop(old['id'], None)
+            else:
+                self._selections[new['id']] = (new['student_id'], new['schedule_id'])
+            if self._stale:
+                return
+            if old is not None:
+                # 选课被删除或改了学生、排课：只重新推导该选课的成绩（通常没有）
+                slots = np.flatnonzero(self._live[:self._size] & (self._selection[:self._size] == row['id']))
+                for slot in slots.tolist():
+                    self._derive(slot)
+                if len(slots):
+                    self._results = {}
+            elif self._orphans:
+                self._rederive_orphans()
+
+    def _on_reference(self, copies, old, new, fields, value):
+        """更新排课或课程的副本；删除或修改了已有成绩所依赖的字段时标记过期，新增的行可能补上此前无法推导的成绩"""
+        with self._lock:
+            if new is None:
+                copies.pop(old['id'], None)
+            else:
+                copies[new['id']] = value(new)
+            if new is None or (old is not None and any(old[f] != new[f] for f in fields)):
+                self._stale = True
+                self._results = {}
+            elif old is None and self._orphans and not self._stale:
+                self._rederive_orphans()
+
+    def _rederive_orphans(self):
+        """此前缺少选课或排课而无法推导的位置重新推导（调用方持有 _lock）"""
+        for slot in list(self._orphans):
+            self._derive(slot)
+        self._results = {}
+
+
+_SENTINEL = np.iinfo(np.int64).min
+
+
+def _arrays(mapping, width, dtype=np.int64, missing=-1):
+    """{id: (值, ...)} 转为 id 数组与各列数组，空值记为 missing；末尾附一个不会被查到的占位项，数组不为空"""
+    n = len(mapping)
+    keys = np.append(np.fromiter(mapping, dtype=np.int64, count=n), _SENTINEL)
+    columns = tuple(np.append(np.fromiter((missing if v[i] is None else v[i] for v in mapping.values()),
+                                          dtype=dtype, count=n), missing)
+                    for i in range(width))
+    return keys, columns
+
+
+def _lookup(keys, query):
+    """query 中各 id 在 keys 中的位置：返回 (是否找到, 位置)，找不到的位置为 0"""
+    order = np.argsort(keys, kind='stable')
+    at = np.minimum(np.searchsorted(keys, query, sorter=order), len(keys) - 1)
+    at = order[at]
+    found = keys[at] == query
+    return found, np.where(found, at, 0)
@@ -0,0 +1,252 @@
+"""
+教室占用索引
+把每间教室的排课（按星期、节次、周次重复）、考试与已批准的借用合并为区间索引，
+借用审批时检查冲突、按日期与时段查找空闲教室都只需在少数几个有序列表上二分，不必扫描全部记录。
+
+- 排课：按教室与学期分组，以“一周内的分钟数”（星期一 0 点起）建区间；查询时先算出该日期是各学期的第几周，
+  只查在该日期上课的学期，命中后核对周次。学期代码无法识别时与 teaching_span 一样按每周都上课处理；
+- 考试与借用：按 exam_span 的绝对分钟数建区间。考试、排课以教室号关联，借用以教室 id 关联。
+"""
+
+import threading
+from bisect import bisect_left, insort
+from collections import Counter
+from datetime import date
+
+from models.exams import exam_span
+from models.timetable import period_span
+from models.weeks import ALL_WEEKS, MAX_WEEK, parse_weeks, semester_start, week_of
+
+
+class IntervalIndex:
+    """区间集合：按起点排序的 (start, end, key) 列表，并记录最长的区间长度
+
+    与 [start, end) 重叠的区间，其起点必然落在 (start - 最长长度, end) 内，
+    二分定位这一段后只需检查段内的区间，查询为 O(log n + 段内区间数)。
+    删除后不回退最长长度，只会让检查的段略长，不影响结果。
+    """
+
+    __slots__ = ('_items', '_longest')
+
+    def __init__(self, items=()):
+        self._items = sorted(items)
+        self._longest = max((end - start for start, end, _ in self._items), default=0)
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, start, end, key):
+        insort(self._items, (start, end, key))
+        self._longest = max(self._longest, end - start)
+
+    def remove(self, start, end, key):
+        item = (start, end, key)
+        i = bisect_left(self._items, item)
+        if i < len(self._items) and self._items[i] == item:
+            del self._items[i]
+
+    def overlapping(self, start, end):
+        """与 [start, end) 重叠的区间的 key"""
+        items = self._items
+        lo = bisect_left(items, (start - self._longest + 1,))
+        hi = bisect_left(items, (end,))
+        return [key for _, item_end, key in items[lo:hi] if item_end > start]
+
+
+def weekly_span(schedule):
+    """排课在一周内的时间区间（自星期一 0 点起的分钟数），星期或节次无效时返回 None"""
+    span = period_span(schedule.get('start_period'), schedule.get('end_period'))
+    try:
+        weekday = int(schedule.get('weekday'))
+    except (TypeError, ValueError):
+        return None
+    if span is None or not 1 <= weekday <= 7:
+        return None
+    return (weekday - 1) * 1440 + span[0], (weekday - 1) * 1440 + span[1]
+
+
+class RoomAvailability:
+    """按教室维护的占用索引，由 schedules、exam_arrangements、classroom_borrow_records、classrooms 的变更通知增量维护
+
+    与 ScheduleView 一样，索引保存所需行的副本，变更回调不读其他表。
+    数据表更新时原地修改行，所以这里必须保存行的拷贝，删除旧区间时才能按旧的教室、时段与状态定位。
+    """
+
+    def __init__(self, database):
+        self._db = database
+        self._lock = threading.Lock()
+        self.rebuild()
+        database.schedules.subscribe(self._on_schedule)
+        database.exam_arrangements.subscribe(self._on_exam)
+        database.classroom_borrow_records.subscribe(self._on_borrow)
+        database.classrooms.subscribe(self._on_classroom)
+
+    # ---------- 读 ----------
+
+    def conflicts(self, classroom_id, day, start_time, end_time, exclude_borrow_id=None):
+        """教室在 day 的 [start_time, end_time) 内的排课、考试与已批准的借用
+
+        返回 [{'kind': 'teaching' / 'exam' / 'borrow', 'row': 对应的行}]；日期或时间无效时抛出 ValueError
+        """
+        span, weekly = query_spans(day, start_time, end_time)
+        with self._lock:
+            classroom = self._classrooms.get(classroom_id)
+            if classroom is None:
+                return []
+            terms = self._terms(day)
+            return self._conflicts(classroom, terms, span, weekly, exclude_borrow_id, first=False)
+
+    def free(self, day, start_time, end_time, building=None, min_capacity=None, room_type=None):
+        """day 的 [start_time, end_time) 内空闲、且满足楼宇、最小容量、类型条件的教室，按 id 排序"""
+        span, weekly = query_spans(day, start_time, end_time)
+        with self._lock:
+            terms = self._terms(day)
+            return [dict(classroom) for classroom in self._classrooms.values()
+                    if (building is None or classroom['building'] == building)
+                    and (min_capacity is None or (classroom['capacity'] or 0) >= min_capacity)
+                    and (room_type is None or classroom['type'] == room_type)
+                    and not self._conflicts(classroom, terms, span, weekly, None, first=True)]
+
+    def _terms(self, day):
+        """在 day 可能上课的学期及 day 是其第几周（学期代码无法识别时为 None）；调用方持有 _lock"""
+        result = []
+        for semester in self._semesters:
+            start = semester_start(semester)
+            if start is None:
+                result.append((semester, None))
+            else:
+                week = week_of(start, day)
+                if 1 <= week <= MAX_WEEK:
+                    result.append((semester, week))
+        return result
+
+    def _conflicts(self, classroom, terms, span, weekly, exclude_borrow_id, first):
+        """调用方持有 _lock；first 为真时找到一项即返回"""
+        result = []
+        for semester, week in terms:
+            index = self._weekly.get((classroom['room_no'], semester))
+            if index is None:
+                continue
+            for schedule_id in index.overlapping(*weekly):
+                if week is None or week in self._weeks[schedule_id]:
+                    result.append({'kind': 'teaching', 'row': self._schedules[schedule_id]})
+                    if first:
+                        return result
+        index = self._exams.get(classroom['room_no'])
+        if index is not None:
+            for exam_id in index.overlapping(*span):
+                result.append({'kind': 'exam', 'row': self._exam_rows[exam_id]})
+                if first:
+                    return result
+        index = self._borrows.get(classroom['id'])
+        if index is not None:
+            for borrow_id in index.overlapping(*span):
+                if borrow_id != exclude_borrow_id:
+                    result.append({'kind': 'borrow', 'row': self._borrow_rows[borrow_id]})
+                    if first:
+                        return result
+        return result
+
+    # ---------- 维护 ----------
+
+    def rebuild(self):
+        """从数据表全量重建"""
+        db = self._db
+        schedules, exams = db.schedules.all(), db.exam_arrangements.all()
+        borrows, classrooms = db.classroom_borrow_records.all(), db.classrooms.all()
+        weekly, dated, lent = {}, {}, {}
+        with self._lock:
+            self._classrooms = {c['id']: dict(c) for c in classrooms}
+            self._schedules, self._exam_rows, self._borrow_rows = {}, {}, {}
+            self._weeks, self._semesters = {}, Counter()
+            for schedule in map(dict, schedules):
+                span = weekly_span(schedule)
+                if span is not None:
+                    self._add_schedule(schedule)
+                    weekly.setdefault(_term_room(schedule), []).append((*span, schedule['id']))
+            for exam in map(dict, exams):
+                span = exam_span(exam)
+                if span is not None:
+                    self._exam_rows[exam['id']] = exam
+                    dated.setdefault(exam['classroom'], []).append((*span, exam['id']))
+            for borrow in map(dict, borrows):
+                span = _approved_span(borrow)
+                if span is not None:
+                    self._borrow_rows[borrow['id']] = borrow
+                    lent.setdefault(borrow['classroom_id'], []).append((*span, borrow['id']))
+            self._weekly = {room: IntervalIndex(items) for room, items in weekly.items()}
+            self._exams = {room: IntervalIndex(items) for room, items in dated.items()}
+            self._borrows = {room: IntervalIndex(items) for room, items in lent.items()}
+
+    def _add_schedule(self, schedule):
+        self._schedules[schedule['id']] = schedule
+        self._semesters[schedule['semester']] += 1
+        try:
+            self._weeks[schedule['id']] = parse_weeks(schedule.get('weeks'))
+        except (TypeError, ValueError):
+            self._weeks[schedule['id']] = ALL_WEEKS
+
+    def _update(self, rows, indexes, span_of, room_of, old, new):
+        """用新旧行更新一类区间（调用方持有 _lock）"""
+        if old is not None and old['id'] in rows:
+            stored = rows.pop(old['id'])
+            index, span = indexes.get(room_of(stored)), span_of(stored)
+            if index is not None and span is not None:
+                index.remove(*span, stored['id'])
+        span = span_of(new) if new is not None else None
+        if span is not None:
+            rows[new['id']] = dict(new)
+            indexes.setdefault(room_of(new), IntervalIndex()).add(*span, new['id'])
+
+    # ---------- 变更回调 ----------
+
+    def _on_schedule(self, old, new):
+        if old is None and new is None:
+            return self.rebuild()
+        with self._lock:
+            if old is not None and old['id'] in self._schedules:
+                self._semesters[self._schedules[old['id']]['semester']] -= 1
+                self._weeks.pop(old['id'])
+            self._update(self._schedules, self._weekly, weekly_span, _term_room, old, new)
+            if new is not None and new['id'] in self._schedules:
+                self._add_schedule(self._schedules[new['id']])
+            self._semesters += Counter()     # 去掉计数为 0 的学期
+
+    def _on_exam(self, old, new):
+        if old is None and new is None:
+            return self.rebuild()
+        with self._lock:
+            self._update(self._exam_rows, self._exams, exam_span, lambda row: row['classroom'], old, new)
+
+    def _on_borrow(self, old, new):
+        if old is None and new is None:
+            return self.rebuild()
+        with self._lock:
+            self._update(self._borrow_rows, self._borrows, _approved_span, lambda row: row['classroom_id'],
+                         old, new)
+
+    def _on_classroom(self, old, new):
+        if old is None and new is None:
+            return self.rebuild()
+        with self._lock:
+            if new is None:
+                self._classrooms.pop(old['id'], None)
+            else:
+                self._classrooms[new['id']] = dict(new)
+
+
+def _term_room(schedule):
+    return schedule['classroom'], schedule['semester']
+
+
+def _approved_span(borrow):
+    return exam_span(borrow) if borrow['status'] == 'approved' else None
+
+
+def query_spans(day, start_time, end_time):
+    """查询时段的绝对区间与一周内的区间；日期或时间无效时抛出 ValueError"""
+    span = exam_span({'date': day, 'start_time': start_time, 'end_time': end_time})
+    if span is None:
+        raise ValueError('日期或时间格式错误')
+    offset = (date.fromisoformat(day).isoweekday() - 1) * 1440 - span[0] // 1440 * 1440
+    return span, (span[0] + offset, span[1] + offset)
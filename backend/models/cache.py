@@ -0,0 +1,124 @@
+"""
+查询结果缓存
+以 (查询方法, 参数) 为键缓存查询结果，并记录计算时所依赖各表的版本号；
+任一依赖表发生写入后版本号改变，旧结果不再命中，下次读取时重新计算（读穿透）。
+按最近最少使用淘汰，同时受条目数与估算内存上限约束
+"""
+
+import functools
+import sys
+import threading
+from collections import OrderedDict
+
+
+# 估算列表大小时最多抽样的元素个数
+_SAMPLE = 32
+
+
+def estimate_size(value, depth=3):
+    """粗略估算对象占用的字节数
+
+    逐层累加容器与元素的 sys.getsizeof；元素较多的列表只抽样前 _SAMPLE 个再按比例放大，
+    估算开销与结果大小无关。行字典被多个结果共享时会重复计入，估算值偏大。
+    """
+    size = sys.getsizeof(value)
+    if depth <= 0:
+        return size
+    if isinstance(value, dict):
+        return size + sum(estimate_size(v, depth - 1) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        if not value:
+            return size
+        sample = value[:_SAMPLE]
+        return size + sum(estimate_size(v, depth - 1) for v in sample) * len(value) // len(sample)
+    return size
+
+
+class QueryCache:
+    """带版本校验的 LRU 查询缓存
+
+    条目为 键 -> (依赖表版本, 结果, 估算字节数)。读取时版本一致即命中；
+    不一致说明依赖表已被修改，重新计算并替换该条目。
+    缓存的结果由所有调用方共享，调用方不得修改。
+    """
+
+    def __init__(self, max_entries=4096, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_compute(self, key, versions, compute):
+        """取出键对应且版本一致的结果，否则调用 compute 计算并写入缓存
+
+        versions 必须在 compute 之前读取：这样并发写入最多让结果比版本号更新，
+        而不会把旧数据登记在新版本下。
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == versions:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        value = compute()
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return value
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (versions, value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        """清空缓存（保留命中统计）"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """命中统计与当前占用"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes
+            }
+
+
+def cached_query(*table_names):
+    """把 Database 的查询方法声明为可缓存，table_names 为其结果依赖的数据表
+
+    数据库未配置 query_cache 时直接调用原方法。
+    """
+    def decorate(method):
+        name = method.__name__
+
+        @functools.wraps(method)
+        def wrapper(self, *args):
+            cache = self.query_cache
+            if cache is None:
+                return method(self, *args)
+            versions = self.table_versions(table_names)
+            return cache.get_or_compute((name, args), versions, lambda: method(self, *args))
+
+        wrapper.tables = table_names
+        return wrapper
+    return decorate
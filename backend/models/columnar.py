@@ -0,0 +1,268 @@
+"""
+列式数据表
+为选课、成绩、评教等百万级大表提供紧凑的内存布局：
+每个字段一列，数值存放在 array 中，状态之类的取值有限的字符串编码为整数
+"""
+
+import math
+import sys
+from array import array
+
+from models.table import Table, _MISSING
+
+
+_INT_NULL = -2 ** 63
+
+
+class IntColumn:
+    """整数列，array('q')，空值用最小值表示"""
+
+    def __init__(self):
+        self.data = array('q')
+
+    def grow(self, size):
+        self.data.frombytes(bytes((size - len(self.data)) * self.data.itemsize))
+
+    def get(self, slot):
+        value = self.data[slot]
+        return None if value == _INT_NULL else value
+
+    def set(self, slot, value):
+        if value is None:
+            value = _INT_NULL
+        elif not isinstance(value, int):
+            number = float(value)
+            if not number.is_integer():
+                raise TypeError(f'整数列不能存放 {value!r}')
+            value = int(number)
+        self.data[slot] = value
+
+
+class FloatColumn:
+    """浮点列，array('d')，空值用 NaN 表示"""
+
+    def __init__(self):
+        self.data = array('d')
+
+    def grow(self, size):
+        self.data.frombytes(bytes((size - len(self.data)) * self.data.itemsize))
+
+    def get(self, slot):
+        value = self.data[slot]
+        return None if math.isnan(value) else value
+
+    def set(self, slot, value):
+        self.data[slot] = math.nan if value is None else float(value)
+
+
+class NumberColumn(FloatColumn):
+    """数值列：与浮点列存储相同，整数值读出时还原为 int（如百分制成绩）"""
+
+    def get(self, slot):
+        value = self.data[slot]
+        if math.isnan(value):
+            return None
+        return int(value) if value.is_integer() else value
+
+
+class CategoryColumn:
+    """字典编码列：取值驻留在词表中，每行只存 4 字节编号，编号 0 表示空值"""
+
+    def __init__(self):
+        self.data = array('I')
+        self.values = [None]
+        self.codes = {None: 0}
+
+    def grow(self, size):
+        self.data.frombytes(bytes((size - len(self.data)) * self.data.itemsize))
+
+    def get(self, slot):
+        return self.values[self.data[slot]]
+
+    def set(self, slot, value):
+        code = self.codes.get(value)
+        if code is None:
+            if isinstance(value, str):
+                value = sys.intern(value)
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        self.data[slot] = code
+
+
+class TextColumn:
+    """自由文本列，直接保存对象引用"""
+
+    def __init__(self):
+        self.data = []
+
+    def grow(self, size):
+        self.data.extend([None] * (size - len(self.data)))
+
+    def get(self, slot):
+        return self.data[slot]
+
+    def set(self, slot, value):
+        self.data[slot] = value
+
+
+COLUMN_TYPES = {
+    'int': IntColumn,
+    'float': FloatColumn,
+    'number': NumberColumn,
+    'category': CategoryColumn,
+    'text': TextColumn,
+}
+
+
+class ColumnarTable(Table):
+    """列式存储的数据表，接口与 Table 一致
+
+    schema 为 字段 -> 列类型（int / float / number / category / text）。
+    主键直接作为列下标（主键由 Sequence 连续分配），不需要额外的 id -> 行 映射；
+    二级索引的桶是 array('q') 形式的 id 列表。schema 之外的字段存放在稀疏的附加字典中。
+
+    与 Table 不同，读取返回的是按需组装的新字典，修改它不会影响表中数据。
+    """
+
+    def __init__(self, name, schema, rows=(), indexes=()):
+        self._schema = [(field, COLUMN_TYPES[kind]) for field, kind in schema.items()]
+        super().__init__(name, rows, indexes)
+
+    def __len__(self):
+        return self._count
+
+    def memory_usage(self):
+        """列与索引占用的字节数（不含 Python 对象头），用于观察内存占用"""
+        total = len(self._present)
+        for column in self._columns.values():
+            data = column.data
+            total += len(data) * data.itemsize if isinstance(data, array) else sys.getsizeof(data)
+        for index in self._indexes.values():
+            total += sum(len(bucket) * bucket.itemsize for bucket in index.values())
+        return total
+
+    # ---------- 存储实现 ----------
+
+    def _clear(self):
+        self._columns = {field: column_type() for field, column_type in self._schema}
+        self._present = bytearray()
+        self._extra = {}
+        self._count = 0
+
+    def _has(self, row_id):
+        return isinstance(row_id, int) and 0 <= row_id < len(self._present) and self._present[row_id] == 1
+
+    def _fetch(self, row_id):
+        if not self._has(row_id):
+            return None
+        return self._materialize(row_id)
+
+    def _materialize(self, slot):
+        row = {'id': slot}
+        for field, column in self._columns.items():
+            row[field] = column.get(slot)
+        extra = self._extra.get(slot)
+        if extra:
+            row.update(extra)
+        return row
+
+    def _scan(self):
+        present = self._present
+        return [self._materialize(slot) for slot in range(len(present)) if present[slot]]
+
+    def _bucket_rows(self, bucket, limit=None):
+        slots = bucket if limit is None else bucket[:limit]
+        return [self._materialize(slot) for slot in slots]
+
+    def _ensure_capacity(self, row_id):
+        if not isinstance(row_id, int) or row_id < 0:
+            raise ValueError(f'{self.name}: 列式表的主键必须是非负整数，收到 {row_id!r}')
+        size = len(self._present)
+        if row_id < size:
+            return
+        size = max(row_id + 1, size + (size >> 1), 1024)
+        self._present.extend(bytes(size - len(self._present)))
+        for column in self._columns.values():
+            column.grow(size)
+
+    def _write_field(self, slot, field, value):
+        column = self._columns.get(field)
+        if column is not None:
+            column.set(slot, None if value is _MISSING else value)
+            return
+        extra = self._extra.setdefault(slot, {})
+        if value is _MISSING:
+            extra.pop(field, None)
+        else:
+            extra[field] = value
+        if not extra:
+            del self._extra[slot]
+
+    def _insert_row(self, row):
+        row_id = row['id']
+        self._ensure_capacity(row_id)
+        for field, column in self._columns.items():
+            column.set(row_id, row.get(field))
+        for field, value in row.items():
+            if field != 'id' and field not in self._columns:
+                self._write_field(row_id, field, value)
+        self._present[row_id] = 1
+        self._count += 1
+        for field in self._indexes:
+            self._index_add(field, self._value(row_id, field), row_id, None)
+        return self._materialize(row_id)
+
+    def _update_row(self, row_id, changes):
+        old = self._materialize(row_id)
+        for field, value in changes.items():
+            self._write_field(row_id, field, value)
+        for field in self._indexes:
+            if field in changes and changes[field] != old.get(field):
+                self._index_discard(field, old.get(field), row_id)
+                self._index_add(field, self._value(row_id, field), row_id, None)
+        return self._materialize(row_id)
+
+    def _delete_row(self, row_id):
+        if not self._has(row_id):
+            return None
+        row = self._materialize(row_id)
+        for field in self._indexes:
+            self._index_discard(field, row.get(field), row_id)
+        for column in self._columns.values():
+            column.set(row_id, None)
+        self._extra.pop(row_id, None)
+        self._present[row_id] = 0
+        self._count -= 1
+        return row
+
+    def _value(self, slot, field):
+        column = self._columns.get(field)
+        if column is not None:
+            return column.get(slot)
+        return self._extra.get(slot, {}).get(field)
+
+    # ---------- 索引实现 ----------
+
+    def _bucket(self, field, value):
+        index = self._indexes.get(field)
+        if index is None:
+            raise KeyError(f'{self.name}.{field} 未建立索引')
+        return index.get(value, ())
+
+    def _index_add(self, field, key, row_id, row):
+        index = self._indexes[field]
+        bucket = index.get(key)
+        if bucket is None:
+            bucket = index[key] = array('q')
+        bucket.append(row_id)
+
+    def _index_discard(self, field, key, row_id):
+        index = self._indexes[field]
+        bucket = index.get(key)
+        if bucket is not None:
+            try:
+                bucket.remove(row_id)
+            except ValueError:
+                return
+            if not bucket:
+                del index[key]
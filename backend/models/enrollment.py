@@ -0,0 +1,260 @@
+"""
+选课引擎
+按排课维护已选人数与容量，按学生维护已选排课集合与课表占用位图，选课 / 退课均为 O(1)；
+选课高峰期大量并发请求下保证不超员、不重复选课、不与已选课程时间冲突
+"""
+
+import threading
+
+from models.locking import StripedLock
+from models.timetable import schedule_mask
+
+
+# 选课结果
+ENROLLED = 'enrolled'
+DUPLICATE = 'duplicate'
+FULL = 'full'
+NOT_FOUND = 'not_found'
+CONFLICT = 'conflict'
+
+
+class EnrollmentEngine:
+    """选课引擎
+
+    排课容量优先取排课自身的 capacity 字段，未设置时取其教室（按教室号）的 capacity，
+    两者都没有时不限人数。已选人数与学生已选集合由 course_selections 的变更通知维护，
+    因此绕过引擎的写入（如批量导入、回滚）同样会反映到计数中。
+
+    时间冲突：每个排课编译为 models.timetable 的占用位图，不同的位图只保存一份（_patterns），
+    排课记录其编号；学生每学期的占用为已选排课位图的并集，首次用到时计算并随选课增量更新，
+    选课时与新排课的位图做一次按位与即可判断冲突。
+
+    并发控制：同一学生的请求先由 database.row_lock('student', 学生 id) 串行化，用于去重；
+    同一排课的选课再由引擎自己的分段锁串行化，在持有该锁时检查余量并写入选课记录，
+    写入触发的变更通知在返回前更新计数，下一个请求看到的一定是最新人数。
+    两类锁总是按“学生 → 排课”的顺序获取，引擎的分段锁不与 row_lock 共用，不会互相等待成环。
+    """
+
+    def __init__(self, database, stripes=1024):
+        self._db = database
+        self._lock = threading.Lock()
+        self._seat_locks = StripedLock(stripes)
+        self.rebuild()
+        database.course_selections.subscribe(self._on_selection)
+        database.schedules.subscribe(self._on_schedule)
+        database.classrooms.subscribe(self._on_classroom)
+
+    # ---------- 读 ----------
+
+    def capacity(self, schedule_id):
+        """排课容量，不限人数时返回 None"""
+        with self._lock:
+            return self._capacity(schedule_id)
+
+    def enrolled(self, schedule_id):
+        """排课已选人数"""
+        return self._enrolled.get(schedule_id, 0)
+
+    def seats(self, schedule_id):
+        """排课的容量、已选人数与余量，排课不存在时返回 None"""
+        with self._lock:
+            if schedule_id not in self._rooms:
+                return None
+            capacity = self._capacity(schedule_id)
+            enrolled = self._enrolled.get(schedule_id, 0)
+            return {
+                'capacity': capacity,
+                'enrolled': enrolled,
+                'remaining': max(capacity - enrolled, 0) if capacity is not None else None
+            }
+
+    def selection_id(self, student_id, schedule_id):
+        """学生在该排课的选课记录 id，未选时返回 None"""
+        return self._selected.get(student_id, {}).get(schedule_id)
+
+    def conflicts(self, student_id, schedule_ids):
+        """schedule_ids 中与学生已选课程时间冲突的排课 id 集合（学生已选的排课不计）
+
+        先对每种不同的占用位图各做一次按位与，再按编号查表标记各排课，
+        开销取决于位图种类数而不是排课数。
+        """
+        with self._lock:
+            chosen = self._selected.get(student_id, {})
+            verdicts = {}
+            result = set()
+            for schedule_id in schedule_ids:
+                slot = self._slots.get(schedule_id)
+                if slot is None or schedule_id in chosen:
+                    continue
+                key = (slot[0], slot[1])
+                hit = verdicts.get(key)
+                if hit is None:
+                    hit = verdicts[key] = bool(self._patterns[slot[1]] & self._busy_mask(student_id, slot[0]))
+                if hit:
+                    result.add(schedule_id)
+            return result
+
+    # ---------- 写 ----------
+
+    def enroll(self, student_id, schedule_id, selected_at):
+        """选课，返回 (结果, 选课记录)；结果为 ENROLLED / DUPLICATE / FULL / NOT_FOUND / CONFLICT，
+        时间冲突时返回的是与之冲突的已选记录
+        """
+        with self._db.row_lock('student', student_id):
+            with self._lock:
+                if schedule_id not in self._rooms:
+                    return NOT_FOUND, None
+                if schedule_id in self._selected.get(student_id, ()):
+                    return DUPLICATE, None
+                clash = self._clash(student_id, schedule_id)
+            if clash is not None:
+                return CONFLICT, self._db.course_selections.get(clash)
+            with self._seat_locks('schedule', schedule_id):
+                with self._lock:
+                    capacity = self._capacity(schedule_id)
+                    if capacity is not None and self._enrolled.get(schedule_id, 0) >= capacity:
+                        return FULL, None
+                row = self._db.course_selections.insert({
+                    'student_id': student_id,
+                    'schedule_id': schedule_id,
+                    'status': 'confirmed',
+                    'selected_at': selected_at
+                })
+            return ENROLLED, row
+
+    def drop(self, student_id, schedule_id):
+        """退课，返回被删除的选课记录；未选该课时返回 None"""
+        with self._db.row_lock('student', student_id):
+            selection_id = self.selection_id(student_id, schedule_id)
+            if selection_id is None:
+                return None
+            return self._db.course_selections.delete(selection_id)
+
+    # ---------- 维护 ----------
+
+    def rebuild(self):
+        """从数据表全量重建"""
+        db = self._db
+        selections, schedules, classrooms = db.course_selections.all(), db.schedules.all(), db.classrooms.all()
+        with self._lock:
+            self._rooms = {s['id']: s.get('classroom') for s in schedules}
+            self._explicit = {s['id']: s['capacity'] for s in schedules if s.get('capacity') is not None}
+            self._room_capacity = {c['room_no']: c['capacity'] for c in classrooms}
+            self._patterns = []
+            self._pattern_ids = {}
+            # 排课 id -> (学期, 占用位图编号)
+            self._slots = {s['id']: self._slot(s) for s in schedules}
+            # (学生 id, 学期) -> 已选排课占用位图的并集，按需计算
+            self._busy = {}
+            self._enrolled = {}
+            self._selected = {}
+            for s in selections:
+                self._add_selection(s)
+
+    def _capacity(self, schedule_id):
+        capacity = self._explicit.get(schedule_id)
+        if capacity is None:
+            capacity = self._room_capacity.get(self._rooms.get(schedule_id))
+        return capacity
+
+    def _slot(self, schedule):
+        mask = schedule_mask(schedule)
+        pattern = self._pattern_ids.get(mask)
+        if pattern is None:
+            pattern = self._pattern_ids[mask] = len(self._patterns)
+            self._patterns.append(mask)
+        return schedule.get('semester'), pattern
+
+    def _busy_mask(self, student_id, semester):
+        key = (student_id, semester)
+        busy = self._busy.get(key)
+        if busy is None:
+            busy = 0
+            for schedule_id in self._selected.get(student_id, ()):
+                slot = self._slots.get(schedule_id)
+                if slot is not None and slot[0] == semester:
+                    busy |= self._patterns[slot[1]]
+            self._busy[key] = busy
+        return busy
+
+    def _clash(self, student_id, schedule_id):
+        """与该排课时间冲突的已选记录 id，没有冲突时返回 None"""
+        semester, pattern = self._slots[schedule_id]
+        mask = self._patterns[pattern]
+        if not mask & self._busy_mask(student_id, semester):
+            return None
+        # 只有确实冲突时才逐一比对，找出具体是哪门课
+        for chosen, selection_id in self._selected[student_id].items():
+            slot = self._slots.get(chosen)
+            if slot is not None and slot[0] == semester and self._patterns[slot[1]] & mask:
+                return selection_id
+        return None
+
+    def _add_selection(self, selection):
+        schedule_id = selection['schedule_id']
+        self._enrolled[schedule_id] = self._enrolled.get(schedule_id, 0) + 1
+        # 绕过引擎写入的重复记录（如随后回滚的插入）不覆盖已有记录，删除它时也就不会误删已有记录
+        self._selected.setdefault(selection['student_id'], {}).setdefault(schedule_id, selection['id'])
+        slot = self._slots.get(schedule_id)
+        if slot is not None:
+            key = (selection['student_id'], slot[0])
+            if key in self._busy:
+                self._busy[key] |= self._patterns[slot[1]]
+
+    def _remove_selection(self, selection):
+        schedule_id = selection['schedule_id']
+        count = self._enrolled.get(schedule_id, 0) - 1
+        if count > 0:
+            self._enrolled[schedule_id] = count
+        else:
+            self._enrolled.pop(schedule_id, None)
+        chosen = self._selected.get(selection['student_id'])
+        if chosen is not None and chosen.get(schedule_id) == selection['id']:
+            del chosen[schedule_id]
+            if not chosen:
+                del self._selected[selection['student_id']]
+            # 并集无法按位减去，丢弃后下次用到时重新计算
+            slot = self._slots.get(schedule_id)
+            if slot is not None:
+                self._busy.pop((selection['student_id'], slot[0]), None)
+
+    # ---------- 变更回调 ----------
+
+    def _on_selection(self, old, new):
+        if old is None and new is None:
+            return self.rebuild()
+        with self._lock:
+            if old is not None:
+                self._remove_selection(old)
+            if new is not None:
+                self._add_selection(new)
+
+    def _on_schedule(self, old, new):
+        if old is None and new is None:
+            return self.rebuild()
+        schedule_id = (new or old)['id']
+        with self._lock:
+            slot = self._slot(new) if new is not None else None
+            # 调课或删除排课影响所有选了它的学生，直接清空占用缓存（很少发生）
+            if old is not None and self._slots.get(schedule_id) != slot:
+                self._busy.clear()
+            if new is None:
+                self._rooms.pop(schedule_id, None)
+                self._explicit.pop(schedule_id, None)
+                self._slots.pop(schedule_id, None)
+                return
+            self._rooms[schedule_id] = new.get('classroom')
+            self._slots[schedule_id] = slot
+            if new.get('capacity') is not None:
+                self._explicit[schedule_id] = new['capacity']
+            else:
+                self._explicit.pop(schedule_id, None)
+
+    def _on_classroom(self, old, new):
+        if old is None and new is None:
+            return self.rebuild()
+        with self._lock:
+            if old is not None and self._room_capacity.get(old['room_no']) == old['capacity']:
+                del self._room_capacity[old['room_no']]
+            if new is not None:
+                self._room_capacity[new['room_no']] = new['capacity']
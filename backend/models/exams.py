@@ -0,0 +1,548 @@
+"""
+考试排期
+给定一批考试（exam_arrangements 中的行，同一排课的多行视为同一场考试分教室进行）、考试日期与每天的考试时段，
+为每场考试分配时段与教室，保证没有学生同时参加两场考试，教室容量之和不小于考生人数。
+
+求解分三步：
+1. 冲突图：从选课记录得到每名学生参加的考试，两场考试有共同学生即相邻，边权为共同学生人数；
+2. 着色：按 DSatur 顺序（相邻考试已占用的时段最多者先排，其次度数、人数）为考试选时段，
+   取第一个不与相邻考试同时段、且有足够教室的时段（first-fit 使用的时段数最少）；
+   教室按容量从小到大挑选能容纳全部考生的一间，没有时从大到小拼多间；
+3. 改进：依次把每场考试移到代价最小的可行时段，直到一轮没有移动或超时；代价为同一天相邻时段
+   连考的人数（权重最高）、同一天考试的人数、教室空置率与时段拥挤程度。
+
+相邻考试在各时段的共同学生人数增量维护，选时段与移动的代价只与时段数有关。
+find_conflicts 按学生、按教室对时间区间排序后一次扫描，检查已有安排中的冲突；
+recheck_plan 写入前把排期结果套用到当前的考试行上再检查一次，剔除与之冲突的考试。
+
+用法（在 backend 目录下，基于合成数据演示）：见 benchmarks/exams.py
+"""
+
+import heapq
+import itertools
+import time
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+
+EXAM_TIMES = (('08:30', '10:30'), ('10:30', '12:30'), ('14:00', '16:00'), ('16:30', '18:30'))
+
+# 代价权重：按共同学生人数计
+BACK_TO_BACK_COST = 3.0
+SAME_DAY_COST = 1.0
+
+# 校验已有安排时，同一天两场考试的间隔不超过该分钟数即视为连考
+BACK_TO_BACK_GAP = 60
+
+_IMPROVE_PASSES = 8
+
+
+def exam_days(start_date, days, weekends=True):
+    """从 start_date 起的 days 个考试日期（ISO 格式），weekends 为假时跳过周六、周日"""
+    current = date.fromisoformat(start_date)
+    result = []
+    while len(result) < days:
+        if weekends or current.weekday() < 5:
+            result.append(current.isoformat())
+        current += timedelta(days=1)
+    return result
+
+
+def exam_span(exam):
+    """考试的时间区间（自公元元年起的分钟数），日期或时间无法解析、结束不晚于开始时返回 None"""
+    try:
+        day = date.fromisoformat(exam['date']).toordinal() * 1440
+        start, end = _minutes(exam['start_time']), _minutes(exam['end_time'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if end <= start:
+        return None
+    return day + start, day + end
+
+
+def _minutes(text):
+    hour, minute = text.split(':')
+    hour, minute = int(hour), int(minute)
+    if not (0 <= hour <= 24 and 0 <= minute < 60):
+        raise ValueError(text)
+    return hour * 60 + minute
+
+
+def select_exams(database, semester=None, exam_ids=None):
+    """exam_ids 指定的考试行，为空时为 semester 学期（为空时为全部学期）的全部考试；exam_ids 中有不存在的考试时抛出 ValueError"""
+    rows = database.exam_arrangements.all()
+    if exam_ids is not None:
+        wanted = set(exam_ids)
+        rows = [row for row in rows if row['id'] in wanted]
+        missing = wanted - {row['id'] for row in rows}
+        if missing:
+            raise ValueError(f'考试 {sorted(missing)[0]} 不存在')
+    elif semester:
+        offered = {s['id'] for s in database.schedules.find('semester', semester)}
+        rows = [row for row in rows if row['schedule_id'] in offered]
+    return rows
+
+
+def build_exam_problem(database, semester=None, exam_ids=None, dates=None, times=EXAM_TIMES):
+    """把考试整理为排期问题
+
+    exam_ids 为空时取 semester 学期（为空时为全部学期）的全部考试；dates 为考试日期列表，
+    为空时沿用这些考试当前使用的日期；times 为每天的 (开始, 结束) 时段。
+    不在本次排期范围内、但日期落在 dates 中的考试视为固定占用：占用的教室不可再用，
+    其考生也不能在同一时段参加新排的考试。
+    """
+    rows = select_exams(database, semester, exam_ids)
+    groups = {}
+    for row in rows:
+        groups.setdefault(row['schedule_id'], []).append(row['id'])
+    if not groups:
+        raise ValueError('没有需要排期的考试')
+
+    if not dates:
+        dates = sorted({row['date'] for row in rows if exam_span(row)})
+    if not dates:
+        raise ValueError('没有可用的考试日期')
+    slots = []
+    for day in sorted(set(dates)):
+        for start, end in times:
+            if exam_span({'date': day, 'start_time': start, 'end_time': end}) is None:
+                raise ValueError(f'考试时段格式错误：{day} {start}-{end}')
+            slots.append((day, start, end))
+    slots.sort(key=lambda slot: (slot[0], _minutes(slot[1])))
+
+    schedule_ids = list(groups)
+    index = {schedule_id: i for i, schedule_id in enumerate(schedule_ids)}
+    students = database.get_students_by_schedules(schedule_ids)
+    memberships = defaultdict(list)
+    for schedule_id, members in students.items():
+        for student_id in members:
+            memberships[student_id].append(index[schedule_id])
+
+    # 固定占用：范围外且与某个时段重叠的考试
+    in_scope = {exam_id for ids in groups.values() for exam_id in ids}
+    spans = [exam_span({'date': day, 'start_time': start, 'end_time': end}) for day, start, end in slots]
+    dates = set(dates)
+    fixed_rooms = []
+    fixed_slots = defaultdict(set)
+    for row in database.exam_arrangements.all():
+        if row['id'] in in_scope or row.get('date') not in dates:
+            continue
+        span = exam_span(row)
+        for slot, (start, end) in enumerate(spans):
+            if span and span[0] < end and start < span[1]:
+                fixed_rooms.append((slot, row['classroom']))
+                fixed_slots[row['schedule_id']].add(slot)
+    fixed_students = Counter()
+    for schedule_id, members in database.get_students_by_schedules(list(fixed_slots)).items():
+        for student_id in members:
+            for node in memberships.get(student_id, ()):
+                for slot in fixed_slots[schedule_id]:
+                    fixed_students[node, slot] += 1
+
+    return {
+        'exams': [{'schedule_id': schedule_id, 'exam_ids': groups[schedule_id],
+                   'size': len(students.get(schedule_id, ()))} for schedule_id in schedule_ids],
+        'slots': slots,
+        'rooms': sorted(((c['room_no'], c['capacity'] or 0) for c in database.classrooms),
+                        key=lambda room: (room[1], room[0])),
+        'memberships': [sorted(set(nodes)) for nodes in memberships.values()],
+        'fixed_rooms': fixed_rooms,
+        'fixed_students': [(node, slot, count) for (node, slot), count in fixed_students.items()]
+    }
+
+
+def solve_exams(problem, time_limit=60):
+    """求解排期问题，返回 {'exams': 每场考试的安排, 'unplaced': 未安排的考试, 'stats': 统计}"""
+    started = time.perf_counter()
+    search = _Search(problem, started + time_limit)
+    search.construct()
+    moves = search.improve()
+    result = search.result()
+    result['stats'].update(moves=moves, elapsed=round(time.perf_counter() - started, 3))
+    return result
+
+
+class _Search:
+    """DSatur 构造与逐场改进"""
+
+    def __init__(self, problem, deadline):
+        self.deadline = deadline
+        self.exams = problem['exams']
+        self.slots = problem['slots']
+        self.rooms = problem['rooms']
+        self.memberships = problem['memberships']
+        n_slots = len(self.slots)
+
+        # 冲突图：neighbors[i] 为 相邻考试 -> 共同学生人数
+        self.neighbors = [Counter() for _ in self.exams]
+        for nodes in self.memberships:
+            for a in nodes:
+                self.neighbors[a].update(nodes)
+        for a, adjacent in enumerate(self.neighbors):
+            adjacent.pop(a, None)
+
+        # 时段的前后相邻时段（同一天）与同一天的全部时段
+        self.prev = [s - 1 if s and self.slots[s - 1][0] == self.slots[s][0] else None for s in range(n_slots)]
+        self.next = [s + 1 if s + 1 < n_slots and self.slots[s + 1][0] == self.slots[s][0] else None
+                     for s in range(n_slots)]
+        by_day = defaultdict(list)
+        for s, (day, _, _) in enumerate(self.slots):
+            by_day[day].append(s)
+        self.day_slots = [by_day[day] for day, _, _ in self.slots]
+        # 构造时的时段顺序：先用各天的第 1、3… 个时段，再用第 2、4… 个，
+        # 用到的时段较少时同一天的考试不会排在相邻时段
+        position = {s: day.index(s) for day in by_day.values() for s in day}
+        self.fill_order = sorted(range(n_slots), key=lambda s: (position[s] % 2, position[s], s))
+
+        # load[i][s]：考试 i 的相邻考试中排在时段 s 的共同学生人数；大于 0 即不能排在 s
+        # saturation[i]：load[i] 中大于 0 的时段数（DSatur 的饱和度）
+        self.load = [[0] * n_slots for _ in self.exams]
+        self.saturation = [0] * len(self.exams)
+        for node, slot, count in problem['fixed_students']:
+            if not self.load[node][slot]:
+                self.saturation[node] += 1
+            self.load[node][slot] += count
+
+        # 各时段空闲教室：按 (容量, 编号) 排序
+        blocked = set(problem['fixed_rooms'])
+        self.free = [[(capacity, r) for r, (room_no, capacity) in enumerate(self.rooms) if (s, room_no) not in blocked]
+                     for s in range(n_slots)]
+        self.slot_used = [0] * n_slots
+        self.placement = {}
+        self.heap = None
+
+    # ---------- 构造 ----------
+
+    def construct(self):
+        self.rank = [(len(adjacent) << 20) | min(exam['size'], 0xFFFFF)
+                     for adjacent, exam in zip(self.neighbors, self.exams)]
+        self.heap = [(self._priority(i), i) for i in range(len(self.exams))]
+        heapq.heapify(self.heap)
+        failed = set()
+        while self.heap:
+            priority, i = heapq.heappop(self.heap)
+            # 饱和度变化时已压入新条目，旧条目跳过
+            if i in self.placement or i in failed or priority != self._priority(i):
+                continue
+            choice = self._first_fit(i)
+            if choice is None:
+                failed.add(i)
+            else:
+                self._place(i, *choice)
+        self.heap = None
+
+    def _priority(self, i):
+        """DSatur 的出堆顺序：饱和度、度数、人数依次从大到小，合成一个整数以加快堆比较"""
+        return -((self.saturation[i] << 40) | self.rank[i])
+
+    def _first_fit(self, i):
+        """按 fill_order 取第一个可行的 (时段, 教室列表)，没有时返回 None"""
+        size = max(self.exams[i]['size'], 1)
+        load = self.load[i]
+        for s in self.fill_order:
+            if not load[s]:
+                rooms = self._pick_rooms(s, size)
+                if rooms is not None:
+                    return s, rooms
+        return None
+
+    def _best_option(self, i, current=None):
+        """代价最小的可行 (时段, 教室列表, 代价)
+
+        current 为当前位置的代价，只返回比它更低的选择；没有时返回 None。
+        考生代价不低于已知最优时不再挑选教室。
+        """
+        size = max(self.exams[i]['size'], 1)
+        load = self.load[i]
+        best = None
+        best_cost = current
+        for s in range(len(self.slots)):
+            if load[s]:
+                continue
+            cost = self._student_cost(load, s)
+            if best_cost is not None and cost >= best_cost:
+                continue
+            rooms = self._pick_rooms(s, size)
+            if rooms is None:
+                continue
+            cost += self._room_cost(s, rooms, size, self.slot_used[s])
+            if best_cost is None or cost < best_cost:
+                best, best_cost = (s, rooms, cost), cost
+        return best
+
+    def _pick_rooms(self, s, size):
+        """时段 s 中能容纳 size 人的最小一间教室；都不够大时从大到小拼多间，仍不够时返回 None"""
+        free = self.free[s]
+        k = bisect_left(free, (size, -1))
+        if k < len(free):
+            return [free[k][1]]
+        picked, total = [], 0
+        for capacity, room in reversed(free):
+            picked.append(room)
+            total += capacity
+            if total >= size:
+                return picked
+        return None
+
+    def _student_cost(self, load, s):
+        """排在时段 s 时同一天相邻时段连考、同一天考试的人数（加权）"""
+        prev, following = self.prev[s], self.next[s]
+        cost = BACK_TO_BACK_COST * ((load[prev] if prev is not None else 0)
+                                    + (load[following] if following is not None else 0))
+        return cost + SAME_DAY_COST * sum(load[t] for t in self.day_slots[s])
+
+    def _room_cost(self, s, rooms, size, used):
+        """教室空置率与时段拥挤程度，均不超过 1，只在考生代价相近时起作用"""
+        capacity = sum(self.rooms[r][1] for r in rooms)
+        cost = (capacity - size) / capacity if capacity else 0
+        return cost + 0.5 * used / max(len(self.rooms), 1)
+
+    def _place(self, i, s, rooms):
+        free = self.free[s]
+        for room in rooms:
+            del free[bisect_left(free, (self.rooms[room][1], room))]
+        self.placement[i] = (s, rooms)
+        self.slot_used[s] += 1
+        load, saturation, heap = self.load, self.saturation, self.heap
+        for j, shared in self.neighbors[i].items():
+            row = load[j]
+            if not row[s]:
+                saturation[j] += 1
+                if heap is not None and j not in self.placement:
+                    heapq.heappush(heap, (self._priority(j), j))
+            row[s] += shared
+
+    def _unplace(self, i):
+        s, rooms = self.placement.pop(i)
+        for room in rooms:
+            insort(self.free[s], (self.rooms[room][1], room))
+        self.slot_used[s] -= 1
+        load, saturation = self.load, self.saturation
+        for j, shared in self.neighbors[i].items():
+            row = load[j]
+            row[s] -= shared
+            if not row[s]:
+                saturation[j] -= 1
+        return s, rooms
+
+    # ---------- 改进 ----------
+
+    def improve(self):
+        """逐场把考试移到代价更低的可行时段，返回移动次数"""
+        moves = 0
+        for _ in range(_IMPROVE_PASSES):
+            moved = 0
+            for i in list(self.placement):
+                if time.perf_counter() >= self.deadline:
+                    return moves + moved
+                s, rooms = self.placement[i]
+                size = max(self.exams[i]['size'], 1)
+                current = self._student_cost(self.load[i], s) + self._room_cost(s, rooms, size, self.slot_used[s] - 1)
+                choice = self._best_option(i, current - 1e-9)
+                if choice is not None:
+                    self._unplace(i)
+                    self._place(i, choice[0], choice[1])
+                    moved += 1
+            moves += moved
+            if not moved:
+                break
+        return moves
+
+    # ---------- 结果 ----------
+
+    def result(self):
+        exams = []
+        for i, exam in enumerate(self.exams):
+            placed = self.placement.get(i)
+            if placed is None:
+                continue
+            s, rooms = placed
+            day, start, end = self.slots[s]
+            exams.append({
+                'schedule_id': exam['schedule_id'],
+                'exam_ids': exam['exam_ids'],
+                'students': exam['size'],
+                'date': day,
+                'start_time': start,
+                'end_time': end,
+                'classrooms': [self.rooms[r][0] for r in rooms]
+            })
+        unplaced = [{
+            'schedule_id': exam['schedule_id'],
+            'exam_ids': exam['exam_ids'],
+            'reason': '所有时段都有该考试的考生参加其他考试' if all(self.load[i])
+            else '没有考生冲突的时段都没有足够的空闲教室'
+        } for i, exam in enumerate(self.exams) if i not in self.placement]
+
+        back_to_back = same_day = 0
+        for nodes in self.memberships:
+            placed = sorted(self.placement[node][0] for node in nodes if node in self.placement)
+            days = Counter(self.slots[s][0] for s in placed)
+            same_day += sum(n * (n - 1) // 2 for n in days.values())
+            back_to_back += sum(1 for a, b in zip(placed, placed[1:]) if self.next[a] == b)
+        return {
+            'exams': exams,
+            'unplaced': unplaced,
+            'stats': {
+                'exams': len(self.exams),
+                'placed': len(exams),
+                'unplaced': len(unplaced),
+                'students': len(self.memberships),
+                'conflict_edges': sum(len(adjacent) for adjacent in self.neighbors) // 2,
+                'slots': len(self.slots),
+                'rooms': len(self.rooms),
+                'back_to_back': back_to_back,
+                'same_day': same_day
+            }
+        }
+
+
+# ==================== 冲突检查 ====================
+
+def find_conflicts(exams, students, capacities, limit=100):
+    """检查已有的考试安排
+
+    exams 为考试行（可带 course，用于显示课程名），students 为 排课 id -> 考生 id 列表，
+    capacities 为 教室编号 -> 容量。按学生、按教室把时间区间排序后扫描，代价为 O(n log n)。
+    返回考生冲突（同一学生两场考试时间重叠，按考试对汇总人数）、教室冲突、容量不足、
+    日期时间无效的考试，以及连考人次等统计；各列表最多 limit 项。
+    """
+    spans = {}
+    invalid = []
+    by_schedule = defaultdict(list)
+    for exam in exams:
+        span = exam_span(exam)
+        if span is None:
+            invalid.append({'exam_id': exam['id'], 'course_name': _course_name(exam), 'reason': '日期或时间无效'})
+            continue
+        spans[exam['id']] = span
+        by_schedule[exam['schedule_id']].append(exam)
+    by_id = {exam['id']: exam for exam in exams}
+
+    # 考生冲突：同一学生的考试按开始时间排序，只与仍未结束的考试比较
+    per_student = defaultdict(list)
+    for schedule_id, rows in by_schedule.items():
+        for student_id in students.get(schedule_id, ()):
+            for exam in rows:
+                per_student[student_id].append((*spans[exam['id']], schedule_id, exam['id']))
+    student_pairs = {}
+    back_to_back = 0
+    for student_id, items in per_student.items():
+        if len(items) < 2:
+            continue
+        items.sort()
+        active = []
+        previous = None
+        for start, end, schedule_id, exam_id in items:
+            active = [item for item in active if item[1] > start]
+            for _, _, other_schedule, other_id in active:
+                if other_schedule != schedule_id:
+                    pair = student_pairs.setdefault((other_id, exam_id), [0, student_id])
+                    pair[0] += 1
+            if previous and previous[2] != schedule_id and 0 <= start - previous[1] <= BACK_TO_BACK_GAP:
+                back_to_back += 1
+            active.append((start, end, schedule_id, exam_id))
+            previous = (start, end, schedule_id)
+
+    # 教室冲突
+    per_room = defaultdict(list)
+    for exam_id, (start, end) in spans.items():
+        per_room[by_id[exam_id]['classroom']].append((start, end, exam_id))
+    room_pairs = []
+    for classroom, items in per_room.items():
+        items.sort()
+        active = []
+        for start, end, exam_id in items:
+            active = [item for item in active if item[1] > start]
+            room_pairs.extend((classroom, other_id, exam_id) for _, _, other_id in active)
+            active.append((start, end, exam_id))
+
+    # 容量：同一排课各考场容量之和不小于考生人数
+    capacity_issues = []
+    for schedule_id, rows in by_schedule.items():
+        size = len(students.get(schedule_id, ()))
+        seats = [capacities.get(exam['classroom']) for exam in rows]
+        if size and None not in seats and sum(seats) < size:
+            capacity_issues.append({'exam_ids': [exam['id'] for exam in rows], 'course_name': _course_name(rows[0]),
+                                    'students': size, 'seats': sum(seats)})
+
+    student_conflicts = sorted(({
+        'exam_ids': [a, b],
+        'course_names': [_course_name(by_id[a]), _course_name(by_id[b])],
+        'students': count,
+        'example_student_id': example
+    } for (a, b), (count, example) in student_pairs.items()), key=lambda item: -item['students'])
+    room_conflicts = [{
+        'classroom': classroom,
+        'exam_ids': [a, b],
+        'course_names': [_course_name(by_id[a]), _course_name(by_id[b])],
+        'date': by_id[b]['date']
+    } for classroom, a, b in room_pairs]
+    return {
+        'valid': not (student_pairs or room_pairs or capacity_issues or invalid),
+        'student_conflicts': student_conflicts[:limit],
+        'room_conflicts': room_conflicts[:limit],
+        'capacity_issues': capacity_issues[:limit],
+        'invalid': invalid[:limit],
+        'stats': {
+            'exams': len(exams),
+            'students': len(per_student),
+            'student_conflicts': len(student_pairs),
+            'students_affected': sum(count for count, _ in student_pairs.values()),
+            'room_conflicts': len(room_pairs),
+            'capacity_issues': len(capacity_issues),
+            'invalid': len(invalid),
+            'back_to_back': back_to_back
+        }
+    }
+
+
+def recheck_plan(database, result):
+    """写入前在当前数据上核对排期结果（调用方在持有 exam_arrangements、course_selections、classrooms
+    写锁的事务中调用，随后写入 result）
+
+    把结果套用到现有考试行后用 find_conflicts 检查：未能安排的考试仍在原时段，排期期间也可能有人改动考试，
+    都是求解时没有看到的占用。与新安排有考生冲突、教室冲突或容量不足的考试移入 unplaced（沿用原安排），
+    一对冲突只剔除后排的一场，重复检查直到其余安排不再冲突。
+    """
+    current = {row['id']: row for row in database.exam_arrangements.all()}
+    placed = {exam['schedule_id']: exam for exam in result['exams']}
+    students = database.get_students_by_schedules({row['schedule_id'] for row in current.values()} | set(placed))
+    capacities = {room['room_no']: room['capacity'] for room in database.classrooms}
+    rejected = {}
+    while True:
+        rows, proposed = dict(current), {}
+        fresh = itertools.count(-1, -1)      # 新增考场的临时 id
+        for schedule_id, exam in placed.items():
+            if schedule_id in rejected:
+                continue
+            for exam_id in exam['exam_ids']:
+                rows.pop(exam_id, None)
+            for k, classroom in enumerate(exam['classrooms']):
+                row_id = exam['exam_ids'][k] if k < len(exam['exam_ids']) else next(fresh)
+                rows[row_id] = {'id': row_id, 'schedule_id': schedule_id, 'date': exam['date'],
+                                'start_time': exam['start_time'], 'end_time': exam['end_time'], 'classroom': classroom}
+                proposed[row_id] = schedule_id
+        report = find_conflicts(list(rows.values()), students, capacities, limit=None)
+        clashes = [(item['exam_ids'], '与其他考试有共同考生') for item in report['student_conflicts']]
+        clashes += [(item['exam_ids'], '考场在该时段已有其他考试') for item in report['room_conflicts']]
+        clashes += [(item['exam_ids'], '考场容量之和小于考生人数') for item in report['capacity_issues']]
+        found = False
+        for exam_ids, reason in clashes:
+            ours = [proposed[exam_id] for exam_id in exam_ids if exam_id in proposed]
+            if ours and not any(schedule_id in rejected for schedule_id in ours):
+                rejected[ours[-1]] = reason
+                found = True
+        if not found:
+            break
+    result['exams'] = [exam for exam in result['exams'] if exam['schedule_id'] not in rejected]
+    result['unplaced'].extend({'schedule_id': schedule_id, 'exam_ids': placed[schedule_id]['exam_ids'],
+                               'reason': f'{reason}（写入前核对）'} for schedule_id, reason in rejected.items())
+    result['stats'].update(placed=len(result['exams']), unplaced=len(result['unplaced']))
+    return result
+
+
+def _course_name(exam):
+    course = exam.get('course')
+    return course['name'] if course else ''
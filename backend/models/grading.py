@@ -0,0 +1,28 @@
+"""
+成绩与绩点
+百分制成绩按分段表换算绩点，录入成绩、成绩复核与合成数据共用同一张表
+"""
+
+from bisect import bisect_right
+
+
+# 分数线与对应绩点：不低于 GPA_THRESHOLDS[i] 且低于下一条分数线时绩点为 GPA_POINTS[i + 1]
+GPA_THRESHOLDS = (60, 65, 70, 75, 80, 85, 90)
+GPA_POINTS = (0.0, 2.0, 2.3, 2.7, 3.0, 3.3, 3.7, 4.0)
+
+MIN_SCORE = 0
+MAX_SCORE = 100
+
+
+def score_to_gpa(score):
+    """百分制成绩换算绩点"""
+    return GPA_POINTS[bisect_right(GPA_THRESHOLDS, score)]
+
+
+def check_score(score):
+    """校验成绩：数值且在 0～100 之间，返回错误信息，合法时返回 None"""
+    if isinstance(score, bool) or not isinstance(score, (int, float)):
+        return '成绩必须为数字'
+    if not MIN_SCORE <= score <= MAX_SCORE:
+        return f'成绩必须在 {MIN_SCORE}～{MAX_SCORE} 之间'
+    return None
@@ -0,0 +1,226 @@
+"""
+批量安排监考
+为一批考试（exam_arrangements 中的行，每个考场一行）一次性安排主监考与副监考：
+每个考场至少两名监考教师，教室容量每超过 seats_per_invigilator 个座位再增加一名；
+教师在考试时段不能有课（按排课的星期、节次与周次推算到具体日期），也不能同时监考另一场考试；
+在满足上述条件的教师中总是选择监考次数最少的一位，使监考任务在全体教师间均衡。
+任课教师有空且监考次数不超过平均水平时优先担任本课程考试的主监考。
+
+范围外（不在本批考试中）已有的监考安排视为固定：占用教师的时间并计入其监考次数。
+教师按监考次数放在最小堆中，次数变化后旧条目在弹出时丢弃（惰性删除），每次挑选只需弹出少数忙碌的教师。
+
+用法（在 backend 目录下，基于合成数据演示）：见 benchmarks/invigilation.py
+"""
+
+import heapq
+import math
+import statistics
+import time
+from collections import defaultdict
+from datetime import date
+
+from models.exams import exam_span, select_exams
+from models.timetable import period_span
+from models.weeks import ALL_WEEKS, parse_weeks, semester_start, week_of
+
+
+CHIEF = '主监考'
+ASSISTANT = '副监考'
+
+MIN_INVIGILATORS = 2
+
+
+def teaching_span(schedule, day):
+    """排课在日期 day 上课的时间区间（与 exam_span 相同的分钟数），当天不上课时返回 None；
+    学期代码无法识别或周次无法解析时按每周都上课处理，宁可多报冲突也不漏报
+    """
+    if isinstance(day, str):
+        day = date.fromisoformat(day)
+    try:
+        if int(schedule.get('weekday')) != day.isoweekday():
+            return None
+    except (TypeError, ValueError):
+        return None
+    span = period_span(schedule.get('start_period'), schedule.get('end_period'))
+    if span is None:
+        return None
+    start = semester_start(schedule.get('semester'))
+    if start is not None:
+        try:
+            weeks = parse_weeks(schedule.get('weeks'))
+        except (TypeError, ValueError):
+            weeks = ALL_WEEKS
+        if week_of(start, day) not in weeks:
+            return None
+    base = day.toordinal() * 1440
+    return base + span[0], base + span[1]
+
+
+def build_invigilation_problem(database, semester=None, exam_ids=None, seats_per_invigilator=60):
+    """整理安排监考所需的数据
+
+    exam_ids 指定考试行，为空时为 semester 学期（为空时为全部学期）的全部考试。返回
+    {'exams': [{'id', 'schedule_id', 'date', 'span', 'needed', 'course_teacher'}],（按开始时间排序）
+     'invalid': 日期或时间无法解析的考试 id,
+     'teachers': 教师 id 列表,
+     'busy': {教师 id: {日期序号: [(开始, 结束)]}}（上课与范围外的监考）,
+     'load': {教师 id: 范围外的监考次数}}
+    """
+    if seats_per_invigilator < 1:
+        raise ValueError('每名监考教师负责的座位数必须为正数')
+    rows = select_exams(database, semester, exam_ids)
+    capacities = {room['room_no']: room['capacity'] or 0 for room in database.classrooms}
+    course_teachers = {course['id']: course['teacher_id'] for course in database.courses}
+
+    exams, invalid = [], []
+    for row in rows:
+        span = exam_span(row)
+        if span is None:
+            invalid.append(row['id'])
+            continue
+        schedule = database.schedules.get(row['schedule_id'])
+        capacity = capacities.get(row['classroom'], 0)
+        exams.append({
+            'id': row['id'],
+            'schedule_id': row['schedule_id'],
+            'date': row['date'],
+            'span': span,
+            'needed': max(MIN_INVIGILATORS, math.ceil(capacity / seats_per_invigilator)),
+            'course_teacher': course_teachers.get(schedule['course_id']) if schedule else None,
+        })
+    exams.sort(key=lambda exam: (exam['span'], exam['id']))
+
+    teachers = [teacher['id'] for teacher in database.teachers]
+    busy = defaultdict(lambda: defaultdict(list))
+    load = dict.fromkeys(teachers, 0)
+
+    # 上课：只需考察考试日期所在的星期几的排课
+    days = sorted({date.fromisoformat(exam['date']) for exam in exams})
+    weekdays = {day.isoweekday() for day in days}
+    by_weekday = defaultdict(list)
+    for schedule in database.schedules:
+        if schedule.get('weekday') in weekdays:
+            by_weekday[schedule['weekday']].append(schedule)
+    for day in days:
+        for schedule in by_weekday[day.isoweekday()]:
+            teacher_id = course_teachers.get(schedule['course_id'])
+            span = teaching_span(schedule, day) if teacher_id is not None else None
+            if span is not None:
+                busy[teacher_id][span[0] // 1440].append(span)
+
+    # 范围外的监考
+    in_scope = {row['id'] for row in rows}
+    for assignment in database.invigilator_assignments:
+        if assignment['exam_id'] in in_scope:
+            continue
+        exam = database.exam_arrangements.get(assignment['exam_id'])
+        span = exam_span(exam) if exam else None
+        if span is not None:
+            busy[assignment['teacher_id']][span[0] // 1440].append(span)
+        if assignment['teacher_id'] in load:
+            load[assignment['teacher_id']] += 1
+
+    return {
+        'exams': exams,
+        'invalid': invalid,
+        'teachers': teachers,
+        'busy': {teacher_id: dict(days) for teacher_id, days in busy.items()},
+        'load': load,
+    }
+
+
+def assign_invigilators(problem, prefer_course_teacher=True):
+    """按开始时间依次为每场考试挑选监考教师，返回
+
+    {'assignments': [{'exam_id', 'teacher_id', 'role'}],
+     'unfilled': [{'exam_id', 'missing'}]（有空的教师不足时缺少的人数）,
+     'stats': 安排数量与监考次数分布}
+    """
+    started = time.perf_counter()
+    load = dict(problem['load'])
+    busy = {teacher_id: {day: list(spans) for day, spans in days.items()}
+            for teacher_id, days in problem['busy'].items()}
+    exams = problem['exams']
+    duties = sum(exam['needed'] for exam in exams)
+    # 任课教师优先担任主监考的上限：全部监考次数的平均值（向上取整）
+    target = math.ceil((sum(load.values()) + duties) / len(load)) if load else 0
+
+    def available(teacher_id, span):
+        for start, end in busy.get(teacher_id, {}).get(span[0] // 1440, ()):
+            if start < span[1] and span[0] < end:
+                return False
+        return True
+
+    def take(teacher_id, span):
+        busy.setdefault(teacher_id, {}).setdefault(span[0] // 1440, []).append(span)
+        load[teacher_id] += 1
+        heapq.heappush(heap, (load[teacher_id], teacher_id))
+
+    heap = [(count, teacher_id) for teacher_id, count in load.items()]
+    heapq.heapify(heap)
+
+    assignments, unfilled = [], []
+    course_teacher_chiefs = 0
+    for exam in exams:
+        span = exam['span']
+        chosen = []
+        teacher_id = exam['course_teacher']
+        if (prefer_course_teacher and teacher_id in load and load[teacher_id] < target
+                and available(teacher_id, span)):
+            chosen.append(teacher_id)
+            take(teacher_id, span)
+            course_teacher_chiefs += 1
+        skipped = []
+        while len(chosen) < exam['needed'] and heap:
+            count, teacher_id = heapq.heappop(heap)
+            if count != load[teacher_id]:
+                continue    # 过期条目
+            if available(teacher_id, span):
+                chosen.append(teacher_id)
+                take(teacher_id, span)
+            else:
+                skipped.append((count, teacher_id))
+        for entry in skipped:
+            heapq.heappush(heap, entry)
+        for k, teacher_id in enumerate(chosen):
+            assignments.append({'exam_id': exam['id'], 'teacher_id': teacher_id,
+                                'role': CHIEF if k == 0 else ASSISTANT})
+        if len(chosen) < exam['needed']:
+            unfilled.append({'exam_id': exam['id'], 'missing': exam['needed'] - len(chosen)})
+
+    counts = list(load.values())
+    return {
+        'assignments': assignments,
+        'unfilled': unfilled,
+        'stats': {
+            'exams': len(exams),
+            'invalid': len(problem['invalid']),
+            'teachers': len(counts),
+            'duties': duties,
+            'assigned': len(assignments),
+            'unfilled': sum(item['missing'] for item in unfilled),
+            'course_teacher_chiefs': course_teacher_chiefs,
+            'min_load': min(counts, default=0),
+            'max_load': max(counts, default=0),
+            'mean_load': round(statistics.fmean(counts), 2) if counts else 0,
+            'std_load': round(statistics.pstdev(counts), 2) if counts else 0,
+            'elapsed': round(time.perf_counter() - started, 3),
+        }
+    }
+
+
+def plan_invigilators(database, semester=None, exam_ids=None, seats_per_invigilator=60,
+                      prefer_course_teacher=True, apply=False):
+    """为一批考试安排监考；apply 为真时在一个事务中删除这些考试原有的监考安排并批量写入新安排。
+    用作后台任务，返回值即任务结果
+    """
+    problem = build_invigilation_problem(database, semester, exam_ids, seats_per_invigilator)
+    result = assign_invigilators(problem, prefer_course_teacher)
+    if apply:
+        with database.transaction('invigilator_assignments'):
+            for exam in problem['exams']:
+                for assignment in database.invigilator_assignments.find('exam_id', exam['id']):
+                    database.invigilator_assignments.delete(assignment['id'])
+            database.invigilator_assignments.insert_many(result['assignments'])
+    result['applied'] = bool(apply)
+    return result
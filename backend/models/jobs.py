@@ -0,0 +1,91 @@
+"""
+后台任务
+耗时的批处理（如批量安排监考）在线程池中执行，接口立即返回任务 id，
+前端按 id 轮询任务状态与结果。任务记录只保存在内存中，保留最近 keep 个
+"""
+
+import concurrent.futures
+import itertools
+import threading
+import traceback
+from collections import OrderedDict
+from datetime import datetime
+
+from config import Config
+
+
+PENDING = 'pending'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+
+class JobRunner:
+    """按提交顺序在线程池中执行任务，记录每个任务的状态、结果与错误"""
+
+    def __init__(self, max_workers=2, keep=200):
+        self.max_workers = max_workers
+        self.keep = keep
+        self._ids = itertools.count(1)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def submit(self, kind, fn, *args, **kwargs):
+        """提交任务，返回任务记录的副本；fn 的返回值作为任务结果"""
+        job = {
+            'id': next(self._ids),
+            'kind': kind,
+            'status': PENDING,
+            'created_at': _now(),
+            'started_at': None,
+            'finished_at': None,
+            'result': None,
+            'error': None
+        }
+        with self._lock:
+            self._jobs[job['id']] = job
+            while len(self._jobs) > self.keep:
+                oldest = next(iter(self._jobs.values()))
+                if oldest['status'] in (PENDING, RUNNING):
+                    break
+                self._jobs.popitem(last=False)
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(self.max_workers,
+                                                                       thread_name_prefix='background-job')
+            snapshot = dict(job)
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return snapshot
+
+    def get(self, job_id):
+        """任务记录的副本，不存在（或已被淘汰）时返回 None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def running(self, kind):
+        """尚未结束的某类任务"""
+        with self._lock:
+            return [dict(job) for job in self._jobs.values()
+                    if job['kind'] == kind and job['status'] in (PENDING, RUNNING)]
+
+    def _run(self, job, fn, args, kwargs):
+        with self._lock:
+            job.update(status=RUNNING, started_at=_now())
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            traceback.print_exc()
+            with self._lock:
+                job.update(status=FAILED, error=str(e) or type(e).__name__, finished_at=_now())
+        else:
+            with self._lock:
+                job.update(status=SUCCEEDED, result=result, finished_at=_now())
+
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+# 全局任务执行器
+jobs = JobRunner(Config.BACKGROUND_JOB_WORKERS)
@@ -0,0 +1,188 @@
+"""
+并发控制
+读写锁、分段锁与多表事务，用于在多线程 WSGI 服务器下安全地读写内存数据表
+"""
+
+import threading
+import traceback
+from contextlib import contextmanager
+
+
+_local = threading.local()
+
+
+def current_transaction():
+    """返回当前线程最内层的事务，没有时返回 None"""
+    stack = getattr(_local, 'stack', None)
+    return stack[-1] if stack else None
+
+
+class RWLock:
+    """可重入读写锁（写者优先）
+
+    多个线程可以同时持有读锁；写锁独占。持有写锁的线程可以再次获取读锁或写锁，
+    持有读锁的线程不能升级为写锁。
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = {}
+        self._writer = None
+        self._write_depth = 0
+        self._waiting_writers = 0
+
+    def acquire_read(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me or me in self._readers:
+                self._readers[me] = self._readers.get(me, 0) + 1
+                return
+            while self._writer is not None or self._waiting_writers:
+                self._cond.wait()
+            self._readers[me] = 1
+
+    def release_read(self):
+        me = threading.get_ident()
+        with self._cond:
+            count = self._readers[me] - 1
+            if count:
+                self._readers[me] = count
+            else:
+                del self._readers[me]
+                if not self._readers:
+                    self._cond.notify_all()
+
+    def acquire_write(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._write_depth += 1
+                return
+            if me in self._readers:
+                raise RuntimeError('不支持将读锁升级为写锁')
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = me
+            self._write_depth = 1
+
+    def release_write(self):
+        with self._cond:
+            self._write_depth -= 1
+            if not self._write_depth:
+                self._writer = None
+                self._cond.notify_all()
+
+    def held_for_write(self):
+        """当前线程是否持有写锁"""
+        return self._writer == threading.get_ident()
+
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class StripedLock:
+    """分段锁：按键哈希到固定数量的互斥锁上
+
+    用于“先检查后写入”的场景（如同一学生的选课去重），
+    不同键之间大概率互不阻塞。
+    """
+
+    def __init__(self, stripes=64):
+        self._locks = [threading.RLock() for _ in range(stripes)]
+
+    def __call__(self, *key):
+        return self._locks[hash(key) % len(self._locks)]
+
+
+class Transaction:
+    """多表事务
+
+    进入时先获取所涉日志的写入屏障（读锁），再按表名顺序获取所有声明表的写锁（固定顺序避免死锁），
+    期间对这些表的写操作记入撤销日志；发生异常时逆序撤销，保证要么全部生效、要么全部不生效。
+    事务中只能写入已声明的表。写入持久化日志的记录在最外层事务提交时作为一批写入，回滚时丢弃。
+    """
+
+    def __init__(self, tables):
+        self.tables = sorted(set(tables), key=lambda t: t.name)
+        self._undo = []
+        self._pending = []
+
+    def covers(self, table):
+        return any(table in txn.tables for txn in _local.stack)
+
+    def record(self, undo):
+        """登记一个撤销操作"""
+        self._undo.append(undo)
+
+    def stage(self, journal, entry):
+        """暂存一条持久化日志记录，提交时写入"""
+        self._pending.append((journal, entry))
+
+    def __enter__(self):
+        journals = {id(t.journal): t.journal for t in self.tables if t.journal is not None}
+        self._barriers = [journal.barrier for journal in journals.values()]
+        locks = [(barrier.acquire_read, barrier.release_read) for barrier in self._barriers]
+        locks += [(table.lock.acquire_write, table.lock.release_write) for table in self.tables]
+        acquired = []
+        try:
+            for acquire, release in locks:
+                acquire()
+                acquired.append(release)
+        except BaseException:
+            for release in reversed(acquired):
+                release()
+            raise
+        if not hasattr(_local, 'stack'):
+            _local.stack = []
+        _local.stack.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _local.stack.pop()
+        try:
+            if exc_type is not None:
+                # 撤销先恢复数据再通知监听者；监听者在撤销时再次出错也要继续撤销其余写入，原异常照常抛出
+                for undo in reversed(self._undo):
+                    try:
+                        undo()
+                    except Exception:
+                        traceback.print_exc()
+            elif _local.stack:
+                # 嵌套事务提交后并入外层，外层回滚时一并撤销
+                _local.stack[-1]._undo.extend(self._undo)
+                _local.stack[-1]._pending.extend(self._pending)
+            else:
+                self._commit_journal()
+        finally:
+            self._undo = []
+            self._pending = []
+            for table in reversed(self.tables):
+                table.lock.release_write()
+            for barrier in reversed(self._barriers):
+                barrier.release_read()
+        return False
+
+    def _commit_journal(self):
+        """仍持有写锁时写入日志，保证日志顺序与数据修改顺序一致"""
+        batches = {}
+        for journal, entry in self._pending:
+            batches.setdefault(id(journal), (journal, []))[1].append(entry)
+        for journal, entries in batches.values():
+            journal.append(entries)
@@ -3,9 +3,25 @@
 包含所有实体的模型定义和模拟数据
 """
 
+import atexit
+import threading
 from datetime import datetime
 from enum import Enum
 
+from config import Config
+from models.analytics import GradeAnalytics, score_summary
+from models.availability import RoomAvailability
+from models.cache import QueryCache, cached_query
+from models.columnar import ColumnarTable
+from models.enrollment import EnrollmentEngine
+from models.exams import exam_span, find_conflicts
+from models.grading import check_score, score_to_gpa
+from models.invigilation import teaching_span
+from models.locking import StripedLock, Transaction
+from models.table import Table
+from models.timetable import schedule_mask
+from models.views import ApprovalQueue, ScheduleView, StatisticsCounters
+
 
 # ==================== 枚举类型 ====================
 
@@ -27,13 +43,549 @@ class StudentStatus(Enum):
     GRADUATED = 'graduated'
     WITHDRAWN = 'withdrawn'
 
+# ==================== 数据访问基类 ====================
+
+class Database:
+    """数据访问基类：数据表 + 查询方法
+    
+    子类负责把 TABLE_NAMES 中的每张表创建为 self.<表名>，数据表需提供
+    get / find / find_one / count / insert / update / delete 等接口。
+    MockDatabase 使用内存表，models.repository.SqlDatabase 使用 SQL 数据库。
+    """
+    
+    TABLE_NAMES = (
+        'users', 'students', 'teachers', 'courses', 'schedules', 'course_selections',
+        'grades', 'grade_reviews', 'evaluations', 'graduation_topics', 'topic_applications',
+        'instructor_relations', 'process_documents', 'classrooms', 'classroom_borrow_records',
+        'exam_arrangements', 'invigilator_assignments', 'status_changes', 'retake_applications',
+    )
+    
+    # 二级索引声明：表名 -> 建立索引的字段，写入时自动维护
+    INDEXES = {
+        'users': ('username',),
+        'students': ('user_id',),
+        'teachers': ('user_id',),
+        'courses': ('teacher_id',),
+        'schedules': ('course_id', 'semester'),
+        'course_selections': ('student_id', 'schedule_id'),
+        'grades': ('selection_id',),
+        'grade_reviews': ('grade_id', 'student_id'),
+        'evaluations': ('student_id', 'selection_id'),
+        'graduation_topics': ('teacher_id',),
+        'topic_applications': ('student_id', 'topic_id'),
+        'instructor_relations': ('student_id', 'teacher_id'),
+        'process_documents': ('student_id',),
+        'classrooms': ('room_no',),
+        'classroom_borrow_records': ('classroom_id',),
+        'exam_arrangements': ('schedule_id', 'classroom'),
+        'invigilator_assignments': ('teacher_id', 'exam_id'),
+        'status_changes': ('student_id',),
+        'retake_applications': ('student_id',),
+    }
+    
+    def __init__(self):
+        # 分段锁，供“检查后写入”的路由按学生 / 排课等键串行化
+        self.row_locks = StripedLock()
+        # 查询结果缓存（models.cache.QueryCache），为空时不缓存
+        self.query_cache = None
+    
+    # ==================== 并发控制 ====================
+    
+    def transaction(self, *table_names):
+        """开启多表事务：持有各表写锁，异常时回滚全部写入
+        
+        事务中读取的其他表也要一并声明：持有写锁时再去获取未声明表的读锁，
+        会与以相反顺序加锁的事务互相等待。
+        
+        用法：
+            with db.transaction('topic_applications', 'instructor_relations'):
+                ...
+        """
+        tables = self.tables()
+        return Transaction([tables[name] for name in table_names])
+    
+    def row_lock(self, kind, key):
+        """返回某个业务键（如 ('student', 1)）对应的分段锁"""
+        return self.row_locks(kind, key)
+    
+    # ==================== 快照 ====================
+    
+    def tables(self):
+        """返回 表名 -> 数据表 的映射"""
+        return {name: getattr(self, name) for name in self.TABLE_NAMES}
+    
+    def snapshot(self):
+        """导出全部数据表的快照（含各表的主键序列）"""
+        return {name: table.dump() for name, table in self.tables().items()}
+    
+    def restore(self, snapshot):
+        """从快照恢复数据表"""
+        tables = self.tables()
+        for name, state in snapshot.items():
+            tables[name].load(state)
+    
+    def table_versions(self, table_names):
+        """各表的版本号，供查询缓存与 ETag 判断数据是否变化"""
+        return tuple(getattr(self, name).version for name in table_names)
+    
+    # ==================== 查询方法 ====================
+    
+    def get_user_by_username(self, username):
+        """根据用户名查找用户"""
+        return self.users.find_one('username', username)
+    
+    def get_user_by_id(self, user_id):
+        """根据ID查找用户"""
+        return self.users.get(user_id)
+    
+    def get_student_by_user_id(self, user_id):
+        """根据用户ID查找学生信息"""
+        return self.students.find_one('user_id', user_id)
+    
+    def get_teacher_by_user_id(self, user_id):
+        """根据用户ID查找教师信息"""
+        return self.teachers.find_one('user_id', user_id)
+    
+    def get_course_by_id(self, course_id):
+        """根据ID查找课程"""
+        return self.courses.get(course_id)
+    
+    def get_schedule_by_id(self, schedule_id):
+        """根据ID查找课程表"""
+        return self.schedules.get(schedule_id)
+    
+    @cached_query('course_selections', 'schedules', 'courses', 'teachers', 'users')
+    def get_schedules_by_student(self, student_id):
+        """获取学生的课程表"""
+        result = []
+        for selection in self.course_selections.find('student_id', student_id):
+            if selection['status'] == 'confirmed':
+                schedule = self.schedule_view.get(selection['schedule_id'])
+                if schedule:
+                    result.append(schedule)
+        return result
+    
+    def get_teacher_by_id(self, teacher_id):
+        """根据ID查找教师"""
+        return self.teachers.get(teacher_id)
+    
+    @cached_query('courses', 'schedules')
+    def get_schedules_by_teacher(self, teacher_id):
+        """获取教师的课程表"""
+        result = []
+        for course in self.courses.find('teacher_id', teacher_id):
+            for schedule in self.schedules.find('course_id', course['id']):
+                result.append({
+                    **schedule,
+                    'course': course
+                })
+        result.sort(key=lambda s: s['id'])
+        return result
+    
+    @cached_query('course_selections', 'grades', 'schedules', 'courses')
+    def get_grades_by_student(self, student_id):
+        """获取学生成绩"""
+        result = []
+        for selection in self.course_selections.find('student_id', student_id):
+            for grade in self.grades.find('selection_id', selection['id']):
+                schedule = self.get_schedule_by_id(selection['schedule_id'])
+                course = self.get_course_by_id(schedule['course_id']) if schedule else None
+                result.append({
+                    **grade,
+                    'course': course,
+                    'semester': schedule['semester'] if schedule else ''
+                })
+        return result
+    
+    @cached_query('evaluations', 'course_selections', 'schedules', 'courses', 'teachers', 'users')
+    def get_pending_evaluations(self, student_id):
+        """获取未完成的评教"""
+        result = []
+        for evaluation in self.evaluations.find('student_id', student_id):
+            if evaluation['status'] == 'pending':
+                selection = self.course_selections.get(evaluation['selection_id'])
+                if selection:
+                    schedule = self.get_schedule_by_id(selection['schedule_id'])
+                    course = self.get_course_by_id(schedule['course_id']) if schedule else None
+                    teacher = self.get_teacher_by_id(course['teacher_id']) if course else None
+                    teacher_user = self.get_user_by_id(teacher['user_id']) if teacher else None
+                    result.append({
+                        **evaluation,
+                        'course': course,
+                        'teacher_name': teacher_user['name'] if teacher_user else ''
+                    })
+        return result
+    
+    @cached_query('schedules', 'courses', 'teachers', 'users')
+    def get_available_courses(self, semester):
+        """获取可选课程"""
+        return self.schedule_view.by_semester(semester)
+    
+    @cached_query('schedules', 'courses', 'teachers', 'users')
+    def get_all_schedules(self):
+        """获取全部排课（含课程与任课教师姓名）"""
+        return self.schedule_view.all()
+    
+    @cached_query('exam_arrangements', 'schedules', 'courses')
+    def get_all_exams(self):
+        """获取全部考试安排（含课程）"""
+        result = []
+        for exam in self.exam_arrangements:
+            schedule = self.get_schedule_by_id(exam['schedule_id'])
+            course = self.get_course_by_id(schedule['course_id']) if schedule else None
+            result.append({
+                **exam,
+                'course': course
+            })
+        return result
+    
+    def get_all_approvals(self):
+        """获取所有待审批项目"""
+        return self.approval_queue.all()
+    
+    def count_pending_approvals(self, approval_type=None):
+        """待审批数量，approval_type 为空时返回总数"""
+        return self.approval_queue.count(approval_type)
+    
+    def count_pending_approvals_by_type(self):
+        """各类型的待审批数量"""
+        return self.approval_queue.counts()
+    
+    def get_approvals_page(self, offset, limit, approval_type=None):
+        """按提交时间排序分页获取待审批项目"""
+        return self.approval_queue.page(offset, limit, approval_type)
+    
+    def enroll(self, student_id, schedule_id, selected_at):
+        """选课，返回 (结果, 选课记录)；结果见 models.enrollment 中的 ENROLLED / DUPLICATE / FULL / NOT_FOUND / CONFLICT"""
+        return self.enrollment.enroll(student_id, schedule_id, selected_at)
+    
+    def get_timetable_conflicts(self, student_id, schedules):
+        """schedules 中与学生已选课程时间冲突的排课 id 集合"""
+        return self.enrollment.conflicts(student_id, [s['id'] for s in schedules])
+    
+    def drop_selection(self, student_id, schedule_id):
+        """退课，返回被删除的选课记录；未选该课时返回 None"""
+        return self.enrollment.drop(student_id, schedule_id)
+    
+    def get_schedule_seats(self, schedule_id):
+        """排课的容量、已选人数与余量，排课不存在时返回 None"""
+        return self.enrollment.seats(schedule_id)
+    
+    def find_schedule_clashes(self, schedule, exclude_id=None):
+        """同学期中与 schedule 时间重叠且占用同一教室或同一任课教师的排课（宽表行）"""
+        mask = schedule_mask(schedule)
+        if not mask:
+            return []
+        course = self.get_course_by_id(schedule.get('course_id'))
+        teacher_id = course['teacher_id'] if course else None
+        return [row for row in self.get_available_courses(schedule.get('semester'))
+                if row['id'] != exclude_id and schedule_mask(row) & mask and (
+                    row['classroom'] == schedule.get('classroom')
+                    or (teacher_id is not None and row['course'] and row['course']['teacher_id'] == teacher_id))]
+    
+    def estimate_enrollment(self, course_ids):
+        """各课程以往单个排课的最大选课人数，用作自动排课的预计人数；从未开过的课程不在结果中"""
+        result = {}
+        for course_id in course_ids:
+            counts = [self.enrollment.enrolled(s['id']) for s in self.schedules.find('course_id', course_id)]
+            if counts:
+                result[course_id] = max(counts)
+        return result
+    
+    def get_students_by_schedules(self, schedule_ids):
+        """各排课已确认选课的学生 id：排课 id -> 学生 id 列表"""
+        return {schedule_id: [s['student_id'] for s in self.course_selections.find('schedule_id', schedule_id)
+                              if s['status'] == 'confirmed']
+                for schedule_id in schedule_ids}
+    
+    def count_shared_students(self, schedule_id):
+        """与该排课有共同学生的其他排课：排课 id -> 共同学生人数"""
+        shared = {}
+        for student_id in self.get_students_by_schedules([schedule_id])[schedule_id]:
+            for selection in self.course_selections.find('student_id', student_id):
+                if selection['schedule_id'] != schedule_id and selection['status'] == 'confirmed':
+                    shared[selection['schedule_id']] = shared.get(selection['schedule_id'], 0) + 1
+        return shared
+    
+    def find_exam_clashes(self, exam, exclude_id=None):
+        """与 exam 时间重叠且同一教室、或与其有共同考生的考试
+        
+        返回 [{'exam': 考试行, 'kind': 'room' / 'student', 'students': 共同考生人数}]
+        """
+        span = exam_span(exam)
+        if span is None:
+            return []
+        
+        def overlaps(row):
+            other = exam_span(row) if row['id'] != exclude_id else None
+            return other is not None and other[0] < span[1] and span[0] < other[1]
+        
+        clashes = [{'exam': row, 'kind': 'room', 'students': 0}
+                   for row in self.exam_arrangements.find('classroom', exam.get('classroom')) if overlaps(row)]
+        for schedule_id, count in self.count_shared_students(exam.get('schedule_id')).items():
+            clashes.extend({'exam': row, 'kind': 'student', 'students': count}
+                           for row in self.exam_arrangements.find('schedule_id', schedule_id) if overlaps(row))
+        return clashes
+    
+    def find_room_conflicts(self, classroom_id, date, start_time, end_time, exclude_borrow_id=None):
+        """教室在 date 的 start_time 至 end_time 内的排课、考试与已批准的借用（exclude_borrow_id 为不计入的借用）
+        
+        返回 [{'kind': 'teaching' / 'exam' / 'borrow', 'row': 对应的行}]；日期或时间无效时抛出 ValueError
+        """
+        return self.room_availability.conflicts(classroom_id, date, start_time, end_time, exclude_borrow_id)
+    
+    def find_free_classrooms(self, date, start_time, end_time, building=None, min_capacity=None, room_type=None):
+        """date 的 start_time 至 end_time 内空闲、满足楼宇、最小容量与类型条件的教室；日期或时间无效时抛出 ValueError"""
+        return self.room_availability.free(date, start_time, end_time, building, min_capacity, room_type)
+    
+    def find_teacher_clashes(self, teacher_id, exam, exclude_id=None):
+        """教师在 exam 的时段内的课程与其他监考（exclude_id 为不计入的监考安排 id）
+        
+        返回 [{'kind': 'teaching', 'schedule': 排课（含课程）} 或 {'kind': 'invigilation', 'exam': 考试行, 'course': 课程}]
+        """
+        span = exam_span(exam)
+        if span is None:
+            return []
+        
+        def overlaps(other):
+            return other is not None and other[0] < span[1] and span[0] < other[1]
+        
+        clashes = [{'kind': 'teaching', 'schedule': schedule}
+                   for schedule in self.get_schedules_by_teacher(teacher_id)
+                   if overlaps(teaching_span(schedule, exam['date']))]
+        clashes.extend({'kind': 'invigilation', 'exam': item['exam'], 'course': item['course']}
+                       for item in self.get_exams_by_teacher(teacher_id)
+                       if item['id'] != exclude_id and overlaps(exam_span(item['exam'])))
+        return clashes
+    
+    @cached_query('exam_arrangements', 'course_selections', 'schedules', 'courses', 'classrooms')
+    def check_exams(self, semester=None, limit=100):
+        """检查考试安排中的考生冲突、教室冲突与容量不足，见 models.exams.find_conflicts"""
+        exams = self.get_all_exams()
+        if semester:
+            offered = {s['id'] for s in self.schedules.find('semester', semester)}
+            exams = [exam for exam in exams if exam['schedule_id'] in offered]
+        students = self.get_students_by_schedules({exam['schedule_id'] for exam in exams})
+        capacities = {room['room_no']: room['capacity'] for room in self.classrooms}
+        return find_conflicts(exams, students, capacities, limit)
+    
+    def get_statistics(self):
+        """教务统计数据"""
+        return {
+            'student_count': len(self.students),
+            'teacher_count': len(self.teachers),
+            'course_count': len(self.courses),
+            'classroom_count': len(self.classrooms),
+            'pending_approvals': self.count_pending_approvals(),
+            'approvals_by_type': self.count_pending_approvals_by_type(),
+            **self.count_statistics()
+        }
+    
+    def count_statistics(self):
+        """学生、选课、成绩、评教的分组计数"""
+        return self.statistics_counters.snapshot()
+    
+    def get_grade_analytics(self, semester=None):
+        """全体学生的加权平均绩点、班级与专业内的名次和分布（models.analytics.Cohorts）
+        
+        semester 为空时统计全部学期
+        """
+        return self.grade_analytics.result(semester)
+    
+    def get_student_by_id(self, student_id):
+        """根据ID查找学生"""
+        return self.students.get(student_id)
+    
+    def get_topic_by_id(self, topic_id):
+        """根据ID查找课题"""
+        return self.graduation_topics.get(topic_id)
+    
+    def get_classroom_by_id(self, classroom_id):
+        """根据ID查找教室"""
+        return self.classrooms.get(classroom_id)
+    
+    @cached_query('invigilator_assignments', 'exam_arrangements', 'schedules', 'courses')
+    def get_exams_by_teacher(self, teacher_id):
+        """获取教师的监考安排"""
+        result = []
+        for assignment in self.invigilator_assignments.find('teacher_id', teacher_id):
+            exam = self.exam_arrangements.get(assignment['exam_id'])
+            if exam:
+                schedule = self.get_schedule_by_id(exam['schedule_id'])
+                course = self.get_course_by_id(schedule['course_id']) if schedule else None
+                result.append({
+                    **assignment,
+                    'exam': exam,
+                    'course': course
+                })
+        return result
+    
+    @cached_query('graduation_topics', 'topic_applications')
+    def get_topics_by_teacher(self, teacher_id):
+        """获取教师的毕设课题"""
+        result = []
+        for topic in self.graduation_topics.find('teacher_id', teacher_id):
+            # 统计已选学生数
+            selected_count = sum(1 for app in self.topic_applications.find('topic_id', topic['id'])
+                                 if app['status'] == 'approved')
+            result.append({
+                **topic,
+                'selected_count': selected_count
+            })
+        return result
+    
+    @cached_query('instructor_relations', 'students', 'users', 'graduation_topics')
+    def get_students_by_teacher(self, teacher_id):
+        """获取教师指导的学生"""
+        result = []
+        for relation in self.instructor_relations.find('teacher_id', teacher_id):
+            student = self.get_student_by_id(relation['student_id'])
+            user = self.get_user_by_id(student['user_id']) if student else None
+            topic = self.get_topic_by_id(relation['topic_id'])
+            result.append({
+                'student': student,
+                'student_name': user['name'] if user else '',
+                'topic': topic,
+                'status': relation['status']
+            })
+        return result
+    
+    @cached_query('grade_reviews', 'grades', 'course_selections', 'schedules', 'courses', 'students', 'users')
+    def get_grade_reviews_by_teacher(self, teacher_id):
+        """获取教师相关的成绩复核申请"""
+        result = []
+        for review in self.grade_reviews:
+            grade = self.grades.get(review['grade_id'])
+            if grade:
+                selection = self.course_selections.get(grade['selection_id'])
+                if selection:
+                    schedule = self.get_schedule_by_id(selection['schedule_id'])
+                    course = self.get_course_by_id(schedule['course_id']) if schedule else None
+                    if course and course['teacher_id'] == teacher_id:
+                        student = self.get_student_by_id(selection['student_id'])
+                        user = self.get_user_by_id(student['user_id']) if student else None
+                        result.append({
+                            **review,
+                            'grade': grade,
+                            'course': course,
+                            'student_name': user['name'] if user else ''
+                        })
+        return result
+    
+    @cached_query('course_selections', 'students', 'users', 'grades')
+    def get_course_students(self, schedule_id):
+        """获取课程的学生列表及成绩"""
+        result = []
+        for selection in self.course_selections.find('schedule_id', schedule_id):
+            student = self.get_student_by_id(selection['student_id'])
+            user = self.get_user_by_id(student['user_id']) if student else None
+            grade = self.grades.find_one('selection_id', selection['id'])
+            result.append({
+                'selection_id': selection['id'],
+                'student': student,
+                'student_name': user['name'] if user else '',
+                'grade': grade
+            })
+        return result
+    
+    @cached_query('course_selections', 'grades')
+    def get_course_grade_statistics(self, schedule_id):
+        """课程成绩统计：选课人数与已录入成绩的均值、中位数、标准差、及格率和分段分布，见 models.analytics.score_summary"""
+        students = self.get_course_students(schedule_id)
+        return {
+            'enrolled': len(students),
+            **score_summary(s['grade']['score'] if s['grade'] else None for s in students)
+        }
+    
+    def get_selection_schedules(self, selection_ids):
+        """选课记录所属的排课：选课 id -> 排课 id，不存在的选课记录不出现在结果中"""
+        result = {}
+        for selection_id in selection_ids:
+            selection = self.course_selections.get(selection_id)
+            if selection:
+                result[selection_id] = selection['schedule_id']
+        return result
+    
+    def get_grades_by_selections(self, selection_ids):
+        """选课记录的成绩：选课 id -> 成绩行，尚未录入的不出现在结果中"""
+        result = {}
+        for selection_id in selection_ids:
+            grade = self.grades.find_one('selection_id', selection_id)
+            if grade:
+                result[selection_id] = grade
+        return result
+    
+    def upsert_grades(self, teacher_id, grades, status='final'):
+        """批量录入成绩：grades 为 [{'selection_id', 'score'}]
+        
+        逐条校验：成绩为 0～100 的数字，选课记录属于该教师的课程，同一选课记录在本批中只出现一次；
+        有任一错误时不写入任何成绩。通过时在一个事务中更新已有成绩、批量插入新成绩，绩点按 score_to_gpa 换算。
+        返回 {'inserted': 新增条数, 'updated': 更新条数, 'errors': [{'index': 序号, 'selection_id', 'message'}]}
+        """
+        owned = {schedule['id'] for schedule in self.get_schedules_by_teacher(teacher_id)}
+        items = [item if isinstance(item, dict) else {} for item in grades]
+        selection_ids = [item.get('selection_id') for item in items]
+        schedules = self.get_selection_schedules([selection_id for selection_id in selection_ids
+                                                  if _is_id(selection_id)])
+        
+        errors, seen, rows = [], set(), []
+        for index, (item, selection_id) in enumerate(zip(items, selection_ids)):
+            if not _is_id(selection_id):
+                message = '缺少选课记录'
+            elif selection_id in seen:
+                message = '选课记录重复'
+            elif schedules.get(selection_id) not in owned:
+                message = '不是本人课程的选课记录'
+            else:
+                message = check_score(item.get('score'))
+            if message:
+                errors.append({'index': index, 'selection_id': selection_id, 'message': message})
+                continue
+            seen.add(selection_id)
+            rows.append((selection_id, item['score']))
+        if errors:
+            return {'inserted': 0, 'updated': 0, 'errors': errors}
+        
+        inserts = []
+        with self.transaction('grades'):
+            existing = self.get_grades_by_selections([selection_id for selection_id, _ in rows])
+            for selection_id, score in rows:
+                values = {'score': score, 'gpa': score_to_gpa(score), 'status': status}
+                grade = existing.get(selection_id)
+                if grade:
+                    self.grades.update(grade['id'], values)
+                else:
+                    inserts.append({'selection_id': selection_id, **values})
+            if inserts:
+                self.grades.insert_many(inserts)
+        return {'inserted': len(inserts), 'updated': len(rows) - len(inserts), 'errors': []}
+
+
+def _is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
 
 # ==================== 模拟数据存储 ====================
 
-class MockDatabase:
+class MockDatabase(Database):
     """模拟数据库，用于开发测试"""
     
-    def __init__(self):
+    # 列式存储的大表：表名 -> {字段: 列类型}，columnar=True 时启用
+    COLUMNAR_SCHEMAS = {
+        'course_selections': {
+            'student_id': 'int', 'schedule_id': 'int', 'status': 'category', 'selected_at': 'category',
+        },
+        'grades': {
+            'selection_id': 'int', 'score': 'number', 'gpa': 'float', 'status': 'category',
+        },
+        'evaluations': {
+            'selection_id': 'int', 'student_id': 'int', 'rating': 'int', 'comment': 'text', 'status': 'category',
+        },
+    }
+    
+    def __init__(self, columnar=False):
+        super().__init__()
+        self.columnar = columnar
         self._init_users()
         self._init_students()
         self._init_teachers()
@@ -46,50 +598,67 @@ class MockDatabase:
         self._init_classrooms()
         self._init_exams()
         self._init_applications()
+        self._init_views()
+    
+    def _init_views(self):
+        """初始化由数据表变更增量维护的派生视图"""
+        self.schedule_view = ScheduleView(self)
+        self.approval_queue = ApprovalQueue(self)
+        self.statistics_counters = StatisticsCounters(self)
+        self.enrollment = EnrollmentEngine(self)
+        self.room_availability = RoomAvailability(self)
+        self.grade_analytics = GradeAnalytics(self)
+    
+    def _create_table(self, name, rows):
+        """按 INDEXES / COLUMNAR_SCHEMAS 中的声明创建数据表"""
+        indexes = self.INDEXES.get(name, ())
+        if self.columnar and name in self.COLUMNAR_SCHEMAS:
+            return ColumnarTable(name, self.COLUMNAR_SCHEMAS[name], rows, indexes=indexes)
+        return Table(name, rows, indexes=indexes)
     
     def _init_users(self):
         """初始化用户数据"""
-        self.users = [
+        self.users = self._create_table('users', [
             {'id': 1, 'username': 'student1', 'password': '123456', 'role': 'student', 'name': '张三'},
             {'id': 2, 'username': 'student2', 'password': '123456', 'role': 'student', 'name': '李四'},
             {'id': 3, 'username': 'student3', 'password': '123456', 'role': 'student', 'name': '王五'},
             {'id': 4, 'username': 'teacher1', 'password': '123456', 'role': 'teacher', 'name': '刘教授'},
             {'id': 5, 'username': 'teacher2', 'password': '123456', 'role': 'teacher', 'name': '陈教授'},
             {'id': 6, 'username': 'admin1', 'password': '123456', 'role': 'admin', 'name': '教务管理员'},
-        ]
+        ])
     
     def _init_students(self):
         """初始化学生数据"""
-        self.students = [
+        self.students = self._create_table('students', [
             {'id': 1, 'user_id': 1, 'student_no': '2021001001', 'class_name': '计算机2101班', 
              'major': '计算机科学与技术', 'grade': '2021级', 'status': 'normal'},
             {'id': 2, 'user_id': 2, 'student_no': '2021001002', 'class_name': '计算机2101班',
              'major': '计算机科学与技术', 'grade': '2021级', 'status': 'normal'},
             {'id': 3, 'user_id': 3, 'student_no': '2021002001', 'class_name': '软件2101班',
              'major': '软件工程', 'grade': '2021级', 'status': 'normal'},
-        ]
+        ])
     
     def _init_teachers(self):
         """初始化教师数据"""
-        self.teachers = [
+        self.teachers = self._create_table('teachers', [
             {'id': 1, 'user_id': 4, 'teacher_no': 'T001', 'department': '计算机学院', 'title': '教授'},
             {'id': 2, 'user_id': 5, 'teacher_no': 'T002', 'department': '计算机学院', 'title': '副教授'},
-        ]
+        ])
     
     def _init_courses(self):
         """初始化课程数据"""
-        self.courses = [
+        self.courses = self._create_table('courses', [
             {'id': 1, 'code': 'CS101', 'name': '程序设计基础', 'credit': 4, 'hours': 64, 'teacher_id': 1},
             {'id': 2, 'code': 'CS201', 'name': '数据结构', 'credit': 4, 'hours': 64, 'teacher_id': 1},
             {'id': 3, 'code': 'CS301', 'name': '操作系统', 'credit': 3, 'hours': 48, 'teacher_id': 2},
             {'id': 4, 'code': 'CS302', 'name': '计算机网络', 'credit': 3, 'hours': 48, 'teacher_id': 2},
             {'id': 5, 'code': 'CS401', 'name': '数据库原理', 'credit': 3, 'hours': 48, 'teacher_id': 1},
             {'id': 6, 'code': 'CS402', 'name': '软件工程', 'credit': 3, 'hours': 48, 'teacher_id': 2},
-        ]
+        ])
     
     def _init_schedules(self):
         """初始化课程表数据"""
-        self.schedules = [
+        self.schedules = self._create_table('schedules', [
             {'id': 1, 'course_id': 1, 'semester': '2024-2025-1', 'weekday': 1, 
              'start_period': 1, 'end_period': 2, 'classroom': 'A101', 'weeks': '1-16'},
             {'id': 2, 'course_id': 2, 'semester': '2024-2025-1', 'weekday': 2, 
@@ -100,444 +669,165 @@ class MockDatabase:
              'start_period': 5, 'end_period': 6, 'classroom': 'B202', 'weeks': '1-16'},
             {'id': 5, 'course_id': 5, 'semester': '2024-2025-1', 'weekday': 5, 
              'start_period': 3, 'end_period': 4, 'classroom': 'A103', 'weeks': '1-16'},
-        ]
+        ])
     
     def _init_selections(self):
         """初始化选课数据"""
-        self.course_selections = [
+        self.course_selections = self._create_table('course_selections', [
             {'id': 1, 'student_id': 1, 'schedule_id': 1, 'status': 'confirmed', 'selected_at': '2024-09-01'},
             {'id': 2, 'student_id': 1, 'schedule_id': 2, 'status': 'confirmed', 'selected_at': '2024-09-01'},
             {'id': 3, 'student_id': 1, 'schedule_id': 3, 'status': 'confirmed', 'selected_at': '2024-09-01'},
             {'id': 4, 'student_id': 2, 'schedule_id': 1, 'status': 'confirmed', 'selected_at': '2024-09-01'},
             {'id': 5, 'student_id': 2, 'schedule_id': 4, 'status': 'confirmed', 'selected_at': '2024-09-01'},
-        ]
+        ])
     
     def _init_grades(self):
         """初始化成绩数据"""
-        self.grades = [
+        self.grades = self._create_table('grades', [
             {'id': 1, 'selection_id': 1, 'score': 85, 'gpa': 3.7, 'status': 'final'},
             {'id': 2, 'selection_id': 2, 'score': 92, 'gpa': 4.0, 'status': 'final'},
             {'id': 3, 'selection_id': 3, 'score': 78, 'gpa': 3.0, 'status': 'final'},
             {'id': 4, 'selection_id': 4, 'score': 88, 'gpa': 3.7, 'status': 'final'},
-        ]
+        ])
         
-        self.grade_reviews = [
+        self.grade_reviews = self._create_table('grade_reviews', [
             {'id': 1, 'grade_id': 3, 'student_id': 1, 'reason': '考试时身体不适，成绩与平时表现不符', 
              'status': 'pending', 'created_at': '2024-12-10'},
-        ]
+        ])
     
     def _init_evaluations(self):
         """初始化评教数据"""
-        self.evaluations = [
+        self.evaluations = self._create_table('evaluations', [
             {'id': 1, 'selection_id': 1, 'student_id': 1, 'rating': 0, 'comment': '', 'status': 'pending'},
             {'id': 2, 'selection_id': 2, 'student_id': 1, 'rating': 5, 'comment': '讲解清晰', 'status': 'completed'},
-        ]
+        ])
     
     def _init_topics(self):
         """初始化毕设课题数据"""
-        self.graduation_topics = [
+        self.graduation_topics = self._create_table('graduation_topics', [
             {'id': 1, 'teacher_id': 1, 'title': '基于深度学习的图像识别系统', 
              'description': '研究卷积神经网络在图像分类中的应用', 'max_students': 2, 'status': 'open'},
             {'id': 2, 'teacher_id': 1, 'title': '分布式数据库系统设计与实现',
              'description': '设计一个支持水平扩展的分布式数据库', 'max_students': 1, 'status': 'open'},
             {'id': 3, 'teacher_id': 2, 'title': 'Web应用安全漏洞检测工具',
              'description': '开发自动化的Web安全扫描工具', 'max_students': 2, 'status': 'open'},
-        ]
+        ])
         
-        self.topic_applications = [
+        self.topic_applications = self._create_table('topic_applications', [
             {'id': 1, 'student_id': 1, 'topic_id': 1, 'status': 'pending', 'created_at': '2024-12-01'},
-        ]
+        ])
         
-        self.instructor_relations = [
+        self.instructor_relations = self._create_table('instructor_relations', [
             {'id': 1, 'student_id': 2, 'teacher_id': 1, 'topic_id': 2, 'status': 'confirmed'},
-        ]
+        ])
         
-        self.process_documents = [
+        self.process_documents = self._create_table('process_documents', [
             {'id': 1, 'student_id': 2, 'type': '开题报告', 'file_name': 'opening_report.pdf', 
              'status': 'submitted', 'submitted_at': '2024-11-15'},
-        ]
+        ])
     
     def _init_classrooms(self):
         """初始化教室数据"""
-        self.classrooms = [
+        self.classrooms = self._create_table('classrooms', [
             {'id': 1, 'building': 'A楼', 'room_no': 'A101', 'capacity': 60, 'type': '普通教室'},
             {'id': 2, 'building': 'A楼', 'room_no': 'A102', 'capacity': 60, 'type': '普通教室'},
             {'id': 3, 'building': 'A楼', 'room_no': 'A103', 'capacity': 40, 'type': '多媒体教室'},
             {'id': 4, 'building': 'B楼', 'room_no': 'B201', 'capacity': 80, 'type': '阶梯教室'},
             {'id': 5, 'building': 'B楼', 'room_no': 'B202', 'capacity': 80, 'type': '阶梯教室'},
             {'id': 6, 'building': 'C楼', 'room_no': 'C301', 'capacity': 30, 'type': '机房'},
-        ]
+        ])
         
-        self.classroom_borrow_records = [
+        self.classroom_borrow_records = self._create_table('classroom_borrow_records', [
             {'id': 1, 'classroom_id': 3, 'applicant': '学生会', 'purpose': '社团活动',
              'date': '2024-12-20', 'start_time': '14:00', 'end_time': '17:00', 'status': 'pending'},
-        ]
+        ])
     
     def _init_exams(self):
         """初始化考试数据"""
-        self.exam_arrangements = [
+        self.exam_arrangements = self._create_table('exam_arrangements', [
             {'id': 1, 'schedule_id': 1, 'date': '2025-01-10', 'start_time': '09:00', 
              'end_time': '11:00', 'classroom': 'A101'},
             {'id': 2, 'schedule_id': 2, 'date': '2025-01-12', 'start_time': '14:00',
              'end_time': '16:00', 'classroom': 'A102'},
             {'id': 3, 'schedule_id': 3, 'date': '2025-01-14', 'start_time': '09:00',
              'end_time': '11:00', 'classroom': 'B201'},
-        ]
+        ])
         
-        self.invigilator_assignments = [
+        self.invigilator_assignments = self._create_table('invigilator_assignments', [
             {'id': 1, 'exam_id': 1, 'teacher_id': 1, 'role': '主监考'},
             {'id': 2, 'exam_id': 1, 'teacher_id': 2, 'role': '副监考'},
             {'id': 3, 'exam_id': 2, 'teacher_id': 2, 'role': '主监考'},
-        ]
+        ])
     
     def _init_applications(self):
         """初始化申请数据"""
-        self.status_changes = [
+        self.status_changes = self._create_table('status_changes', [
             {'id': 1, 'student_id': 3, 'type': '休学', 'reason': '身体原因需要休养',
              'status': 'pending', 'created_at': '2024-12-05'},
-        ]
+        ])
         
-        self.retake_applications = [
+        self.retake_applications = self._create_table('retake_applications', [
             {'id': 1, 'student_id': 1, 'course_id': 3, 'reason': '成绩不理想，希望重修提高',
              'status': 'pending', 'created_at': '2024-12-08'},
-        ]
-    
-    # ==================== 查询方法 ====================
-    
-    def get_user_by_username(self, username):
-        """根据用户名查找用户"""
-        for user in self.users:
-            if user['username'] == username:
-                return user
-        return None
-    
-    def get_user_by_id(self, user_id):
-        """根据ID查找用户"""
-        for user in self.users:
-            if user['id'] == user_id:
-                return user
-        return None
-    
-    def get_student_by_user_id(self, user_id):
-        """根据用户ID查找学生信息"""
-        for student in self.students:
-            if student['user_id'] == user_id:
-                return student
-        return None
-    
-    def get_teacher_by_user_id(self, user_id):
-        """根据用户ID查找教师信息"""
-        for teacher in self.teachers:
-            if teacher['user_id'] == user_id:
-                return teacher
-        return None
-    
-    def get_course_by_id(self, course_id):
-        """根据ID查找课程"""
-        for course in self.courses:
-            if course['id'] == course_id:
-                return course
-        return None
-    
-    def get_schedule_by_id(self, schedule_id):
-        """根据ID查找课程表"""
-        for schedule in self.schedules:
-            if schedule['id'] == schedule_id:
-                return schedule
-        return None
-    
-    def get_schedules_by_student(self, student_id):
-        """获取学生的课程表"""
-        result = []
-        for selection in self.course_selections:
-            if selection['student_id'] == student_id and selection['status'] == 'confirmed':
-                schedule = self.get_schedule_by_id(selection['schedule_id'])
-                if schedule:
-                    course = self.get_course_by_id(schedule['course_id'])
-                    teacher = self.get_teacher_by_id(course['teacher_id']) if course else None
-                    teacher_user = self.get_user_by_id(teacher['user_id']) if teacher else None
-                    result.append({
-                        **schedule,
-                        'course': course,
-                        'teacher_name': teacher_user['name'] if teacher_user else ''
-                    })
-        return result
-    
-    def get_teacher_by_id(self, teacher_id):
-        """根据ID查找教师"""
-        for teacher in self.teachers:
-            if teacher['id'] == teacher_id:
-                return teacher
-        return None
-    
-    def get_schedules_by_teacher(self, teacher_id):
-        """获取教师的课程表"""
-        result = []
-        for schedule in self.schedules:
-            course = self.get_course_by_id(schedule['course_id'])
-            if course and course['teacher_id'] == teacher_id:
-                result.append({
-                    **schedule,
-                    'course': course
-                })
-        return result
-    
-    def get_grades_by_student(self, student_id):
-        """获取学生成绩"""
-        result = []
-        for selection in self.course_selections:
-            if selection['student_id'] == student_id:
-                for grade in self.grades:
-                    if grade['selection_id'] == selection['id']:
-                        schedule = self.get_schedule_by_id(selection['schedule_id'])
-                        course = self.get_course_by_id(schedule['course_id']) if schedule else None
-                        result.append({
-                            **grade,
-                            'course': course,
-                            'semester': schedule['semester'] if schedule else ''
-                        })
-        return result
-    
-    def get_pending_evaluations(self, student_id):
-        """获取未完成的评教"""
-        result = []
-        for evaluation in self.evaluations:
-            if evaluation['student_id'] == student_id and evaluation['status'] == 'pending':
-                for selection in self.course_selections:
-                    if selection['id'] == evaluation['selection_id']:
-                        schedule = self.get_schedule_by_id(selection['schedule_id'])
-                        course = self.get_course_by_id(schedule['course_id']) if schedule else None
-                        teacher = self.get_teacher_by_id(course['teacher_id']) if course else None
-                        teacher_user = self.get_user_by_id(teacher['user_id']) if teacher else None
-                        result.append({
-                            **evaluation,
-                            'course': course,
-                            'teacher_name': teacher_user['name'] if teacher_user else ''
-                        })
-        return result
-    
-    def get_available_courses(self, semester):
-        """获取可选课程"""
-        result = []
-        for schedule in self.schedules:
-            if schedule['semester'] == semester:
-                course = self.get_course_by_id(schedule['course_id'])
-                teacher = self.get_teacher_by_id(course['teacher_id']) if course else None
-                teacher_user = self.get_user_by_id(teacher['user_id']) if teacher else None
-                result.append({
-                    **schedule,
-                    'course': course,
-                    'teacher_name': teacher_user['name'] if teacher_user else ''
-                })
-        return result
-    
-    def get_all_approvals(self):
-        """获取所有待审批项目"""
-        approvals = []
-        
-        # 学籍异动
-        for item in self.status_changes:
-            if item['status'] == 'pending':
-                student = self.get_student_by_id(item['student_id'])
-                user = self.get_user_by_id(student['user_id']) if student else None
-                approvals.append({
-                    'id': item['id'],
-                    'type': 'status_change',
-                    'type_name': '学籍异动',
-                    'subtype': item['type'],
-                    'applicant': user['name'] if user else '',
-                    'reason': item['reason'],
-                    'created_at': item['created_at'],
-                    'status': item['status']
-                })
-        
-        # 重修申请
-        for item in self.retake_applications:
-            if item['status'] == 'pending':
-                student = self.get_student_by_id(item['student_id'])
-                user = self.get_user_by_id(student['user_id']) if student else None
-                course = self.get_course_by_id(item['course_id'])
-                approvals.append({
-                    'id': item['id'],
-                    'type': 'retake',
-                    'type_name': '重修申请',
-                    'subtype': course['name'] if course else '',
-                    'applicant': user['name'] if user else '',
-                    'reason': item['reason'],
-                    'created_at': item['created_at'],
-                    'status': item['status']
-                })
-        
-        # 成绩复核
-        for item in self.grade_reviews:
-            if item['status'] == 'pending':
-                student = self.get_student_by_id(item['student_id'])
-                user = self.get_user_by_id(student['user_id']) if student else None
-                approvals.append({
-                    'id': item['id'],
-                    'type': 'grade_review',
-                    'type_name': '成绩复核',
-                    'subtype': '',
-                    'applicant': user['name'] if user else '',
-                    'reason': item['reason'],
-                    'created_at': item['created_at'],
-                    'status': item['status']
-                })
-        
-        # 毕设选题
-        for item in self.topic_applications:
-            if item['status'] == 'pending':
-                student = self.get_student_by_id(item['student_id'])
-                user = self.get_user_by_id(student['user_id']) if student else None
-                topic = self.get_topic_by_id(item['topic_id'])
-                approvals.append({
-                    'id': item['id'],
-                    'type': 'topic_application',
-                    'type_name': '毕设选题',
-                    'subtype': topic['title'] if topic else '',
-                    'applicant': user['name'] if user else '',
-                    'reason': '',
-                    'created_at': item['created_at'],
-                    'status': item['status']
-                })
-        
-        # 借教室
-        for item in self.classroom_borrow_records:
-            if item['status'] == 'pending':
-                classroom = self.get_classroom_by_id(item['classroom_id'])
-                approvals.append({
-                    'id': item['id'],
-                    'type': 'classroom_borrow',
-                    'type_name': '借教室',
-                    'subtype': classroom['room_no'] if classroom else '',
-                    'applicant': item['applicant'],
-                    'reason': item['purpose'],
-                    'created_at': item['date'],
-                    'status': item['status']
-                })
-        
-        return approvals
-    
-    def get_student_by_id(self, student_id):
-        """根据ID查找学生"""
-        for student in self.students:
-            if student['id'] == student_id:
-                return student
-        return None
-    
-    def get_topic_by_id(self, topic_id):
-        """根据ID查找课题"""
-        for topic in self.graduation_topics:
-            if topic['id'] == topic_id:
-                return topic
-        return None
-    
-    def get_classroom_by_id(self, classroom_id):
-        """根据ID查找教室"""
-        for classroom in self.classrooms:
-            if classroom['id'] == classroom_id:
-                return classroom
-        return None
-    
-    def get_exams_by_teacher(self, teacher_id):
-        """获取教师的监考安排"""
-        result = []
-        for assignment in self.invigilator_assignments:
-            if assignment['teacher_id'] == teacher_id:
-                exam = None
-                for e in self.exam_arrangements:
-                    if e['id'] == assignment['exam_id']:
-                        exam = e
-                        break
-                if exam:
-                    schedule = self.get_schedule_by_id(exam['schedule_id'])
-                    course = self.get_course_by_id(schedule['course_id']) if schedule else None
-                    result.append({
-                        **assignment,
-                        'exam': exam,
-                        'course': course
-                    })
-        return result
-    
-    def get_topics_by_teacher(self, teacher_id):
-        """获取教师的毕设课题"""
-        result = []
-        for topic in self.graduation_topics:
-            if topic['teacher_id'] == teacher_id:
-                # 统计已选学生数
-                selected_count = sum(1 for app in self.topic_applications 
-                                    if app['topic_id'] == topic['id'] and app['status'] == 'approved')
-                result.append({
-                    **topic,
-                    'selected_count': selected_count
-                })
-        return result
-    
-    def get_students_by_teacher(self, teacher_id):
-        """获取教师指导的学生"""
-        result = []
-        for relation in self.instructor_relations:
-            if relation['teacher_id'] == teacher_id:
-                student = self.get_student_by_id(relation['student_id'])
-                user = self.get_user_by_id(student['user_id']) if student else None
-                topic = self.get_topic_by_id(relation['topic_id'])
-                result.append({
-                    'student': student,
-                    'student_name': user['name'] if user else '',
-                    'topic': topic,
-                    'status': relation['status']
-                })
-        return result
+        ])
+
+
+# ==================== 全局数据库入口 ====================
+
+class DatabaseProxy:
+    """全局数据库入口
     
-    def get_grade_reviews_by_teacher(self, teacher_id):
-        """获取教师相关的成绩复核申请"""
-        result = []
-        for review in self.grade_reviews:
-            grade = None
-            for g in self.grades:
-                if g['id'] == review['grade_id']:
-                    grade = g
-                    break
-            if grade:
-                selection = None
-                for s in self.course_selections:
-                    if s['id'] == grade['selection_id']:
-                        selection = s
-                        break
-                if selection:
-                    schedule = self.get_schedule_by_id(selection['schedule_id'])
-                    course = self.get_course_by_id(schedule['course_id']) if schedule else None
-                    if course and course['teacher_id'] == teacher_id:
-                        student = self.get_student_by_id(selection['student_id'])
-                        user = self.get_user_by_id(student['user_id']) if student else None
-                        result.append({
-                            **review,
-                            'grade': grade,
-                            'course': course,
-                            'student_name': user['name'] if user else ''
-                        })
-        return result
+    路由模块在导入时绑定 db，具体后端由 create_app 调用 init_database 按配置选定；
+    未初始化时默认使用模拟数据库。
+    """
     
-    def get_course_students(self, schedule_id):
-        """获取课程的学生列表及成绩"""
-        result = []
-        for selection in self.course_selections:
-            if selection['schedule_id'] == schedule_id:
-                student = self.get_student_by_id(selection['student_id'])
-                user = self.get_user_by_id(student['user_id']) if student else None
-                grade = None
-                for g in self.grades:
-                    if g['selection_id'] == selection['id']:
-                        grade = g
-                        break
-                result.append({
-                    'selection_id': selection['id'],
-                    'student': student,
-                    'student_name': user['name'] if user else '',
-                    'grade': grade
-                })
-        return result
+    def __init__(self):
+        self._target = None
+        self._lock = threading.Lock()
+    
+    def use(self, database):
+        """切换到指定的数据库实例"""
+        self._target = database
+        return database
+    
+    @property
+    def target(self):
+        """当前使用的数据库实例"""
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    self._target = MockDatabase(columnar=Config.MOCK_COLUMNAR_TABLES)
+        return self._target
+    
+    def __getattr__(self, name):
+        return getattr(self.target, name)
+
+
+def init_database(app_config):
+    """按配置创建数据库：USE_MOCK_DATA 为真时使用内存模拟数据，否则连接 SQLALCHEMY_DATABASE_URI"""
+    if app_config.get('USE_MOCK_DATA', True):
+        database = MockDatabase(columnar=app_config.get('MOCK_COLUMNAR_TABLES', False))
+        if app_config.get('QUERY_CACHE_ENTRIES'):
+            database.query_cache = QueryCache(app_config['QUERY_CACHE_ENTRIES'],
+                                              app_config.get('QUERY_CACHE_BYTES', 64 * 1024 * 1024))
+        if app_config.get('MOCK_SCALE'):
+            from models.synthetic import populate
+            populate(database, app_config['MOCK_SCALE'], app_config.get('MOCK_SEED', 2024))
+        if app_config.get('PERSIST_DIR'):
+            from models.persistence import Persistence
+            database.persistence = Persistence(
+                database, app_config['PERSIST_DIR'],
+                flush_interval=app_config.get('JOURNAL_FLUSH_INTERVAL', 0.01),
+                compact_interval=app_config.get('SNAPSHOT_INTERVAL', 300),
+                compact_bytes=app_config.get('SNAPSHOT_JOURNAL_BYTES', 64 * 1024 * 1024)
+            ).open()
+            atexit.register(database.persistence.close)
+        return db.use(database)
+    
+    from models.repository import SqlDatabase
+    return db.use(SqlDatabase(app_config['SQLALCHEMY_DATABASE_URI'],
+                              pool_size=app_config.get('DB_POOL_SIZE', 8)))
 
 
-# 全局模拟数据库实例
-db = MockDatabase()
+# 全局数据库实例
+db = DatabaseProxy()
@@ -0,0 +1,264 @@
+"""
+内存数据持久化
+写操作追加到日志文件（批量 fsync 的组提交），定期压缩为二进制快照；
+启动时用内存映射读取最新快照，再重放其后的日志，重启不丢数据
+"""
+
+import mmap
+import os
+import pickle
+import re
+import struct
+import threading
+import time
+import zlib
+
+from models.locking import RWLock
+
+
+# 日志帧：4 字节长度 + 4 字节 CRC32 + pickle 负载（一批记录）
+_FRAME = struct.Struct('<II')
+# 快照头：8 字节魔数 + 8 字节长度 + 4 字节 CRC32，其后为 pickle 负载
+_SNAPSHOT_HEADER = struct.Struct('<8sQI')
+_SNAPSHOT_MAGIC = b'EDUSNAP1'
+_SNAPSHOT_FILE = re.compile(r'^snapshot-(\d+)\.bin$')
+_JOURNAL_FILE = re.compile(r'^journal-(\d+)\.log$')
+
+
+class Journal:
+    """追加写日志
+
+    append 只把序列化后的记录放入缓冲区（微秒级）；后台线程每隔 flush_interval
+    把缓冲区写入文件并 fsync，一次 fsync 覆盖期间所有写入（组提交）。
+    需要确认落盘时调用 sync。
+
+    barrier 是写入屏障：每次写入从获取表写锁之前到记入日志之后持有它的读锁，
+    压缩时持有写锁，即可在没有进行中写入的时刻导出快照并切换日志。
+    """
+
+    def __init__(self, path, flush_interval=0.01):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._file = open(path, 'ab')
+        self._buffer = bytearray()
+        self._cond = threading.Condition(threading.Lock())
+        self._io = threading.Lock()
+        self._closed = False
+        self.barrier = RWLock()
+        self._flusher = threading.Thread(target=self._run, name='journal-flusher', daemon=True)
+        self._flusher.start()
+
+    @property
+    def size(self):
+        """当前日志文件的字节数（含尚未落盘的缓冲）"""
+        return self._file.tell() + len(self._buffer)
+
+    def append(self, entries):
+        """追加一批记录，这批记录在重放时要么全部生效、要么全部不生效"""
+        payload = pickle.dumps(entries, protocol=pickle.HIGHEST_PROTOCOL)
+        frame = _FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('日志已关闭')
+            self._buffer += frame
+
+    def sync(self):
+        """把缓冲区写入文件并 fsync"""
+        with self._io:
+            with self._cond:
+                data, self._buffer = self._buffer, bytearray()
+            if data:
+                self._file.write(data)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def rotate(self, path):
+        """落盘当前日志并切换到新文件，调用方需保证期间没有写入"""
+        self.sync()
+        with self._io:
+            self._file.close()
+            self._file = open(path, 'ab')
+            self.path = path
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._flusher.join()
+        self.sync()
+        self._file.close()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                self._cond.wait(self.flush_interval)
+                if not self._buffer:
+                    continue
+            self.sync()
+
+
+def read_journal(path):
+    """读取日志中的全部批次；遇到写了一半的尾部帧时停止，并把文件截断到最后一个完整帧"""
+    batches = []
+    size = os.path.getsize(path)
+    if not size:
+        return batches
+    with open(path, 'r+b') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            offset = 0
+            while offset + _FRAME.size <= size:
+                length, crc = _FRAME.unpack_from(data, offset)
+                start = offset + _FRAME.size
+                payload = data[start:start + length]
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    break
+                batches.append(pickle.loads(payload))
+                offset = start + length
+        if offset < size:
+            f.truncate(offset)
+    return batches
+
+
+def write_snapshot(path, generation, tables):
+    """写入快照：先写临时文件并 fsync，再原子替换，中途崩溃不会留下残缺快照"""
+    payload = pickle.dumps({'generation': generation, 'tables': tables}, protocol=pickle.HIGHEST_PROTOCOL)
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(_SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, len(payload), zlib.crc32(payload)))
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def read_snapshot(path):
+    """用内存映射读取快照，校验失败时抛出 ValueError"""
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            magic, length, crc = _SNAPSHOT_HEADER.unpack_from(data)
+            if magic != _SNAPSHOT_MAGIC:
+                raise ValueError(f'{path} 不是快照文件')
+            start = _SNAPSHOT_HEADER.size
+            view = memoryview(data)[start:start + length]
+            try:
+                if len(view) != length or zlib.crc32(view) != crc:
+                    raise ValueError(f'{path} 校验失败')
+                return pickle.loads(view)
+            finally:
+                view.release()
+
+
+class Persistence:
+    """把内存数据库的写入持久化到 directory
+
+    目录中保存 snapshot-<代>.bin 与 journal-<代>.log：
+    第 N 代快照包含第 N 代日志开始之前的全部数据。压缩时先持有日志的写入屏障，
+    等进行中的写入结束后逐表导出数据并切换到新一代日志，再在屏障外写快照，写完后删除旧的快照与日志。
+    屏障总是先于任何表锁获取，压缩不会与事务互相等待。
+    """
+
+    def __init__(self, database, directory, flush_interval=0.01,
+                 compact_interval=300, compact_bytes=64 * 1024 * 1024):
+        self.database = database
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.compact_interval = compact_interval
+        self.compact_bytes = compact_bytes
+        self.journal = None
+        self.generation = 0
+        self._compacting = threading.Lock()
+        self._stop = threading.Event()
+        self._compactor = None
+
+    def open(self):
+        """恢复数据并开始记录日志；目录为空时以数据库当前内容作为第一代快照"""
+        os.makedirs(self.directory, exist_ok=True)
+        snapshots = self._files(_SNAPSHOT_FILE)
+        if snapshots:
+            self.generation = max(snapshots)
+            state = read_snapshot(snapshots[self.generation])
+            self.database.restore(state['tables'])
+            tables = self.database.tables()
+            journals = self._files(_JOURNAL_FILE)
+            for generation, path in sorted(journals.items()):
+                if generation >= self.generation:
+                    for batch in read_journal(path):
+                        for entry in batch:
+                            _apply(tables, entry)
+            # 上次压缩在切换日志后、快照写完前中断时，继续写最新一代日志以保持重放顺序
+            self.generation = max([self.generation, *journals])
+        else:
+            self.generation = 1
+            write_snapshot(self._path('snapshot', 1), 1, self.database.snapshot())
+
+        self.journal = Journal(self._path('journal', self.generation), self.flush_interval)
+        for table in self.database.tables().values():
+            table.journal = self.journal
+        if self.compact_interval:
+            self._compactor = threading.Thread(target=self._run, name='snapshot-compactor', daemon=True)
+            self._compactor.start()
+        return self
+
+    def compact(self):
+        """写入新一代快照并丢弃旧日志"""
+        with self._compacting:
+            with self.journal.barrier.write():
+                tables = self.database.snapshot()
+                generation = self.generation + 1
+                self.journal.rotate(self._path('journal', generation))
+                self.generation = generation
+            write_snapshot(self._path('snapshot', generation), generation, tables)
+            for pattern in (_SNAPSHOT_FILE, _JOURNAL_FILE):
+                for old, path in self._files(pattern).items():
+                    if old < generation:
+                        os.remove(path)
+
+    def close(self):
+        """停止后台压缩并把日志落盘"""
+        self._stop.set()
+        if self._compactor is not None:
+            self._compactor.join()
+        if self.journal is not None:
+            for table in self.database.tables().values():
+                table.journal = None
+            self.journal.close()
+            self.journal = None
+
+    def _run(self):
+        started = time.monotonic()
+        while not self._stop.wait(1):
+            due = time.monotonic() - started >= self.compact_interval
+            if due or self.journal.size >= self.compact_bytes:
+                self.compact()
+                started = time.monotonic()
+
+    def _path(self, kind, generation):
+        suffix = 'bin' if kind == 'snapshot' else 'log'
+        return os.path.join(self.directory, f'{kind}-{generation:08d}.{suffix}')
+
+    def _files(self, pattern):
+        files = {}
+        for name in os.listdir(self.directory):
+            match = pattern.match(name)
+            if match:
+                files[int(match.group(1))] = os.path.join(self.directory, name)
+        return files
+
+
+def _apply(tables, entry):
+    """重放一条日志记录"""
+    op, table = entry[0], tables[entry[1]]
+    if op == 'insert':
+        table.insert(dict(entry[2]))
+    elif op == 'update':
+        table.update(entry[2], entry[3])
+    elif op == 'delete':
+        table.delete(entry[2])
+    elif op == 'load':
+        table.load(entry[2])
+    else:
+        raise ValueError(f'未知的日志记录: {op}')
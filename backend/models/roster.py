@@ -0,0 +1,245 @@
+"""
+成绩单导入
+教师上传一门课的成绩单（CSV 或 XLSX），逐行读取、按学号匹配选课记录并校验，
+合格的行每 chunk_size 行交给 Database.upsert_grades 写入一次，不合格的行逐条报告原因。
+
+两种格式都边读边处理，不把整个文件读入内存：
+- CSV：按文本流逐行解析，编码为 UTF-8（可带 BOM）或 GB18030（Excel 另存的中文 CSV）；
+- XLSX：XLSX 是 zip 包，用 zipfile 打开后以 iterparse 流式解析第一张工作表，处理完一行即释放该行元素。
+  只依赖标准库；共享字符串表需要整体读入，按单元格文本去重后通常远小于工作表本身。
+
+表头需包含“学号”与“成绩”两列（也可写作 student_no、score），可选“姓名”列用于核对；列的顺序不限。
+"""
+
+import codecs
+import csv
+import io
+import zipfile
+from xml.etree.ElementTree import iterparse
+
+from models.grading import check_score
+
+
+COLUMNS = {
+    'student_no': ('学号', 'student_no'),
+    'score': ('成绩', '分数', '总评', 'score'),
+    'student_name': ('姓名', 'student_name', 'name'),
+}
+
+_MAIN = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_REL = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_PACKAGE_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+
+def read_rows(stream, filename):
+    """按文件扩展名逐行读取成绩单，生成每行单元格文本的列表；不支持的格式抛出 ValueError"""
+    name = (filename or '').lower()
+    if name.endswith('.csv'):
+        return _read_csv(stream)
+    if name.endswith('.xlsx'):
+        return _read_xlsx(stream)
+    raise ValueError('仅支持 CSV 与 XLSX 格式的成绩单')
+
+
+def import_grades(database, teacher_id, schedule_id, rows, chunk_size=500, error_limit=200):
+    """把成绩单的各行导入该排课的成绩
+
+    rows 为 read_rows 生成的行（第一行为表头）。返回
+    {'total': 数据行数, 'imported': 写入行数, 'inserted', 'updated', 'skipped': 成绩为空而跳过的行数,
+     'error_count': 出错行数, 'errors': [{'row': 行号, 'student_no', 'message'}]（最多 error_limit 条）}；
+    表头缺少必需的列时抛出 ValueError。
+    """
+    rows = iter(rows)
+    columns = _header(next(rows, None))
+    selections = {}
+    for item in database.get_course_students(schedule_id):
+        if item['student']:
+            selections[str(item['student']['student_no'])] = (item['selection_id'], item['student_name'])
+
+    result = {'total': 0, 'imported': 0, 'inserted': 0, 'updated': 0, 'skipped': 0, 'error_count': 0, 'errors': []}
+
+    def fail(line, student_no, message):
+        result['error_count'] += 1
+        if len(result['errors']) < error_limit:
+            result['errors'].append({'row': line, 'student_no': student_no, 'message': message})
+
+    chunk, lines, seen = [], [], set()
+
+    def flush():
+        outcome = database.upsert_grades(teacher_id, chunk)
+        if outcome['errors']:
+            # 读取后数据被并发修改时才会出现：整块未写入，逐行报告
+            messages = {error['index']: error['message'] for error in outcome['errors']}
+            for index, item in enumerate(chunk):
+                fail(lines[index], item['student_no'], messages.get(index, '同批中有其他错误，未写入'))
+        else:
+            result['imported'] += len(chunk)
+            result['inserted'] += outcome['inserted']
+            result['updated'] += outcome['updated']
+        chunk.clear()
+        lines.clear()
+
+    for line, row in enumerate(rows, start=2):
+        values = {key: (row[index] if index < len(row) else '').strip() for key, index in columns.items()}
+        if not any(values.values()):
+            continue
+        result['total'] += 1
+        student_no = values['student_no']
+        if not student_no:
+            fail(line, student_no, '缺少学号')
+            continue
+        if student_no not in selections:
+            fail(line, student_no, '该学生未选本课程')
+            continue
+        if student_no in seen:
+            fail(line, student_no, '学号重复')
+            continue
+        selection_id, student_name = selections[student_no]
+        if values.get('student_name') and values['student_name'] != student_name:
+            fail(line, student_no, f'姓名与学号不符（应为 {student_name}）')
+            continue
+        if not values['score']:
+            result['skipped'] += 1
+            continue
+        score = _number(values['score'])
+        error = check_score(score) if score is not None else '成绩必须为数字'
+        if error:
+            fail(line, student_no, error)
+            continue
+        seen.add(student_no)
+        chunk.append({'selection_id': selection_id, 'score': score, 'student_no': student_no})
+        lines.append(line)
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    return result
+
+
+def _header(row):
+    """表头中各列的位置：字段 -> 列序号"""
+    if row is None:
+        raise ValueError('成绩单为空')
+    names = [cell.strip().lower() for cell in row]
+    columns = {}
+    for key, aliases in COLUMNS.items():
+        for alias in aliases:
+            if alias.lower() in names:
+                columns[key] = names.index(alias.lower())
+                break
+    missing = [COLUMNS[key][0] for key in ('student_no', 'score') if key not in columns]
+    if missing:
+        raise ValueError(f"成绩单缺少“{'”“'.join(missing)}”列")
+    return columns
+
+
+def _number(text):
+    """成绩文本转为数值，整数值返回 int；无法解析时返回 None"""
+    try:
+        value = float(text)
+    except ValueError:
+        return None
+    if value != value or value in (float('inf'), float('-inf')):
+        return None
+    return int(value) if value.is_integer() else value
+
+
+# ---------- CSV ----------
+
+def _read_csv(stream):
+    text = io.TextIOWrapper(stream, encoding=_detect_encoding(stream), newline='')
+    try:
+        yield from csv.reader(text)
+    finally:
+        text.detach()
+
+
+def _detect_encoding(stream, probe=64 * 1024):
+    """读取开头一段判断是 UTF-8 还是 GB18030，读完后回到文件开头"""
+    head = stream.read(probe)
+    stream.seek(0)
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(head, final=False)
+    except UnicodeDecodeError:
+        return 'gb18030'
+    return 'utf-8-sig'
+
+
+# ---------- XLSX ----------
+
+def _read_xlsx(stream):
+    try:
+        archive = zipfile.ZipFile(stream)
+    except zipfile.BadZipFile:
+        raise ValueError('XLSX 文件已损坏或格式不正确') from None
+    with archive:
+        strings = _shared_strings(archive)
+        with archive.open(_first_sheet(archive)) as sheet:
+            parent = None
+            for event, element in iterparse(sheet, events=('start', 'end')):
+                if event == 'start':
+                    if element.tag == _MAIN + 'sheetData':
+                        parent = element
+                    continue
+                if element.tag != _MAIN + 'row':
+                    continue
+                row = []
+                for cell in element.iter(_MAIN + 'c'):
+                    column = _column_index(cell.get('r')) if cell.get('r') else len(row)
+                    row.extend([''] * (column - len(row)))
+                    row.append(_cell_text(cell, strings))
+                # 已处理的行从父元素中移除，内存占用与行数无关
+                if parent is not None:
+                    parent.clear()
+                yield row
+
+
+def _first_sheet(archive):
+    """工作簿中第一张工作表在包内的路径"""
+    try:
+        with archive.open('xl/workbook.xml') as workbook:
+            sheet = next(element for _, element in iterparse(workbook) if element.tag == _MAIN + 'sheet')
+        with archive.open('xl/_rels/workbook.xml.rels') as rels:
+            targets = {element.get('Id'): element.get('Target') for _, element in iterparse(rels)
+                       if element.tag == _PACKAGE_REL + 'Relationship'}
+        target = targets[sheet.get(_REL + 'id')]
+    except (KeyError, StopIteration):
+        raise ValueError('XLSX 文件中没有工作表') from None
+    return target.lstrip('/') if target.startswith('/') else 'xl/' + target
+
+
+def _shared_strings(archive):
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return []
+    strings, root = [], None
+    with archive.open('xl/sharedStrings.xml') as source:
+        for event, element in iterparse(source, events=('start', 'end')):
+            if event == 'start':
+                root = element if root is None else root
+            elif element.tag == _MAIN + 'si':
+                strings.append(''.join(text.text or '' for text in element.iter(_MAIN + 't')))
+                root.clear()
+    return strings
+
+
+def _cell_text(cell, strings):
+    kind = cell.get('t')
+    if kind == 'inlineStr':
+        return ''.join(text.text or '' for text in cell.iter(_MAIN + 't'))
+    value = cell.findtext(_MAIN + 'v') or ''
+    if kind == 's':
+        return strings[int(value)] if value else ''
+    if kind in (None, 'n') and value:
+        number = _number(value)
+        return str(number) if number is not None else value
+    return value
+
+
+def _column_index(reference):
+    """单元格引用（如 B12）的列序号，从 0 开始"""
+    index = 0
+    for char in reference:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - ord('A') + 1
+    return index - 1
@@ -0,0 +1,354 @@
+"""
+内存数据表
+以主键 id 为索引的行存储，支持声明式二级索引，所有写操作都经由 insert / update / delete 完成
+每张表带一把读写锁，写操作在事务中会登记撤销日志；挂接日志（journal）后每次写入都会记入持久化日志
+"""
+
+import threading
+from contextlib import contextmanager
+
+from models.locking import RWLock, current_transaction
+
+
+_MISSING = object()
+
+
+class Sequence:
+    """主键序列
+
+    代替 max(id) + 1，分配为 O(1) 且在多线程下不会重复；
+    显式指定的 id 会推动序列前进，保证之后分配的 id 不冲突。
+    """
+
+    def __init__(self, start=1):
+        self._next = start
+        self._lock = threading.Lock()
+
+    @property
+    def value(self):
+        """下一个将要分配的 id"""
+        return self._next
+
+    def next(self):
+        """分配一个 id"""
+        with self._lock:
+            value = self._next
+            self._next += 1
+            return value
+
+    def reserve(self, count):
+        """一次性预留 count 个连续 id，返回 range"""
+        with self._lock:
+            start = self._next
+            self._next += count
+            return range(start, start + count)
+
+    def advance(self, used_id):
+        """登记一个外部指定的 id"""
+        with self._lock:
+            if used_id >= self._next:
+                self._next = used_id + 1
+
+    def reset(self, value):
+        """恢复快照时重置序列"""
+        with self._lock:
+            self._next = value
+
+
+class Table:
+    """按主键索引的内存数据表
+
+    行以 id -> dict 的形式保存（保持插入顺序），主键查找、删除均为 O(1)。
+    indexes 中声明的字段会维护 字段值 -> {id: 行} 的二级索引，
+    find / count 的代价只与命中的行数有关。
+    未带 id 插入的行由表内的 Sequence 分配主键。
+    读操作持有读锁、写操作持有写锁；返回的行列表是快照，可在锁外安全遍历。
+    路由层不得直接修改行字典，而应调用 update，保证索引始终一致。
+    journal 不为空时，写操作会记入持久化日志（事务中的写入在提交时统一写入）。
+    subscribe 登记的监听者在每次修改（包括回滚时的撤销）后收到通知，用于维护派生数据。
+    version 在每次修改后（监听者处理完之后）递增，供查询缓存判断结果是否过期。
+
+    行的存放方式由 _fetch / _scan / _insert_row / _update_row / _delete_row 等方法决定，
+    子类（如 models.columnar.ColumnarTable）可以替换存储而保持接口不变。
+    """
+
+    def __init__(self, name, rows=(), indexes=()):
+        self.name = name
+        self.sequence = Sequence()
+        self.lock = RWLock()
+        self.journal = None
+        self.version = 0
+        self._listeners = []
+        self._indexes = {field: {} for field in indexes}
+        self._clear()
+        for row in rows:
+            self.insert(row)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __iter__(self):
+        return iter(self.all())
+
+    def __contains__(self, row_id):
+        return self._has(row_id)
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {self.name} rows={len(self)}>'
+
+    # ---------- 读 ----------
+
+    def all(self):
+        """返回全部行的列表"""
+        with self.lock.read():
+            return self._scan()
+
+    def get(self, row_id):
+        """根据主键查找行，不存在时返回 None"""
+        with self.lock.read():
+            return self._fetch(row_id)
+
+    def find(self, field, value):
+        """通过二级索引查找字段等于 value 的所有行"""
+        with self.lock.read():
+            return self._bucket_rows(self._bucket(field, value))
+
+    def find_one(self, field, value):
+        """通过二级索引查找字段等于 value 的第一行，不存在时返回 None"""
+        with self.lock.read():
+            rows = self._bucket_rows(self._bucket(field, value), limit=1)
+            return rows[0] if rows else None
+
+    def count(self, field, value):
+        """通过二级索引统计字段等于 value 的行数"""
+        with self.lock.read():
+            return len(self._bucket(field, value))
+
+    # ---------- 写 ----------
+
+    def reserve_ids(self, count):
+        """为批量插入预留一段连续 id"""
+        return self.sequence.reserve(count)
+
+    def insert(self, row):
+        """插入一行并返回该行；未提供 id 时自动分配"""
+        with self._writing() as txn:
+            row = self._insert_checked(row, txn)
+            self._log(txn, ('insert', self.name, row))
+            return row
+
+    def insert_many(self, rows):
+        """批量插入：缺少 id 的行一次性预留 id 块，整批只获取一次写锁、写一批日志"""
+        rows = list(rows)
+        ids = iter(self.reserve_ids(sum(1 for row in rows if row.get('id') is None)))
+        with self._writing() as txn:
+            stored = []
+            for row in rows:
+                if row.get('id') is None:
+                    row['id'] = next(ids)
+                stored.append(self._insert_checked(row, txn))
+            if self.journal is not None:
+                self._log(txn, *(('insert', self.name, row) for row in stored))
+        return rows
+
+    def update(self, row_id, changes):
+        """更新一行的若干字段，返回更新后的行；行不存在时返回 None"""
+        with self._writing() as txn:
+            row = self._fetch(row_id)
+            if row is None:
+                return None
+            if 'id' in changes and changes['id'] != row_id:
+                raise ValueError(f'{self.name}: 不允许修改主键')
+            previous = {field: row.get(field, _MISSING) for field in changes}
+            row = self._undoable(txn, lambda: self._apply_update(row_id, previous),
+                                 lambda: self._apply_update(row_id, changes))
+            self._log(txn, ('update', self.name, row_id, dict(changes)))
+            return row
+
+    def delete(self, row_id):
+        """删除一行，返回被删除的行；行不存在时返回 None"""
+        with self._writing() as txn:
+            row = self._fetch(row_id)
+            if row is not None:
+                self._undoable(txn, lambda: self._apply_insert(row), lambda: self._apply_delete(row_id))
+                self._log(txn, ('delete', self.name, row_id))
+            return row
+
+    # ---------- 快照 ----------
+
+    def dump(self):
+        """导出表状态（行与序列），用于快照"""
+        with self.lock.read():
+            return {'next_id': self.sequence.value, 'rows': [dict(row) for row in self._scan()]}
+
+    def load(self, state):
+        """从快照恢复表状态，重建全部索引"""
+        with self._barrier(), self.lock.write():
+            self._clear()
+            self._indexes = {field: {} for field in self._indexes}
+            self.sequence.reset(1)
+            for row in state['rows']:
+                row = dict(row)
+                self.sequence.advance(row['id'])
+                self._insert_row(row)
+            self.sequence.reset(max(state['next_id'], self.sequence.value))
+            self._log(current_transaction(), ('load', self.name, state))
+            for listener in self._listeners:
+                listener(None, None)
+            self.version += 1
+
+    # ---------- 变更通知 ----------
+
+    def subscribe(self, listener):
+        """登记变更监听者 listener(old, new)
+
+        在写锁内、每次修改之后调用：插入时 old 为 None，删除时 new 为 None；
+        load 整表替换后以 (None, None) 调用，监听者应据此全量重建。
+        监听者不得修改传入的行，也不要在回调中读取其他数据表，以免与其他表的写锁互相等待。
+        """
+        with self.lock.write():
+            self._listeners.append(listener)
+
+    # ---------- 内部实现（调用方需持有相应的锁） ----------
+
+    @contextmanager
+    def _writing(self):
+        """获取写锁；处于事务中时返回事务以登记撤销操作"""
+        txn = current_transaction()
+        if txn is not None and not txn.covers(self):
+            raise RuntimeError(f'事务未声明数据表 {self.name}')
+        with self._barrier(), self.lock.write():
+            yield txn
+
+    @contextmanager
+    def _barrier(self):
+        """挂接日志时，在获取写锁之前进入日志的写入屏障（事务中已持有，可重入）"""
+        journal = self.journal
+        if journal is None:
+            yield
+            return
+        with journal.barrier.read():
+            yield
+
+    def _clear(self):
+        self._rows = {}
+
+    def _has(self, row_id):
+        return row_id in self._rows
+
+    def _fetch(self, row_id):
+        return self._rows.get(row_id)
+
+    def _scan(self):
+        return list(self._rows.values())
+
+    def _bucket_rows(self, bucket, limit=None):
+        rows = bucket.values()
+        if limit is not None:
+            return [row for row, _ in zip(rows, range(limit))]
+        return list(rows)
+
+    def _insert_checked(self, row, txn):
+        row_id = row.get('id')
+        if row_id is None:
+            row_id = row['id'] = self.sequence.next()
+        elif self._has(row_id):
+            raise ValueError(f'{self.name}: 主键 {row_id} 已存在')
+        else:
+            self.sequence.advance(row_id)
+        return self._undoable(txn, lambda: self._apply_delete(row_id), lambda: self._apply_insert(row))
+
+    def _undoable(self, txn, undo, apply):
+        """执行 apply（修改数据并通知监听者）。事务中先登记撤销操作，监听者抛出异常时随事务回滚撤销；
+        不在事务中时立即撤销并重新抛出，数据不会停在只通知了部分监听者的状态
+        """
+        if txn:
+            txn.record(undo)
+            return apply()
+        try:
+            return apply()
+        except BaseException:
+            undo()
+            raise
+
+    def _apply_insert(self, row):
+        row = self._insert_row(row)
+        for listener in self._listeners:
+            listener(None, row)
+        self.version += 1
+        return row
+
+    def _apply_update(self, row_id, changes):
+        old = dict(self._fetch(row_id)) if self._listeners else None
+        row = self._update_row(row_id, changes)
+        for listener in self._listeners:
+            listener(old, row)
+        self.version += 1
+        return row
+
+    def _apply_delete(self, row_id):
+        row = self._delete_row(row_id)
+        if row is not None:
+            for listener in self._listeners:
+                listener(row, None)
+            self.version += 1
+        return row
+
+    def _log(self, txn, *entries):
+        """把写入记入持久化日志；事务中的记录暂存到事务里，提交时再写"""
+        if self.journal is None:
+            return
+        if txn:
+            for entry in entries:
+                txn.stage(self.journal, entry)
+        else:
+            self.journal.append(list(entries))
+
+    def _insert_row(self, row):
+        row_id = row['id']
+        self._rows[row_id] = row
+        for field in self._indexes:
+            self._index_add(field, row.get(field), row_id, row)
+        return row
+
+    def _update_row(self, row_id, changes):
+        row = self._rows[row_id]
+        moved = [field for field in self._indexes
+                 if field in changes and changes[field] != row.get(field)]
+        for field in moved:
+            self._index_discard(field, row.get(field), row_id)
+        for field, value in changes.items():
+            if value is _MISSING:
+                row.pop(field, None)
+            else:
+                row[field] = value
+        for field in moved:
+            self._index_add(field, row.get(field), row_id, row)
+        return row
+
+    def _delete_row(self, row_id):
+        row = self._rows.pop(row_id, None)
+        if row is not None:
+            for field in self._indexes:
+                self._index_discard(field, row.get(field), row_id)
+        return row
+
+    def _bucket(self, field, value):
+        index = self._indexes.get(field)
+        if index is None:
+            raise KeyError(f'{self.name}.{field} 未建立索引')
+        return index.get(value, {})
+
+    def _index_add(self, field, key, row_id, row):
+        self._indexes[field].setdefault(key, {})[row_id] = row
+
+    def _index_discard(self, field, key, row_id):
+        index = self._indexes[field]
+        bucket = index.get(key)
+        if bucket is not None:
+            bucket.pop(row_id, None)
+            if not bucket:
+                del index[key]
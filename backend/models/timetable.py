@@ -0,0 +1,69 @@
+"""
+课表时间占用位图
+把排课的星期、节次与上课周次编译成定长位图（Python 整数，第 (周 - 1) * WEEK_BITS + (星期 - 1) * PERIODS + (节 - 1) 位），
+两门课时间冲突当且仅当位图按位与不为零；学生一学期已选课程位图的按位或即为其课表占用
+"""
+
+import functools
+
+from models.weeks import ALL_WEEKS, MAX_WEEK, parse_weeks
+
+
+# 各节次的上课时间，用于与考试、借用等按钟点记录的安排比较
+PERIOD_TIMES = (
+    ('08:00', '08:45'), ('08:55', '09:40'), ('10:00', '10:45'), ('10:55', '11:40'),
+    ('14:00', '14:45'), ('14:55', '15:40'), ('16:00', '16:45'), ('16:55', '17:40'),
+    ('19:00', '19:45'), ('19:55', '20:40'), ('20:50', '21:35'), ('21:45', '22:30'),
+)
+
+WEEKS = MAX_WEEK
+WEEKDAYS = 7
+PERIODS = len(PERIOD_TIMES)     # 每天最多节次，位图与按钟点的比较使用同一节次范围
+WEEK_BITS = WEEKDAYS * PERIODS
+WIDTH = WEEKS * WEEK_BITS
+
+
+@functools.lru_cache(maxsize=4096)
+def occupancy(weekday, start_period, end_period, weeks):
+    """排课的时间占用位图；星期或节次缺失、越界时返回 0（不与任何课程冲突），
+    周次无法解析时按全部周处理，宁可多报冲突也不漏报
+    """
+    try:
+        weekday, start, end = int(weekday), int(start_period), int(end_period)
+    except (TypeError, ValueError):
+        return 0
+    if not 1 <= weekday <= WEEKDAYS or not 1 <= start <= end <= PERIODS:
+        return 0
+    day = ((1 << (end - start + 1)) - 1) << ((weekday - 1) * PERIODS + start - 1)
+    try:
+        week_set = parse_weeks(weeks)
+    except (TypeError, ValueError):
+        week_set = ALL_WEEKS
+    # 一周内的占用不超过 WEEK_BITS 位，与各周的起始位相乘不会产生进位，结果即为逐周平移后的并集
+    repeat = 0
+    for week in week_set:
+        repeat |= 1 << ((week - 1) * WEEK_BITS)
+    return day * repeat
+
+
+def schedule_mask(schedule):
+    """排课行的时间占用位图"""
+    return occupancy(schedule.get('weekday'), schedule.get('start_period'), schedule.get('end_period'),
+                     schedule.get('weeks'))
+
+
+@functools.lru_cache(maxsize=256)
+def period_span(start_period, end_period):
+    """第 start_period 至 end_period 节的上课时间（当天的分钟数），节次缺失或越界时返回 None"""
+    try:
+        start, end = int(start_period), int(end_period)
+    except (TypeError, ValueError):
+        return None
+    if not 1 <= start <= end <= PERIODS:
+        return None
+    return _clock(PERIOD_TIMES[start - 1][0]), _clock(PERIOD_TIMES[end - 1][1])
+
+
+def _clock(text):
+    hour, minute = text.split(':')
+    return int(hour) * 60 + int(minute)
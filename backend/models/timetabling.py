@@ -0,0 +1,359 @@
+"""
+自动排课
+给定一个学期要开设的教学班（课程、任课教师、预计人数、每周上课次数、上课周次、教室类型要求）
+与全部教室，为每次课分配时段与教室，保证教师与教室都不会在同一周的同一时段被占用两次，
+且教室容量不小于预计人数。
+
+求解分两步：
+1. 贪心构造：最难安排的课先排（可用教室少、人数多、教师课多），每次课在所有可行时段中
+   选代价最小的一个，代价综合教室空置率、时段拥挤程度与教师当天课量，并加入随机扰动；
+2. 修复：仍未安排的课尝试把挡路的一次课（同教室或同教师）挪到别处腾出位置。
+不同随机种子的多次求解可以在进程池中并行，取未安排数最少、代价最低的结果。
+
+时段按两节连排划分（每天 5 段、每周 5 天）；占用以“每个时段各周是否占用”的周位图记录，
+单双周、前后半学期的课可以共用同一教室或同一教师的同一时段。
+
+用法（在 backend 目录下，基于合成数据演示）：见 benchmarks/timetabling.py
+"""
+
+import concurrent.futures
+import multiprocessing
+import random
+import time
+from bisect import bisect_left
+
+from models.weeks import ALL_WEEKS, parse_weeks
+
+
+PERIOD_PAIRS = ((1, 2), (3, 4), (5, 6), (7, 8), (9, 10))
+WEEKDAYS = (1, 2, 3, 4, 5)
+SLOTS = [(weekday, pair) for weekday in WEEKDAYS for pair in PERIOD_PAIRS]
+
+DEFAULT_WEEKS = '1-16'
+
+# 修复阶段每次未安排的课最多尝试的 (时段, 教室) 组合数
+_REPAIR_TRIES = 200
+
+
+def sessions_for(course):
+    """按学时推算每周上课次数（每次两节，16 周），至少 1 次"""
+    hours = course.get('hours') or 0
+    return max(-(-hours // 32), 1)
+
+
+def build_problem(database, semester, sections):
+    """把教学班列表整理为可在进程间传递的排课问题
+
+    sections 中每项为 {'course_id', 'enrollment', 'sessions', 'weeks', 'room_type'}，
+    只有 course_id 必填：任课教师取课程的 teacher_id，每周次数按学时推算，
+    预计人数取该课程以往排课的最大选课人数，周次默认 1-16。
+    该学期已有的排课视为固定占用，新排的课不会与之冲突。
+    """
+    courses = {}
+    for section in sections:
+        course = database.get_course_by_id(section['course_id'])
+        if course is None:
+            raise ValueError(f"课程 {section['course_id']} 不存在")
+        courses[course['id']] = course
+    estimates = database.estimate_enrollment(list(courses))
+    items = []
+    for section in sections:
+        course = courses[section['course_id']]
+        weeks = section.get('weeks') or DEFAULT_WEEKS
+        parse_weeks(weeks)  # 格式错误时抛出 ValueError
+        items.append({
+            'course_id': course['id'],
+            'teacher_id': course['teacher_id'],
+            'enrollment': int(section.get('enrollment') or estimates.get(course['id'], 0)),
+            'sessions': int(section.get('sessions') or sessions_for(course)),
+            'weeks': weeks,
+            'room_type': section.get('room_type')
+        })
+    rooms = sorted(((c['room_no'], c['capacity'] or 0, c['type']) for c in database.classrooms),
+                   key=lambda room: (room[1], room[0]))
+    fixed = [{
+        'teacher_id': s['course']['teacher_id'] if s.get('course') else None,
+        'classroom': s['classroom'],
+        'weekday': s['weekday'],
+        'start_period': s['start_period'],
+        'end_period': s['end_period'],
+        'weeks': s['weeks']
+    } for s in database.get_available_courses(semester)]
+    return {'semester': semester, 'sections': items, 'rooms': rooms, 'fixed': fixed}
+
+
+def solve(problem, workers=1, restarts=None, seed=0, time_limit=60):
+    """求解排课问题
+
+    restarts 为随机重启次数（默认与 workers 相同），workers > 1 时在进程池中并行。
+    time_limit 为单次求解的秒数上限，超时后停止修复并返回当前结果。
+    返回 {'schedules': 排课行列表, 'unplaced': 未安排的课, 'stats': 统计}。
+    """
+    restarts = max(restarts or workers, 1)
+    seeds = [seed + i for i in range(restarts)]
+    started = time.perf_counter()
+    if workers > 1 and restarts > 1:
+        # 服务进程是多线程的，用 spawn 启动子进程，避免 fork 时复制其他线程持有的锁
+        context = multiprocessing.get_context('spawn')
+        with concurrent.futures.ProcessPoolExecutor(max_workers=min(workers, restarts), mp_context=context) as pool:
+            runs = list(pool.map(_solve_once, [problem] * restarts, seeds, [time_limit] * restarts))
+    else:
+        runs = [_solve_once(problem, s, time_limit) for s in seeds]
+    best = min(runs, key=lambda run: (len(run['unplaced']), run['cost']))
+    best['stats'] = {
+        'sections': len(problem['sections']),
+        'meetings': sum(section['sessions'] for section in problem['sections']),
+        'placed': len(best['schedules']),
+        'unplaced': len(best['unplaced']),
+        'restarts': restarts,
+        'workers': workers,
+        'seed': best.pop('seed'),
+        'cost': round(best.pop('cost'), 3),
+        'elapsed': round(time.perf_counter() - started, 3)
+    }
+    return best
+
+
+def _solve_once(problem, seed, time_limit):
+    search = _Search(problem, seed, time.perf_counter() + time_limit)
+    search.construct()
+    search.repair()
+    return search.result()
+
+
+class _Search:
+    """一次随机化的贪心构造与修复"""
+
+    def __init__(self, problem, seed, deadline):
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self.deadline = deadline
+        self.semester = problem['semester']
+        self.sections = problem['sections']
+        self.rooms = problem['rooms']
+        capacities = [room[1] for room in self.rooms]
+        room_index = {room[0]: i for i, room in enumerate(self.rooms)}
+        n_slots = len(SLOTS)
+
+        # 占用：每个教室 / 教师在每个时段的周位图，以及占用它的可移动课次；
+        # 只有周次不相交时才能放入同一格，因此移出课次时直接清掉它的周次即可
+        self.room_weeks = [[0] * n_slots for _ in self.rooms]
+        self.teacher_weeks = {}
+        self.room_at = {}
+        self.teacher_at = {}
+        self.slot_load = [0] * n_slots
+        for row in problem['fixed']:
+            weeks = _weeks_bits(row['weeks'], ALL_WEEKS)
+            room = room_index.get(row['classroom'])
+            for slot in _overlapping_slots(row['weekday'], row['start_period'], row['end_period']):
+                if room is not None:
+                    self.room_weeks[room][slot] |= weeks
+                if row['teacher_id'] is not None:
+                    self._teacher(row['teacher_id'])[slot] |= weeks
+
+        # 课次：(教学班编号, 第几次)；每个教学班可用的教室按容量从小到大排列
+        self.meetings = []
+        self.candidates = []
+        self.section_weeks = []
+        for index, section in enumerate(self.sections):
+            first = bisect_left(capacities, section['enrollment'])
+            self.candidates.append([room for room in range(first, len(self.rooms))
+                                    if section['room_type'] in (None, self.rooms[room][2])])
+            self.section_weeks.append(parse_weeks(section['weeks']).bits)
+            self.meetings.extend((index, k) for k in range(section['sessions']))
+        self.placement = {}
+        self.section_days = {}
+        self.teacher_day = {}
+
+    def _teacher(self, teacher_id):
+        weeks = self.teacher_weeks.get(teacher_id)
+        if weeks is None:
+            weeks = self.teacher_weeks[teacher_id] = [0] * len(SLOTS)
+        return weeks
+
+    # ---------- 构造 ----------
+
+    def construct(self):
+        teacher_load = {}
+        for index, _ in self.meetings:
+            teacher = self.sections[index]['teacher_id']
+            teacher_load[teacher] = teacher_load.get(teacher, 0) + 1
+        # 最难安排的先排；随机扰动让不同种子得到不同的顺序
+        order = sorted(self.meetings, key=lambda m: (
+            len(self.candidates[m[0]]),
+            -self.sections[m[0]]['enrollment'],
+            -teacher_load[self.sections[m[0]]['teacher_id']],
+            self.rng.random()
+        ))
+        for meeting in order:
+            choice = self._best_option(meeting)
+            if choice is not None:
+                self._place(meeting, *choice)
+
+    def _best_option(self, meeting):
+        """代价最小的可行 (时段, 教室)，没有时返回 None"""
+        index = meeting[0]
+        section = self.sections[index]
+        weeks = self.section_weeks[index]
+        teacher_weeks = self._teacher(section['teacher_id'])
+        days = self.section_days.get(index, ())
+        candidates = self.candidates[index]
+        n_rooms = len(self.rooms)
+        best = None
+        best_cost = None
+        for slot, (weekday, pair) in enumerate(SLOTS):
+            if teacher_weeks[slot] & weeks or weekday in days:
+                continue
+            room = self._free_room(candidates, slot, weeks)
+            if room is None:
+                continue
+            capacity = self.rooms[room][1]
+            cost = ((capacity - section['enrollment']) / capacity if capacity else 0) \
+                + self.slot_load[slot] / n_rooms \
+                + 0.3 * self.teacher_day.get((section['teacher_id'], weekday), 0) \
+                + (0.2 if pair == PERIOD_PAIRS[-1] else 0) \
+                + 0.05 * self.rng.random()
+            if best_cost is None or cost < best_cost:
+                best, best_cost = (slot, room), cost
+        return best
+
+    def _free_room(self, candidates, slot, weeks):
+        room_weeks = self.room_weeks
+        for room in candidates:
+            if not room_weeks[room][slot] & weeks:
+                return room
+        return None
+
+    def _place(self, meeting, slot, room):
+        index = meeting[0]
+        teacher = self.sections[index]['teacher_id']
+        weeks = self.section_weeks[index]
+        weekday = SLOTS[slot][0]
+        self.placement[meeting] = (slot, room)
+        self.room_weeks[room][slot] |= weeks
+        self._teacher(teacher)[slot] |= weeks
+        self.room_at.setdefault((room, slot), []).append(meeting)
+        self.teacher_at.setdefault((teacher, slot), []).append(meeting)
+        self.slot_load[slot] += 1
+        self.section_days.setdefault(index, set()).add(weekday)
+        self.teacher_day[(teacher, weekday)] = self.teacher_day.get((teacher, weekday), 0) + 1
+
+    def _unplace(self, meeting):
+        index = meeting[0]
+        teacher = self.sections[index]['teacher_id']
+        weeks = self.section_weeks[index]
+        slot, room = self.placement.pop(meeting)
+        weekday = SLOTS[slot][0]
+        self.room_weeks[room][slot] &= ~weeks
+        self._teacher(teacher)[slot] &= ~weeks
+        self.room_at[(room, slot)].remove(meeting)
+        self.teacher_at[(teacher, slot)].remove(meeting)
+        self.slot_load[slot] -= 1
+        self.section_days[index].discard(weekday)
+        self.teacher_day[(teacher, weekday)] -= 1
+        return slot, room
+
+    # ---------- 修复 ----------
+
+    def repair(self):
+        """为未安排的课挪开一个挡路的课次；一轮没有进展或超时即停止"""
+        progress = True
+        while progress and time.perf_counter() < self.deadline:
+            progress = False
+            pending = [m for m in self.meetings if m not in self.placement]
+            self.rng.shuffle(pending)
+            for meeting in pending:
+                if time.perf_counter() >= self.deadline:
+                    break
+                if self._eject_for(meeting):
+                    progress = True
+
+    def _eject_for(self, meeting):
+        index = meeting[0]
+        section = self.sections[index]
+        weeks = self.section_weeks[index]
+        teacher = section['teacher_id']
+        days = self.section_days.get(index, ())
+        options = []
+        for slot, (weekday, _) in enumerate(SLOTS):
+            if weekday in days:
+                continue
+            teacher_block = [m for m in self.teacher_at.get((teacher, slot), ()) if self.section_weeks[m[0]] & weeks]
+            # 固定占用无法挪动
+            if self._teacher(teacher)[slot] & weeks and not teacher_block:
+                continue
+            for room in self.candidates[index]:
+                room_block = [m for m in self.room_at.get((room, slot), ()) if self.section_weeks[m[0]] & weeks]
+                blockers = set(teacher_block) | set(room_block)
+                if len(blockers) == 1 and (room_block or not self.room_weeks[room][slot] & weeks):
+                    options.append((slot, room, blockers.pop()))
+        self.rng.shuffle(options)
+        for slot, room, blocker in options[:_REPAIR_TRIES]:
+            old = self._unplace(blocker)
+            if self.room_weeks[room][slot] & weeks or self._teacher(teacher)[slot] & weeks \
+                    or SLOTS[slot][0] in self.section_days.get(index, ()):
+                self._place(blocker, *old)
+                continue
+            self._place(meeting, slot, room)
+            moved = self._best_option(blocker)
+            if moved is not None:
+                self._place(blocker, *moved)
+                return True
+            self._unplace(meeting)
+            self._place(blocker, *old)
+        return False
+
+    # ---------- 结果 ----------
+
+    def result(self):
+        schedules = []
+        cost = 0.0
+        for meeting in self.meetings:
+            placed = self.placement.get(meeting)
+            if placed is None:
+                continue
+            index = meeting[0]
+            section = self.sections[index]
+            slot, room = placed
+            weekday, (start, end) = SLOTS[slot]
+            room_no, capacity, _ = self.rooms[room]
+            cost += (capacity - section['enrollment']) / capacity if capacity else 0
+            schedules.append({
+                'course_id': section['course_id'],
+                'semester': self.semester,
+                'weekday': weekday,
+                'start_period': start,
+                'end_period': end,
+                'classroom': room_no,
+                'weeks': section['weeks'],
+                'capacity': None
+            })
+        unplaced = []
+        for meeting in self.meetings:
+            if meeting in self.placement:
+                continue
+            section = self.sections[meeting[0]]
+            unplaced.append({
+                'course_id': section['course_id'],
+                'session': meeting[1] + 1,
+                'reason': '没有满足容量与类型要求的教室' if not self.candidates[meeting[0]]
+                else '教师或可用教室在所有时段均已占用'
+            })
+        return {'schedules': schedules, 'unplaced': unplaced, 'cost': cost, 'seed': self.seed}
+
+
+def _weeks_bits(weeks, default):
+    try:
+        return parse_weeks(weeks).bits
+    except (TypeError, ValueError):
+        return default.bits
+
+
+def _overlapping_slots(weekday, start_period, end_period):
+    """已有排课的节次不一定对齐两节一段，返回与之有交集的所有时段"""
+    try:
+        weekday, start, end = int(weekday), int(start_period), int(end_period)
+    except (TypeError, ValueError):
+        return []
+    return [slot for slot, (day, (first, last)) in enumerate(SLOTS)
+            if day == weekday and first <= end and start <= last]
@@ -0,0 +1,541 @@
+"""
+派生视图
+由数据表变更通知增量维护的只读数据，读接口直接返回预先算好的行，不再逐行关联查找
+"""
+
+import bisect
+import threading
+from functools import partial
+
+
+def _link(index, key, value):
+    index.setdefault(key, set()).add(value)
+
+
+def _unlink(index, key, value):
+    values = index.get(key)
+    if values is not None:
+        values.discard(value)
+        if not values:
+            del index[key]
+
+
+class ScheduleView:
+    """排课宽表：排课 + 课程 + 任课教师姓名，按排课 id 与学期索引
+
+    每行的形式为 {**排课, 'course': 课程, 'teacher_name': 教师姓名}。
+    视图保存自己需要的课程、教师、用户姓名副本，变更回调只修改视图内部数据、不读其他表，
+    因此与各表的写锁之间不存在等待关系。返回的行由视图共享，调用方不得修改。
+    """
+
+    def __init__(self, database):
+        self._db = database
+        self._lock = threading.Lock()
+        self.rebuild()
+        database.schedules.subscribe(self._on_schedule)
+        database.courses.subscribe(self._on_course)
+        database.teachers.subscribe(self._on_teacher)
+        database.users.subscribe(self._on_user)
+
+    # ---------- 读 ----------
+
+    def get(self, schedule_id):
+        """按排课 id 取宽表行，不存在时返回 None"""
+        return self._rows.get(schedule_id)
+
+    def all(self):
+        """全部排课的宽表行"""
+        with self._lock:
+            return list(self._rows.values())
+
+    def by_semester(self, semester):
+        """某学期全部排课的宽表行"""
+        with self._lock:
+            return list(self._by_semester.get(semester, {}).values())
+
+    # ---------- 维护 ----------
+
+    def rebuild(self):
+        """从数据表全量重建"""
+        db = self._db
+        schedules, courses, teachers, users = db.schedules.all(), db.courses.all(), db.teachers.all(), db.users.all()
+        with self._lock:
+            self._schedules = {s['id']: s for s in schedules}
+            self._courses = {c['id']: c for c in courses}
+            self._teacher_user = {t['id']: t['user_id'] for t in teachers}
+            self._names = {u['id']: u['name'] for u in users}
+            self._course_schedules = {}
+            self._teacher_courses = {}
+            self._user_teachers = {}
+            for s in schedules:
+                _link(self._course_schedules, s['course_id'], s['id'])
+            for c in courses:
+                _link(self._teacher_courses, c['teacher_id'], c['id'])
+            for t in teachers:
+                _link(self._user_teachers, t['user_id'], t['id'])
+            self._rows = {}
+            self._by_semester = {}
+            for s in schedules:
+                self._refresh(s['id'])
+
+    def _refresh(self, schedule_id):
+        """重算一条排课的宽表行（调用方持有 _lock）"""
+        schedule = self._schedules.get(schedule_id)
+        old = self._rows.get(schedule_id)
+        if old is not None and (schedule is None or old['semester'] != schedule['semester']):
+            bucket = self._by_semester[old['semester']]
+            del bucket[schedule_id]
+            if not bucket:
+                del self._by_semester[old['semester']]
+        if schedule is None:
+            self._rows.pop(schedule_id, None)
+            return
+        course = self._courses.get(schedule['course_id'])
+        user_id = self._teacher_user.get(course['teacher_id']) if course else None
+        row = {
+            **schedule,
+            'course': course,
+            'teacher_name': (self._names.get(user_id) or '') if user_id is not None else ''
+        }
+        self._rows[schedule_id] = row
+        self._by_semester.setdefault(row['semester'], {})[schedule_id] = row
+
+    def _refresh_course(self, course_id):
+        for schedule_id in list(self._course_schedules.get(course_id, ())):
+            self._refresh(schedule_id)
+
+    def _refresh_teacher(self, teacher_id):
+        for course_id in list(self._teacher_courses.get(teacher_id, ())):
+            self._refresh_course(course_id)
+
+    # ---------- 变更回调 ----------
+
+    def _on_schedule(self, old, new):
+        if old is None and new is None:
+            return self.rebuild()
+        with self._lock:
+            if old is not None:
+                self._schedules.pop(old['id'], None)
+                _unlink(self._course_schedules, old['course_id'], old['id'])
+            if new is not None:
+                self._schedules[new['id']] = new
+                _link(self._course_schedules, new['course_id'], new['id'])
+            self._refresh((new or old)['id'])
+
+    def _on_course(self, old, new):
+        if old is None and new is None:
+            return self.rebuild()
+        with self._lock:
+            if old is not None:
+                self._courses.pop(old['id'], None)
+                _unlink(self._teacher_courses, old['teacher_id'], old['id'])
+            if new is not None:
+                self._courses[new['id']] = new
+                _link(self._teacher_courses, new['teacher_id'], new['id'])
+            self._refresh_course((new or old)['id'])
+
+    def _on_teacher(self, old, new):
+        if old is None and new is None:
+            return self.rebuild()
+        with self._lock:
+            if old is not None:
+                self._teacher_user.pop(old['id'], None)
+                _unlink(self._user_teachers, old['user_id'], old['id'])
+            if new is not None:
+                self._teacher_user[new['id']] = new['user_id']
+                _link(self._user_teachers, new['user_id'], new['id'])
+            self._refresh_teacher((new or old)['id'])
+
+    def _on_user(self, old, new):
+        if old is None and new is None:
+            return self.rebuild()
+        user_id = (new or old)['id']
+        name = new['name'] if new is not None else None
+        with self._lock:
+            if new is None:
+                self._names.pop(user_id, None)
+            elif old is not None and old['name'] == name:
+                return
+            else:
+                self._names[user_id] = name
+            for teacher_id in list(self._user_teachers.get(user_id, ())):
+                self._refresh_teacher(teacher_id)
+
+
+class ApprovalQueue:
+    """待审批队列：五类申请中状态为 pending 的项目
+
+    申请提交（或改回 pending）时入队，审批完成后出队；按类型计数为 O(1)，
+    另按 (created_at, 类型, id) 维护有序键，分页时用二分定位而不必全量排序。
+    与 ScheduleView 一样，队列保存学生、姓名、课程名、课题名、教室号的副本，
+    回调中不读取其他表。返回的审批项由队列共享，调用方不得修改。
+    """
+
+    # (类型, 数据表, 类型名称)，顺序即全量列表中的分组顺序
+    TYPES = (
+        ('status_change', 'status_changes', '学籍异动'),
+        ('retake', 'retake_applications', '重修申请'),
+        ('grade_review', 'grade_reviews', '成绩复核'),
+        ('topic_application', 'topic_applications', '毕设选题'),
+        ('classroom_borrow', 'classroom_borrow_records', '借教室'),
+    )
+    # 名称副本：依赖类型 -> (数据表, 字段)
+    LABELS = {
+        'user': ('users', 'name'),
+        'course': ('courses', 'name'),
+        'topic': ('graduation_topics', 'title'),
+        'classroom': ('classrooms', 'room_no'),
+    }
+
+    def __init__(self, database):
+        self._db = database
+        self._lock = threading.Lock()
+        self._rank = {kind: i for i, (kind, _, _) in enumerate(self.TYPES)}
+        self._type_names = {kind: name for kind, _, name in self.TYPES}
+        self.rebuild()
+        for kind, table, _ in self.TYPES:
+            getattr(database, table).subscribe(partial(self._on_item, kind))
+        database.students.subscribe(self._on_student)
+        for label, (table, field) in self.LABELS.items():
+            getattr(database, table).subscribe(partial(self._on_label, label, field))
+
+    # ---------- 读 ----------
+
+    def all(self):
+        """全部待审批项目，按类型分组"""
+        with self._lock:
+            for kind in self._unordered:
+                self._entries[kind] = dict(sorted(self._entries[kind].items()))
+            self._unordered.clear()
+            return [entry for kind, _, _ in self.TYPES for entry in self._entries[kind].values()]
+
+    def count(self, kind=None):
+        """待审批数量，kind 为空时返回总数"""
+        if kind is None:
+            return self._total
+        entries = self._entries.get(kind)
+        return len(entries) if entries is not None else 0
+
+    def counts(self):
+        """各类型的待审批数量"""
+        with self._lock:
+            return {kind: len(self._entries[kind]) for kind, _, _ in self.TYPES}
+
+    def page(self, offset, limit, kind=None):
+        """按提交时间排序的一页待审批项目"""
+        with self._lock:
+            if kind is None:
+                keys = self._order
+            elif kind in self._entries:
+                keys = self._order_by_kind[kind]
+            else:
+                return []
+            return [self._entries[self.TYPES[rank][0]][item_id]
+                    for _, rank, item_id in keys[offset:offset + limit]]
+
+    # ---------- 维护 ----------
+
+    def rebuild(self):
+        """从数据表全量重建"""
+        db = self._db
+        items = {kind: getattr(db, table).all() for kind, table, _ in self.TYPES}
+        students = db.students.all()
+        labels = {label: {row['id']: row[field] for row in getattr(db, table).all()}
+                  for label, (table, field) in self.LABELS.items()}
+        with self._lock:
+            self._labels = labels
+            self._student_user = {s['id']: s['user_id'] for s in students}
+            self._user_students = {}
+            for s in students:
+                _link(self._user_students, s['user_id'], s['id'])
+            self._items = {}
+            self._entries = {kind: {} for kind, _, _ in self.TYPES}
+            self._deps = {}
+            self._dependents = {}
+            self._order = []
+            self._order_by_kind = {kind: [] for kind, _, _ in self.TYPES}
+            self._total = 0
+            # 有项目以小于队尾的 id 重新入队的类型，下次全量读取时按 id 重排
+            self._unordered = set()
+            for kind, rows in items.items():
+                for item in rows:
+                    if item['status'] == 'pending':
+                        self._items[(kind, item['id'])] = item
+                        self._add(kind, item, sort=False)
+            self._order.sort()
+            for keys in self._order_by_kind.values():
+                keys.sort()
+
+    def _build(self, kind, item):
+        """生成审批项及其依赖的名称副本"""
+        if kind == 'classroom_borrow':
+            deps = (('classroom', item['classroom_id']),)
+            subtype = self._labels['classroom'].get(item['classroom_id']) or ''
+            applicant, reason, created_at = item['applicant'], item['purpose'], item['date']
+        else:
+            student_id = item['student_id']
+            deps = [('student', student_id)]
+            user_id = self._student_user.get(student_id)
+            applicant = (self._labels['user'].get(user_id) or '') if user_id is not None else ''
+            reason, created_at = item.get('reason', ''), item['created_at']
+            if kind == 'status_change':
+                subtype = item['type']
+            elif kind == 'retake':
+                deps.append(('course', item['course_id']))
+                subtype = self._labels['course'].get(item['course_id']) or ''
+            elif kind == 'topic_application':
+                deps.append(('topic', item['topic_id']))
+                subtype = self._labels['topic'].get(item['topic_id']) or ''
+                reason = ''
+            else:
+                subtype = ''
+        entry = {
+            'id': item['id'],
+            'type': kind,
+            'type_name': self._type_names[kind],
+            'subtype': subtype,
+            'applicant': applicant,
+            'reason': reason,
+            'created_at': created_at,
+            'status': item['status']
+        }
+        return entry, deps
+
+    def _sort_key(self, kind, entry):
+        return (entry['created_at'] or '', self._rank[kind], entry['id'])
+
+    def _add(self, kind, item, sort=True):
+        """入队（调用方持有 _lock，并已写入 _items）"""
+        key = (kind, item['id'])
+        entry, deps = self._build(kind, item)
+        entries = self._entries[kind]
+        if entries and item['id'] < next(reversed(entries)):
+            self._unordered.add(kind)
+        entries[item['id']] = entry
+        self._deps[key] = deps
+        for dep in deps:
+            _link(self._dependents, dep, key)
+        sort_key = self._sort_key(kind, entry)
+        if sort:
+            bisect.insort(self._order, sort_key)
+            bisect.insort(self._order_by_kind[kind], sort_key)
+        else:
+            self._order.append(sort_key)
+            self._order_by_kind[kind].append(sort_key)
+        self._total += 1
+
+    def _remove(self, key):
+        """出队（调用方持有 _lock），保留 _items 中的原始记录"""
+        kind, item_id = key
+        entry = self._entries[kind].pop(item_id, None)
+        if entry is None:
+            return
+        for dep in self._deps.pop(key):
+            _unlink(self._dependents, dep, key)
+        sort_key = self._sort_key(kind, entry)
+        for keys in (self._order, self._order_by_kind[kind]):
+            i = bisect.bisect_left(keys, sort_key)
+            if i < len(keys) and keys[i] == sort_key:
+                del keys[i]
+        self._total -= 1
+
+    def _refresh(self, dep):
+        """名称副本变化后重算依赖它的审批项"""
+        for key in list(self._dependents.get(dep, ())):
+            self._remove(key)
+            self._add(key[0], self._items[key])
+
+    # ---------- 变更回调 ----------
+
+    def _on_item(self, kind, old, new):
+        if old is None and new is None:
+            return self.rebuild()
+        with self._lock:
+            if old is not None:
+                key = (kind, old['id'])
+                self._remove(key)
+                self._items.pop(key, None)
+            if new is not None and new['status'] == 'pending':
+                self._items[(kind, new['id'])] = new
+                self._add(kind, new)
+
+    def _on_student(self, old, new):
+        if old is None and new is None:
+            return self.rebuild()
+        with self._lock:
+            if old is not None:
+                self._student_user.pop(old['id'], None)
+                _unlink(self._user_students, old['user_id'], old['id'])
+            if new is not None:
+                self._student_user[new['id']] = new['user_id']
+                _link(self._user_students, new['user_id'], new['id'])
+            if old is None or new is None or old['user_id'] != new['user_id']:
+                self._refresh(('student', (new or old)['id']))
+
+    def _on_label(self, label, field, old, new):
+        if old is None and new is None:
+            return self.rebuild()
+        row_id = (new or old)['id']
+        with self._lock:
+            values = self._labels[label]
+            if new is None:
+                values.pop(row_id, None)
+            elif old is not None and old[field] == new[field]:
+                return
+            else:
+                values[row_id] = new[field]
+            if label == 'user':
+                for student_id in list(self._user_students.get(row_id, ())):
+                    self._refresh(('student', student_id))
+            else:
+                self._refresh((label, row_id))
+
+
+def _bump(counter, key, delta):
+    """计数加减，减到 0 时删除该键"""
+    value = counter.get(key, 0) + delta
+    if value:
+        counter[key] = value
+    else:
+        counter.pop(key, None)
+
+
+class StatisticsCounters:
+    """教务统计的实时计数
+
+    学生按学籍状态 / 专业 / 年级计数，选课按学期计数，成绩按状态计数并统计尚未录入成绩的选课，
+    评教按状态计数。每次写入只按变更前后的行增减相应计数，读取为常数时间。
+    选课所属学期来自视图保存的排课学期副本，排课改学期时整体移动该排课的选课数。
+    """
+
+    def __init__(self, database):
+        self._db = database
+        self._lock = threading.Lock()
+        self.rebuild()
+        database.students.subscribe(self._on_student)
+        database.schedules.subscribe(self._on_schedule)
+        database.course_selections.subscribe(self._on_selection)
+        database.grades.subscribe(self._on_grade)
+        database.evaluations.subscribe(self._on_evaluation)
+
+    # ---------- 读 ----------
+
+    def snapshot(self):
+        """当前全部计数"""
+        with self._lock:
+            return {
+                'students_by_status': dict(self._students_by_status),
+                'students_by_major': dict(self._students_by_major),
+                'students_by_grade': dict(self._students_by_grade),
+                'selections_by_semester': dict(self._selections_by_semester),
+                'grades_by_status': dict(self._grades_by_status),
+                'grades_entered': self._graded,
+                'grades_pending': len(self._selections) - self._graded,
+                'evaluations_by_status': dict(self._evaluations_by_status),
+            }
+
+    # ---------- 维护 ----------
+
+    def rebuild(self):
+        """从数据表全量重建"""
+        db = self._db
+        students, schedules = db.students.all(), db.schedules.all()
+        selections, grades, evaluations = db.course_selections.all(), db.grades.all(), db.evaluations.all()
+        with self._lock:
+            self._students_by_status = {}
+            self._students_by_major = {}
+            self._students_by_grade = {}
+            for s in students:
+                self._count_student(s, 1)
+            self._schedule_semester = {s['id']: s['semester'] for s in schedules}
+            self._schedule_selections = {}
+            self._selections_by_semester = {}
+            self._selections = set()
+            # 选课 id -> 成绩行数；_graded 为已有成绩且选课仍存在的选课数
+            self._selection_grades = {}
+            self._graded = 0
+            self._grades_by_status = {}
+            for g in grades:
+                _bump(self._grades_by_status, g['status'], 1)
+                _bump(self._selection_grades, g['selection_id'], 1)
+            for s in selections:
+                self._count_selection(s, 1)
+            self._evaluations_by_status = {}
+            for e in evaluations:
+                _bump(self._evaluations_by_status, e['status'], 1)
+
+    def _count_student(self, student, delta):
+        _bump(self._students_by_status, student['status'], delta)
+        _bump(self._students_by_major, student['major'], delta)
+        _bump(self._students_by_grade, student['grade'], delta)
+
+    def _count_selection(self, selection, delta):
+        schedule_id = selection['schedule_id']
+        _bump(self._schedule_selections, schedule_id, delta)
+        semester = self._schedule_semester.get(schedule_id)
+        if semester is not None:
+            _bump(self._selections_by_semester, semester, delta)
+        if delta > 0:
+            self._selections.add(selection['id'])
+        else:
+            self._selections.discard(selection['id'])
+        if selection['id'] in self._selection_grades:
+            self._graded += delta
+
+    # ---------- 变更回调 ----------
+
+    def _on_student(self, old, new):
+        if old is None and new is None:
+            return self.rebuild()
+        with self._lock:
+            if old is not None:
+                self._count_student(old, -1)
+            if new is not None:
+                self._count_student(new, 1)
+
+    def _on_schedule(self, old, new):
+        if old is None and new is None:
+            return self.rebuild()
+        with self._lock:
+            schedule_id = (new or old)['id']
+            count = self._schedule_selections.get(schedule_id, 0)
+            if old is not None:
+                self._schedule_semester.pop(schedule_id, None)
+                if count:
+                    _bump(self._selections_by_semester, old['semester'], -count)
+            if new is not None:
+                self._schedule_semester[schedule_id] = new['semester']
+                if count:
+                    _bump(self._selections_by_semester, new['semester'], count)
+
+    def _on_selection(self, old, new):
+        if old is None and new is None:
+            return self.rebuild()
+        with self._lock:
+            if old is not None:
+                self._count_selection(old, -1)
+            if new is not None:
+                self._count_selection(new, 1)
+
+    def _on_grade(self, old, new):
+        if old is None and new is None:
+            return self.rebuild()
+        with self._lock:
+            for row, delta in ((old, -1), (new, 1)):
+                if row is None:
+                    continue
+                _bump(self._grades_by_status, row['status'], delta)
+                selection_id = row['selection_id']
+                before = selection_id in self._selection_grades
+                _bump(self._selection_grades, selection_id, delta)
+                if before != (selection_id in self._selection_grades) and selection_id in self._selections:
+                    self._graded += delta
+
+    def _on_evaluation(self, old, new):
+        if old is None and new is None:
+            return self.rebuild()
+        with self._lock:
+            if old is not None:
+                _bump(self._evaluations_by_status, old['status'], -1)
+            if new is not None:
+                _bump(self._evaluations_by_status, new['status'], 1)
@@ -0,0 +1,230 @@
+"""
+上课周次
+把排课的周次字符串解析为不可变的周集合 WeekSet（以整数位图保存，第 w - 1 位表示第 w 周）。
+相同的周集合只有一个对象，相同的字符串只解析一次；排课、冲突检测与日历导出都基于它计算。
+
+支持的写法（可组合）：
+    1-16          范围，也可写作 1~16、1至16、第1-16周
+    1,3,5-8       列表，分隔符可以是 , ， 、 ; 或空格
+    1-16单 / 2-16双 / 1-16周(单)
+                  单双周，紧跟在哪一项之后就只作用于哪一项
+    单周 / 双周    单独出现时作用于此前的全部周次；出现在最前面时表示整个学期的单 / 双周
+    1-16除8,10 / 1-17周(除第9周) / 1-16,!8
+                  排除，“除”之后的各项都从结果中去掉，! 只排除紧随其后的一项
+"""
+
+import datetime
+import functools
+import re
+import threading
+
+
+MAX_WEEK = 24    # 一学期最多教学周
+
+_NUMBERS = re.compile(r'^(\d+)(?:-(\d+))?$')
+_TRANSLATE = str.maketrans({
+    '，': ',', '、': ',', ';': ',', '；': ',', ' ': ',', '\t': ',',
+    '~': '-', '～': '-', '—': '-', '–': '-', '至': '-', '到': '-',
+    '（': '', '）': '', '(': '', ')': '', '第': '', '周': '', '！': '!',
+})
+
+
+class WeekSet:
+    """不可变的周集合
+
+    通过 WeekSet(位图) 或 parse_weeks(字符串) 获得，相同位图总是返回同一对象，
+    因此可以放心地用作字典键或用 is 比较。集合运算 & | - 返回新的 WeekSet。
+    """
+
+    __slots__ = ('_bits',)
+
+    _interned = {}
+    _lock = threading.Lock()
+
+    def __new__(cls, bits=0):
+        if bits < 0 or bits >> MAX_WEEK:
+            raise ValueError(f'周次超出 1-{MAX_WEEK} 的范围')
+        instance = cls._interned.get(bits)
+        if instance is None:
+            with cls._lock:
+                instance = cls._interned.get(bits)
+                if instance is None:
+                    instance = super().__new__(cls)
+                    instance._bits = bits
+                    cls._interned[bits] = instance
+        return instance
+
+    @classmethod
+    def of(cls, weeks):
+        """由周次序列构造"""
+        bits = 0
+        for week in weeks:
+            bits |= _week_bit(week)
+        return cls(bits)
+
+    @property
+    def bits(self):
+        return self._bits
+
+    # ---------- 集合运算 ----------
+
+    def overlaps(self, other):
+        """两个周集合是否有共同的周"""
+        return bool(self._bits & other._bits)
+
+    def __and__(self, other):
+        return WeekSet(self._bits & other._bits)
+
+    def __or__(self, other):
+        return WeekSet(self._bits | other._bits)
+
+    def __sub__(self, other):
+        return WeekSet(self._bits & ~other._bits)
+
+    def __len__(self):
+        return self._bits.bit_count()
+
+    def __bool__(self):
+        return bool(self._bits)
+
+    def __contains__(self, week):
+        return isinstance(week, int) and 1 <= week <= MAX_WEEK and bool(self._bits >> (week - 1) & 1)
+
+    def __iter__(self):
+        bits = self._bits
+        while bits:
+            low = bits & -bits
+            yield low.bit_length()
+            bits ^= low
+
+    def __eq__(self, other):
+        return self is other or (isinstance(other, WeekSet) and self._bits == other._bits)
+
+    def __hash__(self):
+        return hash(self._bits)
+
+    @property
+    def first(self):
+        """最早的一周，空集合时为 None"""
+        return (self._bits & -self._bits).bit_length() or None
+
+    @property
+    def last(self):
+        """最晚的一周，空集合时为 None"""
+        return self._bits.bit_length() or None
+
+    # ---------- 日期 ----------
+
+    def dates(self, semester_start, weekday):
+        """按学期开始日期展开为各周星期 weekday（1-7）的上课日期
+
+        semester_start 为 date 或 'YYYY-MM-DD'，所在的那一周是第 1 周。
+        """
+        monday = _first_monday(semester_start)
+        return [monday + datetime.timedelta(days=(week - 1) * 7 + weekday - 1) for week in self]
+
+    # ---------- 显示 ----------
+
+    def __str__(self):
+        """规范写法：连续的周写成范围，单双周写成 1-15单 / 2-16双"""
+        weeks = list(self)
+        if not weeks:
+            return ''
+        if len(weeks) >= 3 and all(b - a == 2 for a, b in zip(weeks, weeks[1:])):
+            return f"{weeks[0]}-{weeks[-1]}{'单' if weeks[0] % 2 else '双'}"
+        spans = [[weeks[0], weeks[0]]]
+        for week in weeks[1:]:
+            if week == spans[-1][1] + 1:
+                spans[-1][1] = week
+            else:
+                spans.append([week, week])
+        return ','.join(str(a) if a == b else f'{a}-{b}' for a, b in spans)
+
+    def __repr__(self):
+        return f'WeekSet({str(self)!r})'
+
+    def __reduce__(self):
+        # 复制与反序列化都经由 WeekSet(位图)，得到的仍是同一个对象
+        return WeekSet, (self._bits,)
+
+
+ALL_WEEKS = WeekSet((1 << MAX_WEEK) - 1)
+NO_WEEKS = WeekSet(0)
+ODD_WEEKS = WeekSet(int('01' * (MAX_WEEK // 2), 2))
+EVEN_WEEKS = WeekSet(int('10' * (MAX_WEEK // 2), 2))
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_weeks(text):
+    """把周次字符串解析为 WeekSet，格式错误时抛出 ValueError"""
+    normalized = (text or '').translate(_TRANSLATE)
+    included, _, excluded = normalized.partition('除')
+    result = _parse_terms(included, text)
+    if excluded:
+        result = result - _parse_terms(excluded.lstrip('去了'), text)
+    if not result:
+        raise ValueError(f'周次 {text!r} 不包含任何一周')
+    return result
+
+
+def week_of(semester_start, day):
+    """日期 day 是第几教学周（学期开始日期所在的一周为第 1 周），在学期开始之前时返回 0 或负数"""
+    if isinstance(day, str):
+        day = datetime.date.fromisoformat(day)
+    return (day - _first_monday(semester_start)).days // 7 + 1
+
+
+def semester_start(semester):
+    """学期代码（如 2024-2025-1）的开学日期：第一学期为首年 9 月 1 日后的第一个星期一，
+    第二学期为次年 2 月 20 日后的第一个星期一；无法识别时返回 None
+    """
+    match = re.match(r'^(\d{4})-(\d{4})-([12])$', semester or '')
+    if match is None:
+        return None
+    first_year, second_year, term = match.groups()
+    day = datetime.date(int(first_year), 9, 1) if term == '1' else datetime.date(int(second_year), 2, 20)
+    return day + datetime.timedelta(days=-day.weekday() % 7)
+
+
+def _parse_terms(text, original):
+    result = NO_WEEKS
+    terms = [term for term in text.split(',') if term]
+    if not terms:
+        raise ValueError(f'周次 {original!r} 为空')
+    for term in terms:
+        negate = term.startswith('!')
+        term = term.lstrip('!')
+        parity = None
+        if term[-1:] in ('单', '双'):
+            parity = ODD_WEEKS if term[-1] == '单' else EVEN_WEEKS
+            term = term[:-1]
+        if not term:
+            if parity is None or negate:
+                raise ValueError(f'周次 {original!r} 格式错误')
+            # 单独的“单周 / 双周”：筛选此前的全部周次，出现在最前面时表示整个学期
+            result = (result or ALL_WEEKS) & parity
+            continue
+        match = _NUMBERS.match(term)
+        if match is None:
+            raise ValueError(f'周次 {original!r} 中的 {term!r} 无法识别')
+        first = int(match.group(1))
+        last = int(match.group(2) or first)
+        if not 1 <= first <= last <= MAX_WEEK:
+            raise ValueError(f'周次 {original!r} 中的 {term!r} 超出 1-{MAX_WEEK} 周或起止颠倒')
+        weeks = WeekSet(((1 << (last - first + 1)) - 1) << (first - 1))
+        if parity is not None:
+            weeks = weeks & parity
+        result = result - weeks if negate else result | weeks
+    return result
+
+
+def _week_bit(week):
+    if not isinstance(week, int) or not 1 <= week <= MAX_WEEK:
+        raise ValueError(f'周次超出 1-{MAX_WEEK} 的范围: {week!r}')
+    return 1 << (week - 1)
+
+
+def _first_monday(semester_start):
+    if isinstance(semester_start, str):
+        semester_start = datetime.date.fromisoformat(semester_start)
+    return semester_start - datetime.timedelta(days=semester_start.weekday())
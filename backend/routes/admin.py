@@ -2,11 +2,21 @@
 教务端 API 路由
 """
 
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, current_app, request, jsonify, session
+from models.exams import EXAM_TIMES, build_exam_problem, exam_days, exam_span, recheck_plan, solve_exams
+from models.invigilation import plan_invigilators
+from models.jobs import jobs
 from models.models import db
+from models.timetable import PERIODS, period_span
+from models.timetabling import build_problem, solve
+from models.weeks import parse_weeks
+from routes.conditional import conditional_get
 
 admin_bp = Blueprint('admin', __name__)
 
+# 审批借教室的事务声明的表：check_borrow 读取的表一并加锁，所有锁按表名顺序一次取得
+BORROW_TABLES = ('classroom_borrow_records', 'classrooms', 'courses', 'exam_arrangements', 'schedules')
+
 
 def check_admin():
     """检查是否为管理员"""
@@ -14,9 +24,77 @@ def check_admin():
     return role == 'admin'
 
 
+def check_weeks(weeks):
+    """校验周次写法，返回错误信息，合法时返回 None"""
+    if not isinstance(weeks, str):
+        return '周次格式错误'
+    try:
+        parse_weeks(weeks)
+    except ValueError as e:
+        return str(e)
+    return None
+
+
+def check_schedule(schedule, exclude_id=None, clashes=True):
+    """校验排课：周次格式、节次范围、容量不超过教室容量、教室与任课教师在该时段没有其他课程；
+    clashes 为 False 时不检查时段冲突（调课未改动时间、地点时，不因历史数据中的冲突拒绝修改）。
+    读取 schedules、classrooms 与 courses，在事务中调用时这些表都要声明。返回错误信息，通过时返回 None
+    """
+    error = check_weeks(schedule.get('weeks'))
+    if error:
+        return error
+    if period_span(schedule.get('start_period'), schedule.get('end_period')) is None:
+        return f'节次应在 1-{PERIODS} 之间，且开始节次不晚于结束节次'
+    room = db.classrooms.find_one('room_no', schedule.get('classroom'))
+    if room and schedule.get('capacity') and schedule['capacity'] > room['capacity']:
+        return f"排课容量超过教室容量（{room['capacity']} 人）"
+    for clash in (db.find_schedule_clashes(schedule, exclude_id) if clashes else ()):
+        name = clash['course']['name'] if clash['course'] else ''
+        if clash['classroom'] == schedule.get('classroom'):
+            return f"教室 {clash['classroom']} 在该时段已有课程「{name}」"
+        return f'任课教师在该时段已有课程「{name}」'
+    return None
+
+
+def check_exam(exam, exclude_id=None):
+    """校验考试安排：日期与时间格式、教室在该时段没有其他考试、考生在该时段没有其他考试。
+    读取 exam_arrangements、course_selections、schedules 与 courses，在事务中调用时这些表都要声明。
+    返回错误信息，通过时返回 None
+    """
+    if exam_span(exam) is None:
+        return '考试日期或时间格式错误'
+    for clash in db.find_exam_clashes(exam, exclude_id):
+        schedule = db.get_schedule_by_id(clash['exam']['schedule_id'])
+        course = db.get_course_by_id(schedule['course_id']) if schedule else None
+        name = course['name'] if course else ''
+        if clash['kind'] == 'room':
+            return f"教室 {exam['classroom']} 在该时段已有考试「{name}」"
+        return f"有 {clash['students']} 名考生在该时段已有考试「{name}」"
+    return None
+
+
+def check_borrow(record):
+    """校验借教室申请：教室在该时段没有排课、考试与其他已批准的借用。返回错误信息，通过时返回 None"""
+    try:
+        clashes = db.find_room_conflicts(record['classroom_id'], record['date'], record['start_time'],
+                                         record['end_time'], exclude_borrow_id=record['id'])
+    except ValueError as e:
+        return f'借用{e}'
+    for clash in clashes:
+        row = clash['row']
+        if clash['kind'] == 'borrow':
+            return f"该教室在该时段已借给{row['applicant']}（{row['start_time']}-{row['end_time']}）"
+        schedule = row if clash['kind'] == 'teaching' else db.get_schedule_by_id(row['schedule_id'])
+        course = db.get_course_by_id(schedule['course_id']) if schedule else None
+        name = course['name'] if course else ''
+        return f"该教室在该时段有课「{name}」" if clash['kind'] == 'teaching' else f"该教室在该时段有考试「{name}」"
+    return None
+
+
 # ==================== 学生管理 ====================
 
 @admin_bp.route('/api/admin/students', methods=['GET'])
+@conditional_get('students', 'users')
 def get_students():
     """获取学生列表"""
     if not check_admin():
@@ -47,27 +125,24 @@ def create_student():
     
     data = request.get_json()
     
-    # 创建用户
-    new_user_id = max(u['id'] for u in db.users) + 1
-    db.users.append({
-        'id': new_user_id,
-        'username': data.get('username', data.get('student_no')),
-        'password': data.get('password', '123456'),
-        'role': 'student',
-        'name': data.get('name')
-    })
-    
-    # 创建学生
-    new_student_id = max(s['id'] for s in db.students) + 1
-    db.students.append({
-        'id': new_student_id,
-        'user_id': new_user_id,
-        'student_no': data.get('student_no'),
-        'class_name': data.get('class_name'),
-        'major': data.get('major'),
-        'grade': data.get('grade'),
-        'status': 'normal'
-    })
+    with db.transaction('users', 'students'):
+        # 创建用户
+        user = db.users.insert({
+            'username': data.get('username', data.get('student_no')),
+            'password': data.get('password', '123456'),
+            'role': 'student',
+            'name': data.get('name')
+        })
+        
+        # 创建学生
+        db.students.insert({
+            'user_id': user['id'],
+            'student_no': data.get('student_no'),
+            'class_name': data.get('class_name'),
+            'major': data.get('major'),
+            'grade': data.get('grade'),
+            'status': 'normal'
+        })
     
     return jsonify({'success': True, 'message': '学生创建成功'})
 
@@ -80,22 +155,16 @@ def update_student(student_id):
     
     data = request.get_json()
     
-    for student in db.students:
-        if student['id'] == student_id:
-            if 'class_name' in data:
-                student['class_name'] = data['class_name']
-            if 'major' in data:
-                student['major'] = data['major']
-            if 'status' in data:
-                student['status'] = data['status']
-            
-            # 更新用户名
-            if 'name' in data:
-                user = db.get_user_by_id(student['user_id'])
-                if user:
-                    user['name'] = data['name']
-            
-            return jsonify({'success': True, 'message': '学生信息更新成功'})
+    student = db.get_student_by_id(student_id)
+    if student:
+        changes = {field: data[field] for field in ('class_name', 'major', 'status') if field in data}
+        db.students.update(student_id, changes)
+        
+        # 更新用户名
+        if 'name' in data:
+            db.users.update(student['user_id'], {'name': data['name']})
+        
+        return jsonify({'success': True, 'message': '学生信息更新成功'})
     
     return jsonify({'success': False, 'message': '学生不存在'}), 404
 
@@ -106,15 +175,13 @@ def delete_student(student_id):
     if not check_admin():
         return jsonify({'success': False, 'message': '无权访问'}), 403
     
-    for i, student in enumerate(db.students):
-        if student['id'] == student_id:
+    with db.transaction('students', 'users'):
+        student = db.students.delete(student_id)
+        if student:
             # 删除用户
-            for j, user in enumerate(db.users):
-                if user['id'] == student['user_id']:
-                    db.users.pop(j)
-                    break
-            db.students.pop(i)
-            return jsonify({'success': True, 'message': '学生删除成功'})
+            db.users.delete(student['user_id'])
+    if student:
+        return jsonify({'success': True, 'message': '学生删除成功'})
     
     return jsonify({'success': False, 'message': '学生不存在'}), 404
 
@@ -122,6 +189,7 @@ def delete_student(student_id):
 # ==================== 教师管理 ====================
 
 @admin_bp.route('/api/admin/teachers', methods=['GET'])
+@conditional_get('teachers', 'users')
 def get_teachers():
     """获取教师列表"""
     if not check_admin():
@@ -150,25 +218,22 @@ def create_teacher():
     
     data = request.get_json()
     
-    # 创建用户
-    new_user_id = max(u['id'] for u in db.users) + 1
-    db.users.append({
-        'id': new_user_id,
-        'username': data.get('username', data.get('teacher_no')),
-        'password': data.get('password', '123456'),
-        'role': 'teacher',
-        'name': data.get('name')
-    })
-    
-    # 创建教师
-    new_teacher_id = max(t['id'] for t in db.teachers) + 1
-    db.teachers.append({
-        'id': new_teacher_id,
-        'user_id': new_user_id,
-        'teacher_no': data.get('teacher_no'),
-        'department': data.get('department'),
-        'title': data.get('title', '讲师')
-    })
+    with db.transaction('users', 'teachers'):
+        # 创建用户
+        user = db.users.insert({
+            'username': data.get('username', data.get('teacher_no')),
+            'password': data.get('password', '123456'),
+            'role': 'teacher',
+            'name': data.get('name')
+        })
+        
+        # 创建教师
+        db.teachers.insert({
+            'user_id': user['id'],
+            'teacher_no': data.get('teacher_no'),
+            'department': data.get('department'),
+            'title': data.get('title', '讲师')
+        })
     
     return jsonify({'success': True, 'message': '教师创建成功'})
 
@@ -176,6 +241,7 @@ def create_teacher():
 # ==================== 课程管理 ====================
 
 @admin_bp.route('/api/admin/courses', methods=['GET'])
+@conditional_get('courses', 'teachers', 'users')
 def get_courses():
     """获取课程列表"""
     if not check_admin():
@@ -206,9 +272,7 @@ def create_course():
     
     data = request.get_json()
     
-    new_id = max(c['id'] for c in db.courses) + 1 if db.courses else 1
-    db.courses.append({
-        'id': new_id,
+    db.courses.insert({
         'code': data.get('code'),
         'name': data.get('name'),
         'credit': data.get('credit', 3),
@@ -227,18 +291,9 @@ def update_course(course_id):
     
     data = request.get_json()
     
-    for course in db.courses:
-        if course['id'] == course_id:
-            if 'name' in data:
-                course['name'] = data['name']
-            if 'credit' in data:
-                course['credit'] = data['credit']
-            if 'hours' in data:
-                course['hours'] = data['hours']
-            if 'teacher_id' in data:
-                course['teacher_id'] = data['teacher_id']
-            
-            return jsonify({'success': True, 'message': '课程更新成功'})
+    changes = {field: data[field] for field in ('name', 'credit', 'hours', 'teacher_id') if field in data}
+    if db.courses.update(course_id, changes):
+        return jsonify({'success': True, 'message': '课程更新成功'})
     
     return jsonify({'success': False, 'message': '课程不存在'}), 404
 
@@ -246,12 +301,13 @@ def update_course(course_id):
 # ==================== 教室管理 ====================
 
 @admin_bp.route('/api/admin/classrooms', methods=['GET'])
+@conditional_get('classrooms')
 def get_classrooms():
     """获取教室列表"""
     if not check_admin():
         return jsonify({'success': False, 'message': '无权访问'}), 403
     
-    return jsonify({'success': True, 'data': db.classrooms})
+    return jsonify({'success': True, 'data': db.classrooms.all()})
 
 
 @admin_bp.route('/api/admin/classrooms', methods=['POST'])
@@ -262,9 +318,7 @@ def create_classroom():
     
     data = request.get_json()
     
-    new_id = max(c['id'] for c in db.classrooms) + 1 if db.classrooms else 1
-    db.classrooms.append({
-        'id': new_id,
+    db.classrooms.insert({
         'building': data.get('building'),
         'room_no': data.get('room_no'),
         'capacity': data.get('capacity', 40),
@@ -277,6 +331,7 @@ def create_classroom():
 # ==================== 排课管理 ====================
 
 @admin_bp.route('/api/admin/schedule', methods=['GET'])
+@conditional_get('schedules', 'courses', 'teachers', 'users')
 def get_all_schedule():
     """获取所有排课"""
     if not check_admin():
@@ -284,16 +339,14 @@ def get_all_schedule():
     
     weekday_names = ['', '周一', '周二', '周三', '周四', '周五', '周六', '周日']
     result = []
-    for schedule in db.schedules:
-        course = db.get_course_by_id(schedule['course_id'])
-        teacher = db.get_teacher_by_id(course['teacher_id']) if course else None
-        teacher_user = db.get_user_by_id(teacher['user_id']) if teacher else None
+    for schedule in db.get_all_schedules():
+        course = schedule['course']
         result.append({
             'id': schedule['id'],
             'course_id': schedule['course_id'],
             'course_name': course['name'] if course else '',
             'course_code': course['code'] if course else '',
-            'teacher_name': teacher_user['name'] if teacher_user else '',
+            'teacher_name': schedule['teacher_name'],
             'semester': schedule['semester'],
             'weekday': schedule['weekday'],
             'weekday_name': weekday_names[schedule['weekday']] if schedule['weekday'] < len(weekday_names) else '',
@@ -314,21 +367,79 @@ def create_schedule():
     
     data = request.get_json()
     
-    new_id = max(s['id'] for s in db.schedules) + 1 if db.schedules else 1
-    db.schedules.append({
-        'id': new_id,
+    schedule = {
         'course_id': data.get('course_id'),
         'semester': data.get('semester', '2024-2025-1'),
         'weekday': data.get('weekday'),
         'start_period': data.get('start_period'),
         'end_period': data.get('end_period'),
         'classroom': data.get('classroom'),
-        'weeks': data.get('weeks', '1-16')
-    })
+        'weeks': data.get('weeks', '1-16'),
+        # 未指定时按教室容量限制选课人数
+        'capacity': data.get('capacity')
+    }
+    # 检查与写入在同一事务中，并发创建的排课不会互相冲突；校验读取的表一并声明
+    with db.transaction('schedules', 'classrooms', 'courses'):
+        error = check_schedule(schedule)
+        if error:
+            return jsonify({'success': False, 'message': error}), 400
+        db.schedules.insert(schedule)
     
     return jsonify({'success': True, 'message': '排课创建成功'})
 
 
+@admin_bp.route('/api/admin/schedule/auto', methods=['POST'])
+def auto_schedule():
+    """自动排课
+
+    请求体：semester；sections 为教学班列表（每项至少含 course_id，可选 enrollment / sessions / weeks / room_type），
+    或 course_ids 为课程 id 列表，都不提供时为该学期尚未排课的全部课程；
+    apply 为真时写入结果，否则只返回方案；workers 为并行求解的进程数。
+    """
+    if not check_admin():
+        return jsonify({'success': False, 'message': '无权访问'}), 403
+    
+    data = request.get_json() or {}
+    semester = data.get('semester', '2024-2025-1')
+    
+    sections = data.get('sections')
+    if not sections:
+        course_ids = data.get('course_ids')
+        if not course_ids:
+            scheduled = {s['course_id'] for s in db.get_available_courses(semester)}
+            course_ids = [c['id'] for c in db.courses if c['id'] not in scheduled]
+        sections = [{'course_id': course_id} for course_id in course_ids]
+    if not sections:
+        return jsonify({'success': False, 'message': '没有需要排课的课程'}), 400
+    
+    config = current_app.config
+    try:
+        problem = build_problem(db, semester, sections)
+        workers = max(min(int(data.get('workers') or config['TIMETABLING_WORKERS']), config['TIMETABLING_WORKERS']), 1)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'success': False, 'message': f'排课参数错误：{e}'}), 400
+    
+    result = solve(problem, workers=workers, time_limit=config['TIMETABLING_TIME_LIMIT'])
+    
+    if data.get('apply'):
+        with db.transaction('schedules', 'classrooms', 'courses'):
+            # 求解期间可能有人手工排课，写入前再核对一遍，冲突的课次记为未安排
+            accepted = []
+            for schedule in result['schedules']:
+                if check_schedule(schedule):
+                    result['unplaced'].append({'course_id': schedule['course_id'], 'reason': '与求解期间新建的排课冲突'})
+                else:
+                    accepted.append(db.schedules.insert(schedule))
+        result['schedules'] = accepted
+        result['stats'].update(placed=len(accepted), unplaced=len(result['unplaced']))
+    
+    return jsonify({
+        'success': True,
+        'message': f"已安排 {len(result['schedules'])} 次课，{len(result['unplaced'])} 次未能安排",
+        'data': result
+    })
+
+
 @admin_bp.route('/api/admin/schedule/<int:schedule_id>', methods=['PUT'])
 def update_schedule(schedule_id):
     """调课"""
@@ -337,36 +448,34 @@ def update_schedule(schedule_id):
     
     data = request.get_json()
     
-    for schedule in db.schedules:
-        if schedule['id'] == schedule_id:
-            if 'weekday' in data:
-                schedule['weekday'] = data['weekday']
-            if 'start_period' in data:
-                schedule['start_period'] = data['start_period']
-            if 'end_period' in data:
-                schedule['end_period'] = data['end_period']
-            if 'classroom' in data:
-                schedule['classroom'] = data['classroom']
-            if 'weeks' in data:
-                schedule['weeks'] = data['weeks']
-            
-            return jsonify({'success': True, 'message': '调课成功'})
+    changes = {field: data[field] for field in ('weekday', 'start_period', 'end_period', 'classroom', 'weeks',
+                                                'capacity')
+               if field in data}
+    with db.transaction('schedules', 'classrooms', 'courses'):
+        schedule = db.get_schedule_by_id(schedule_id)
+        if not schedule:
+            return jsonify({'success': False, 'message': '排课不存在'}), 404
+        moved = any(str(changes[field]) != str(schedule.get(field)) for field in changes if field != 'capacity')
+        error = check_schedule({**schedule, **changes}, exclude_id=schedule_id, clashes=moved)
+        if error:
+            return jsonify({'success': False, 'message': error}), 400
+        db.schedules.update(schedule_id, changes)
     
-    return jsonify({'success': False, 'message': '排课不存在'}), 404
+    return jsonify({'success': True, 'message': '调课成功'})
 
 
 # ==================== 考试安排 ====================
 
 @admin_bp.route('/api/admin/exams', methods=['GET'])
+@conditional_get('exam_arrangements', 'schedules', 'courses')
 def get_exams():
     """获取考试安排"""
     if not check_admin():
         return jsonify({'success': False, 'message': '无权访问'}), 403
     
     result = []
-    for exam in db.exam_arrangements:
-        schedule = db.get_schedule_by_id(exam['schedule_id'])
-        course = db.get_course_by_id(schedule['course_id']) if schedule else None
+    for exam in db.get_all_exams():
+        course = exam['course']
         result.append({
             'id': exam['id'],
             'schedule_id': exam['schedule_id'],
@@ -389,22 +498,94 @@ def create_exam():
     
     data = request.get_json()
     
-    new_id = max(e['id'] for e in db.exam_arrangements) + 1 if db.exam_arrangements else 1
-    db.exam_arrangements.append({
-        'id': new_id,
+    exam = {
         'schedule_id': data.get('schedule_id'),
         'date': data.get('date'),
         'start_time': data.get('start_time'),
         'end_time': data.get('end_time'),
         'classroom': data.get('classroom')
-    })
+    }
+    # 校验读取的表一并声明，所有锁按表名顺序一次取得
+    with db.transaction('exam_arrangements', 'course_selections', 'schedules', 'courses'):
+        error = check_exam(exam)
+        if error:
+            return jsonify({'success': False, 'message': error}), 400
+        db.exam_arrangements.insert(exam)
     
     return jsonify({'success': True, 'message': '考试安排创建成功'})
 
 
+@admin_bp.route('/api/admin/exams/auto', methods=['POST'])
+def auto_schedule_exams():
+    """自动排考
+
+    请求体：semester，或 exam_ids 为考试 id 列表；dates 为考试日期列表，或 start_date 与 days
+    （weekends 为假时跳过周末），都不提供时沿用这些考试当前的日期；times 为每天的 [开始, 结束] 时段；
+    apply 为真时写入结果：同一排课的第一个考场沿用原考试行，多出的考场新增考试行，不再使用的考试行连同其监考安排删除；
+    写入前在当前数据上核对，与未能安排的考试或求解期间改动的考试冲突的，记入 unplaced 不写入。
+    """
+    if not check_admin():
+        return jsonify({'success': False, 'message': '无权访问'}), 403
+    
+    data = request.get_json() or {}
+    try:
+        dates = data.get('dates')
+        if not dates and data.get('start_date'):
+            dates = exam_days(data['start_date'], int(data.get('days') or 10), weekends=data.get('weekends', True))
+        times = [tuple(pair) for pair in data['times']] if data.get('times') else EXAM_TIMES
+        problem = build_exam_problem(db, semester=data.get('semester', '2024-2025-1'),
+                                     exam_ids=data.get('exam_ids'), dates=dates, times=times)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'success': False, 'message': f'排考参数错误：{e}'}), 400
+    
+    result = solve_exams(problem, time_limit=current_app.config['TIMETABLING_TIME_LIMIT'])
+    
+    if data.get('apply'):
+        with db.transaction('exam_arrangements', 'invigilator_assignments', 'course_selections', 'classrooms'):
+            # 未能安排的考试仍在原时段、求解期间也可能有人改动考试，写入前再核对一遍，冲突的考试记为未安排
+            recheck_plan(db, result)
+            for exam in result['exams']:
+                slot = {'date': exam['date'], 'start_time': exam['start_time'], 'end_time': exam['end_time']}
+                exam_ids = []
+                for k, classroom in enumerate(exam['classrooms']):
+                    if k < len(exam['exam_ids']):
+                        db.exam_arrangements.update(exam['exam_ids'][k], {**slot, 'classroom': classroom})
+                        exam_ids.append(exam['exam_ids'][k])
+                    else:
+                        exam_ids.append(db.exam_arrangements.insert(
+                            {'schedule_id': exam['schedule_id'], **slot, 'classroom': classroom})['id'])
+                for exam_id in exam['exam_ids'][len(exam['classrooms']):]:
+                    for assignment in db.invigilator_assignments.find('exam_id', exam_id):
+                        db.invigilator_assignments.delete(assignment['id'])
+                    db.exam_arrangements.delete(exam_id)
+                exam['exam_ids'] = exam_ids
+    
+    return jsonify({
+        'success': True,
+        'message': f"已安排 {len(result['exams'])} 场考试，{len(result['unplaced'])} 场未能安排，"
+                   f"连考 {result['stats']['back_to_back']} 人次",
+        'data': result
+    })
+
+
+@admin_bp.route('/api/admin/exams/conflicts', methods=['GET'])
+@conditional_get('exam_arrangements', 'course_selections', 'schedules', 'courses', 'classrooms')
+def get_exam_conflicts():
+    """检查考试安排：考生冲突、教室冲突、容量不足；可选 semester 与 limit（每类最多返回条数，默认 100）"""
+    if not check_admin():
+        return jsonify({'success': False, 'message': '无权访问'}), 403
+    
+    limit = request.args.get('limit', 100, type=int)
+    if not 1 <= limit <= 1000:
+        return jsonify({'success': False, 'message': 'limit 参数无效'}), 400
+    
+    return jsonify({'success': True, 'data': db.check_exams(request.args.get('semester') or None, limit)})
+
+
 # ==================== 监考安排 ====================
 
 @admin_bp.route('/api/admin/invigilators', methods=['GET'])
+@conditional_get('invigilator_assignments', 'exam_arrangements', 'teachers', 'users', 'schedules', 'courses')
 def get_invigilators():
     """获取监考安排"""
     if not check_admin():
@@ -412,11 +593,7 @@ def get_invigilators():
     
     result = []
     for assignment in db.invigilator_assignments:
-        exam = None
-        for e in db.exam_arrangements:
-            if e['id'] == assignment['exam_id']:
-                exam = e
-                break
+        exam = db.exam_arrangements.get(assignment['exam_id'])
         
         teacher = db.get_teacher_by_id(assignment['teacher_id'])
         teacher_user = db.get_user_by_id(teacher['user_id']) if teacher else None
@@ -446,21 +623,79 @@ def create_invigilator():
         return jsonify({'success': False, 'message': '无权访问'}), 403
     
     data = request.get_json()
-    
-    new_id = max(a['id'] for a in db.invigilator_assignments) + 1 if db.invigilator_assignments else 1
-    db.invigilator_assignments.append({
-        'id': new_id,
-        'exam_id': data.get('exam_id'),
-        'teacher_id': data.get('teacher_id'),
-        'role': data.get('role', '监考')
-    })
+    exam = db.exam_arrangements.get(data.get('exam_id'))
+    if not exam:
+        return jsonify({'success': False, 'message': '考试不存在'}), 404
+    teacher_id = data.get('teacher_id')
+    if not db.get_teacher_by_id(teacher_id):
+        return jsonify({'success': False, 'message': '教师不存在'}), 404
+    
+    # find_teacher_clashes 读取的表一并声明，所有锁按表名顺序一次取得
+    with db.transaction('invigilator_assignments', 'exam_arrangements', 'schedules', 'courses'):
+        if any(a['teacher_id'] == teacher_id for a in db.invigilator_assignments.find('exam_id', exam['id'])):
+            return jsonify({'success': False, 'message': '该教师已在本场考试监考'}), 409
+        for clash in db.find_teacher_clashes(teacher_id, exam):
+            if clash['kind'] == 'teaching':
+                message = f"该教师在考试时段有课「{clash['schedule']['course']['name']}」"
+            else:
+                message = f"该教师在考试时段已监考「{(clash['course'] or {}).get('name', '')}」"
+            return jsonify({'success': False, 'message': message}), 409
+        db.invigilator_assignments.insert({
+            'exam_id': exam['id'],
+            'teacher_id': teacher_id,
+            'role': data.get('role', '监考')
+        })
     
     return jsonify({'success': True, 'message': '监考安排创建成功'})
 
 
+@admin_bp.route('/api/admin/invigilators/auto', methods=['POST'])
+def auto_assign_invigilators():
+    """批量安排监考（后台任务）
+    
+    请求体：semester，或 exam_ids 为考试 id 列表；seats_per_invigilator 为每名监考教师负责的座位数（默认 60，
+    每个考场至少 2 人）；prefer_course_teacher 为真（默认）时任课教师优先担任主监考；
+    apply 为真时在一个事务中替换这些考试原有的监考安排。
+    立即返回任务，结果通过 GET /api/admin/jobs/<id> 查询。
+    """
+    if not check_admin():
+        return jsonify({'success': False, 'message': '无权访问'}), 403
+    
+    data = request.get_json() or {}
+    try:
+        seats = int(data.get('seats_per_invigilator') or 60)
+        exam_ids = [int(exam_id) for exam_id in data['exam_ids']] if data.get('exam_ids') is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': '监考安排参数错误'}), 400
+    if seats < 1:
+        return jsonify({'success': False, 'message': '每名监考教师负责的座位数必须为正数'}), 400
+    if jobs.running('invigilators'):
+        return jsonify({'success': False, 'message': '已有监考安排任务正在进行'}), 409
+    
+    job = jobs.submit('invigilators', plan_invigilators, db,
+                      semester=data.get('semester', '2024-2025-1') if exam_ids is None else None,
+                      exam_ids=exam_ids, seats_per_invigilator=seats,
+                      prefer_course_teacher=bool(data.get('prefer_course_teacher', True)),
+                      apply=bool(data.get('apply')))
+    return jsonify({'success': True, 'message': f'监考安排任务 {job["id"]} 已提交', 'data': job}), 202
+
+
+@admin_bp.route('/api/admin/jobs/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    """查询后台任务的状态与结果"""
+    if not check_admin():
+        return jsonify({'success': False, 'message': '无权访问'}), 403
+    
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': '任务不存在'}), 404
+    return jsonify({'success': True, 'data': job})
+
+
 # ==================== 借教室审批 ====================
 
 @admin_bp.route('/api/admin/classroom-borrow', methods=['GET'])
+@conditional_get('classroom_borrow_records', 'classrooms')
 def get_classroom_borrow():
     """获取借教室申请列表"""
     if not check_admin():
@@ -495,25 +730,74 @@ def process_classroom_borrow(record_id):
     if action not in ['approve', 'reject']:
         return jsonify({'success': False, 'message': '无效的操作'}), 400
     
-    for record in db.classroom_borrow_records:
-        if record['id'] == record_id:
-            record['status'] = 'approved' if action == 'approve' else 'rejected'
-            return jsonify({'success': True, 'message': '处理成功'})
+    new_status = 'approved' if action == 'approve' else 'rejected'
+    with db.transaction(*BORROW_TABLES):
+        record = db.classroom_borrow_records.get(record_id)
+        if not record:
+            return jsonify({'success': False, 'message': '申请不存在'}), 404
+        error = check_borrow(record) if action == 'approve' else None
+        if error:
+            return jsonify({'success': False, 'message': error}), 409
+        db.classroom_borrow_records.update(record_id, {'status': new_status})
+    
+    return jsonify({'success': True, 'message': '处理成功'})
+
+
+@admin_bp.route('/api/admin/classrooms/free', methods=['GET'])
+@conditional_get('classrooms', 'schedules', 'exam_arrangements', 'classroom_borrow_records')
+def get_free_classrooms():
+    """查找空闲教室：date、start_time、end_time 必填，可选 building、capacity（最少座位数）与 type"""
+    if not check_admin():
+        return jsonify({'success': False, 'message': '无权访问'}), 403
+    
+    capacity = request.args.get('capacity', type=int)
+    try:
+        classrooms = db.find_free_classrooms(request.args.get('date', ''), request.args.get('start_time', ''),
+                                             request.args.get('end_time', ''),
+                                             building=request.args.get('building') or None,
+                                             min_capacity=capacity,
+                                             room_type=request.args.get('type') or None)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     
-    return jsonify({'success': False, 'message': '申请不存在'}), 404
+    return jsonify({'success': True, 'data': classrooms})
 
 
 # ==================== 审批中心 ====================
 
 @admin_bp.route('/api/admin/approvals', methods=['GET'])
+@conditional_get('status_changes', 'retake_applications', 'grade_reviews', 'topic_applications',
+                 'classroom_borrow_records', 'students', 'users', 'courses', 'graduation_topics', 'classrooms')
 def get_approvals():
-    """获取所有待审批项目"""
+    """获取待审批项目
+    
+    不带参数时返回全部待审批项目；带 page 参数时按提交时间分页，
+    可选 page_size（默认 20）与 type（审批类型）
+    """
     if not check_admin():
         return jsonify({'success': False, 'message': '无权访问'}), 403
     
-    approvals = db.get_all_approvals()
+    if 'page' not in request.args:
+        return jsonify({'success': True, 'data': db.get_all_approvals()})
     
-    return jsonify({'success': True, 'data': approvals})
+    page = request.args.get('page', 1, type=int)
+    page_size = request.args.get('page_size', 20, type=int)
+    if page < 1 or not 1 <= page_size <= 200:
+        return jsonify({'success': False, 'message': '分页参数无效'}), 400
+    approval_type = request.args.get('type') or None
+    
+    counts = db.count_pending_approvals_by_type()
+    total = sum(counts.values()) if approval_type is None else counts.get(approval_type, 0)
+    approvals = db.get_approvals_page((page - 1) * page_size, page_size, approval_type)
+    
+    return jsonify({
+        'success': True,
+        'data': approvals,
+        'total': total,
+        'counts': counts,
+        'page': page,
+        'page_size': page_size
+    })
 
 
 @admin_bp.route('/api/admin/approve', methods=['PUT'])
@@ -533,54 +817,50 @@ def process_approval():
     new_status = 'approved' if action == 'approve' else 'rejected'
     
     if approval_type == 'status_change':
-        for item in db.status_changes:
-            if item['id'] == approval_id:
-                item['status'] = new_status
-                # 如果通过，更新学生状态
-                if action == 'approve':
-                    student = db.get_student_by_id(item['student_id'])
-                    if student:
-                        if item['type'] == '休学':
-                            student['status'] = 'suspended'
-                        elif item['type'] == '退学':
-                            student['status'] = 'withdrawn'
-                return jsonify({'success': True, 'message': '处理成功'})
+        with db.transaction('status_changes', 'students'):
+            item = db.status_changes.update(approval_id, {'status': new_status})
+            # 如果通过，更新学生状态
+            if item and action == 'approve':
+                if item['type'] == '休学':
+                    db.students.update(item['student_id'], {'status': 'suspended'})
+                elif item['type'] == '退学':
+                    db.students.update(item['student_id'], {'status': 'withdrawn'})
+        if item:
+            return jsonify({'success': True, 'message': '处理成功'})
     
     elif approval_type == 'retake':
-        for item in db.retake_applications:
-            if item['id'] == approval_id:
-                item['status'] = new_status
-                return jsonify({'success': True, 'message': '处理成功'})
+        if db.retake_applications.update(approval_id, {'status': new_status}):
+            return jsonify({'success': True, 'message': '处理成功'})
     
     elif approval_type == 'grade_review':
-        for item in db.grade_reviews:
-            if item['id'] == approval_id:
-                item['status'] = new_status
-                return jsonify({'success': True, 'message': '处理成功'})
+        if db.grade_reviews.update(approval_id, {'status': new_status}):
+            return jsonify({'success': True, 'message': '处理成功'})
     
     elif approval_type == 'topic_application':
-        for item in db.topic_applications:
-            if item['id'] == approval_id:
-                item['status'] = new_status
-                if action == 'approve':
-                    # 创建指导关系
-                    topic = db.get_topic_by_id(item['topic_id'])
-                    if topic:
-                        new_relation_id = max(r['id'] for r in db.instructor_relations) + 1 if db.instructor_relations else 1
-                        db.instructor_relations.append({
-                            'id': new_relation_id,
-                            'student_id': item['student_id'],
-                            'teacher_id': topic['teacher_id'],
-                            'topic_id': item['topic_id'],
-                            'status': 'confirmed'
-                        })
-                return jsonify({'success': True, 'message': '处理成功'})
+        with db.transaction('topic_applications', 'instructor_relations', 'graduation_topics'):
+            item = db.topic_applications.update(approval_id, {'status': new_status})
+            if item and action == 'approve':
+                # 创建指导关系
+                topic = db.get_topic_by_id(item['topic_id'])
+                if topic:
+                    db.instructor_relations.insert({
+                        'student_id': item['student_id'],
+                        'teacher_id': topic['teacher_id'],
+                        'topic_id': item['topic_id'],
+                        'status': 'confirmed'
+                    })
+        if item:
+            return jsonify({'success': True, 'message': '处理成功'})
     
     elif approval_type == 'classroom_borrow':
-        for item in db.classroom_borrow_records:
-            if item['id'] == approval_id:
-                item['status'] = new_status
-                return jsonify({'success': True, 'message': '处理成功'})
+        with db.transaction(*BORROW_TABLES):
+            record = db.classroom_borrow_records.get(approval_id)
+            error = check_borrow(record) if record and action == 'approve' else None
+            if error:
+                return jsonify({'success': False, 'message': error}), 409
+            item = db.classroom_borrow_records.update(approval_id, {'status': new_status}) if record else None
+        if item:
+            return jsonify({'success': True, 'message': '处理成功'})
     
     return jsonify({'success': False, 'message': '审批项不存在'}), 404
 
@@ -588,18 +868,67 @@ def process_approval():
 # ==================== 统计数据 ====================
 
 @admin_bp.route('/api/admin/statistics', methods=['GET'])
+@conditional_get('students', 'teachers', 'courses', 'classrooms', 'schedules', 'course_selections', 'grades',
+                 'evaluations', 'status_changes', 'retake_applications', 'grade_reviews', 'topic_applications',
+                 'classroom_borrow_records', 'users', 'graduation_topics')
 def get_statistics():
     """获取统计数据"""
     if not check_admin():
         return jsonify({'success': False, 'message': '无权访问'}), 403
     
+    return jsonify({'success': True, 'data': db.get_statistics()})
+
+
+@admin_bp.route('/api/admin/analytics/gpa', methods=['GET'])
+@conditional_get('students', 'courses', 'schedules', 'course_selections', 'grades', 'users')
+def get_gpa_analytics():
+    """各班级或专业的绩点与成绩分布
+    
+    by 为 class（默认）或 major，可选 semester；带 name 时返回该班级（专业）的统计与按名次排列的学生，
+    学生按 page、page_size（默认 50）分页
+    """
+    if not check_admin():
+        return jsonify({'success': False, 'message': '无权访问'}), 403
+    
+    by = request.args.get('by', 'class')
+    if by not in ('class', 'major'):
+        return jsonify({'success': False, 'message': '分组方式只能为 class 或 major'}), 400
+    cohorts = db.get_grade_analytics(request.args.get('semester') or None)
+    name = request.args.get('name')
+    if not name:
+        return jsonify({'success': True, 'data': cohorts.cohorts(by)})
+    
+    summary = cohorts.cohort(by, name)
+    if summary is None:
+        return jsonify({'success': False, 'message': '班级或专业不存在'}), 404
+    page = request.args.get('page', 1, type=int)
+    page_size = request.args.get('page_size', 50, type=int)
+    if page < 1 or not 1 <= page_size <= 200:
+        return jsonify({'success': False, 'message': '分页参数无效'}), 400
+    
+    members = cohorts.members(by, name, (page - 1) * page_size, page_size)
+    for member in members:
+        student = db.get_student_by_id(member['student_id'])
+        user = db.get_user_by_id(student['user_id']) if student else None
+        member['student_no'] = student['student_no'] if student else ''
+        member['student_name'] = user['name'] if user else ''
+    
     return jsonify({
         'success': True,
-        'data': {
-            'student_count': len(db.students),
-            'teacher_count': len(db.teachers),
-            'course_count': len(db.courses),
-            'classroom_count': len(db.classrooms),
-            'pending_approvals': len([a for a in db.get_all_approvals() if a['status'] == 'pending'])
-        }
+        'data': {**summary, 'members': members},
+        'page': page,
+        'page_size': page_size
     })
+
+
+@admin_bp.route('/api/admin/cache-stats', methods=['GET'])
+def get_cache_stats():
+    """获取查询缓存的命中统计"""
+    if not check_admin():
+        return jsonify({'success': False, 'message': '无权访问'}), 403
+    
+    cache = db.query_cache
+    if cache is None:
+        return jsonify({'success': True, 'data': {'enabled': False}})
+    
+    return jsonify({'success': True, 'data': {'enabled': True, **cache.stats()}})
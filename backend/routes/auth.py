@@ -4,6 +4,7 @@
 
 from flask import Blueprint, request, jsonify, session
 from models.models import db
+from routes.conditional import conditional_get
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -74,6 +75,7 @@ def logout():
 
 
 @auth_bp.route('/api/user/info', methods=['GET'])
+@conditional_get('users', 'students', 'teachers')
 def get_user_info():
     """获取当前用户信息"""
     user_id = session.get('user_id')
@@ -0,0 +1,54 @@
+"""
+条件 GET
+按接口所依赖数据表的版本号计算强 ETag，请求头 If-None-Match 命中时直接返回 304，
+不执行任何关联查询与序列化；浏览器据此复用本地缓存的响应
+"""
+
+import functools
+import hashlib
+import os
+
+from flask import current_app, make_response, request, session
+from models.models import db
+
+
+# 进程启动时生成，避免重启后版本号从头计数时与旧 ETag 相撞
+_EPOCH = os.urandom(8).hex()
+
+# 响应与当前登录用户相关，只允许浏览器私有缓存，且每次使用前都要用 ETag 重新验证
+CACHE_CONTROL = 'private, no-cache'
+
+
+def conditional_get(*table_names):
+    """为 GET 接口加上 ETag / 304 支持，table_names 为响应所依赖的数据表
+
+    ETag 由数据库实例、依赖表版本、当前会话用户与请求路径（含查询参数）计算得出。
+    数据库不提供版本号（SQL 后端）时不做处理。非 200 响应标记为不可缓存。
+    """
+    def decorate(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            # 版本号须在执行视图之前读取，并发写入最多使响应比 ETag 更新，不会把旧数据标成新版本
+            versions = db.table_versions(table_names)
+            if versions is None:
+                return view(*args, **kwargs)
+            etag = _etag(versions)
+            if session.get('user_id') and request.if_none_match.contains(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    response.headers['Cache-Control'] = 'no-store'
+                    return response
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = CACHE_CONTROL
+            response.vary.add('Cookie')
+            return response
+        return wrapper
+    return decorate
+
+
+def _etag(versions):
+    key = repr((_EPOCH, id(db.target), versions, session.get('user_id'), session.get('role'),
+                request.path, request.query_string))
+    return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
@@ -3,7 +3,9 @@
 """
 
 from flask import Blueprint, request, jsonify, session
+from models.enrollment import CONFLICT, DUPLICATE, FULL, NOT_FOUND
 from models.models import db
+from routes.conditional import conditional_get
 
 student_bp = Blueprint('student', __name__)
 
@@ -17,6 +19,7 @@ def get_current_student():
 
 
 @student_bp.route('/api/student/profile', methods=['GET'])
+@conditional_get('users', 'students')
 def get_profile():
     """获取个人信息与学籍状态"""
     student = get_current_student()
@@ -45,6 +48,7 @@ def get_profile():
 
 
 @student_bp.route('/api/student/schedule', methods=['GET'])
+@conditional_get('students', 'course_selections', 'schedules', 'courses', 'teachers', 'users')
 def get_schedule():
     """获取学期课表"""
     student = get_current_student()
@@ -75,12 +79,16 @@ def get_schedule():
 
 
 @student_bp.route('/api/student/courses', methods=['GET'])
+@conditional_get('schedules', 'courses', 'teachers', 'users', 'students', 'course_selections')
 def get_available_courses():
-    """获取可选课程列表"""
+    """获取可选课程列表，学生登录时标出与已选课程时间冲突的排课"""
     semester = request.args.get('semester', '2024-2025-1')
     
     courses = db.get_available_courses(semester)
     
+    student = get_current_student()
+    conflicts = db.get_timetable_conflicts(student['id'], courses) if student else set()
+    
     result = []
     for c in courses:
         result.append({
@@ -95,7 +103,8 @@ def get_available_courses():
             'start_period': c['start_period'],
             'end_period': c['end_period'],
             'classroom': c['classroom'],
-            'weeks': c['weeks']
+            'weeks': c['weeks'],
+            'conflict': c['id'] in conflicts
         })
     
     return jsonify({'success': True, 'data': result})
@@ -114,20 +123,19 @@ def select_course():
     if not schedule_id:
         return jsonify({'success': False, 'message': '请选择课程'}), 400
     
-    # 检查是否已选
-    for selection in db.course_selections:
-        if selection['student_id'] == student['id'] and selection['schedule_id'] == schedule_id:
-            return jsonify({'success': False, 'message': '已选择该课程'}), 400
-    
-    # 添加选课记录
-    new_id = max(s['id'] for s in db.course_selections) + 1
-    db.course_selections.append({
-        'id': new_id,
-        'student_id': student['id'],
-        'schedule_id': schedule_id,
-        'status': 'confirmed',
-        'selected_at': '2024-12-14'
-    })
+    # 选课引擎负责去重、时间冲突与容量检查，同一排课的并发选课不会超员
+    result, selection = db.enroll(student['id'], schedule_id, '2024-12-14')
+    if result == DUPLICATE:
+        return jsonify({'success': False, 'message': '已选择该课程'}), 400
+    if result == CONFLICT:
+        schedule = db.get_schedule_by_id(selection['schedule_id'])
+        course = db.get_course_by_id(schedule['course_id']) if schedule else None
+        name = course['name'] if course else ''
+        return jsonify({'success': False, 'message': f'与已选课程「{name}」上课时间冲突'}), 400
+    if result == FULL:
+        return jsonify({'success': False, 'message': '课程容量已满'}), 400
+    if result == NOT_FOUND:
+        return jsonify({'success': False, 'message': '排课不存在'}), 404
     
     return jsonify({'success': True, 'message': '选课成功'})
 
@@ -142,15 +150,14 @@ def drop_course():
     data = request.get_json()
     schedule_id = data.get('schedule_id')
     
-    for i, selection in enumerate(db.course_selections):
-        if selection['student_id'] == student['id'] and selection['schedule_id'] == schedule_id:
-            db.course_selections.pop(i)
-            return jsonify({'success': True, 'message': '退课成功'})
+    if db.drop_selection(student['id'], schedule_id):
+        return jsonify({'success': True, 'message': '退课成功'})
     
     return jsonify({'success': False, 'message': '未找到选课记录'}), 404
 
 
 @student_bp.route('/api/student/grades', methods=['GET'])
+@conditional_get('students', 'course_selections', 'grades', 'schedules', 'courses')
 def get_grades():
     """获取成绩列表"""
     student = get_current_student()
@@ -172,27 +179,46 @@ def get_grades():
             'status': g['status']
         })
     
-    # 计算平均绩点
-    if result:
-        total_credits = sum(g['credit'] for g in result)
-        total_gpa_points = sum(g['credit'] * g['gpa'] for g in result)
-        avg_gpa = round(total_gpa_points / total_credits, 2) if total_credits > 0 else 0
-    else:
-        avg_gpa = 0
-        total_credits = 0
+    # 平均绩点与班级、专业排名取自全校一次计算的结果
+    ranking = db.get_grade_analytics().student(student['id'])
     
     return jsonify({
         'success': True,
         'data': {
             'grades': result,
             'summary': {
-                'total_credits': total_credits,
-                'avg_gpa': avg_gpa
+                'total_credits': ranking['credits'] if ranking else 0,
+                'avg_gpa': ranking['gpa'] if ranking else 0,
+                'class': ranking['class'] if ranking else None,
+                'major': ranking['major'] if ranking else None
             }
         }
     })
 
 
+@student_bp.route('/api/student/ranking', methods=['GET'])
+@conditional_get('students', 'course_selections', 'grades', 'schedules', 'courses')
+def get_ranking():
+    """加权平均绩点及在班级、专业内的名次，可选 semester 只统计该学期"""
+    student = get_current_student()
+    if not student:
+        return jsonify({'success': False, 'message': '未登录或非学生用户'}), 401
+    
+    cohorts = db.get_grade_analytics(request.args.get('semester') or None)
+    ranking = cohorts.student(student['id'])
+    if ranking is None:
+        return jsonify({'success': False, 'message': '学生不存在'}), 404
+    
+    return jsonify({
+        'success': True,
+        'data': {
+            **ranking,
+            'class_distribution': cohorts.cohort('class', ranking['class']['name']),
+            'major_distribution': cohorts.cohort('major', ranking['major']['name'])
+        }
+    })
+
+
 @student_bp.route('/api/student/grade-review', methods=['POST'])
 def submit_grade_review():
     """提交成绩复核申请"""
@@ -207,25 +233,25 @@ def submit_grade_review():
     if not grade_id or not reason:
         return jsonify({'success': False, 'message': '请填写完整信息'}), 400
     
-    # 检查是否已申请
-    for review in db.grade_reviews:
-        if review['grade_id'] == grade_id and review['status'] == 'pending':
-            return jsonify({'success': False, 'message': '该成绩已有待处理的复核申请'}), 400
-    
-    new_id = max(r['id'] for r in db.grade_reviews) + 1 if db.grade_reviews else 1
-    db.grade_reviews.append({
-        'id': new_id,
-        'grade_id': grade_id,
-        'student_id': student['id'],
-        'reason': reason,
-        'status': 'pending',
-        'created_at': '2024-12-14'
-    })
+    with db.row_lock('grade', grade_id):
+        # 检查是否已申请
+        for review in db.grade_reviews.find('grade_id', grade_id):
+            if review['status'] == 'pending':
+                return jsonify({'success': False, 'message': '该成绩已有待处理的复核申请'}), 400
+        
+        db.grade_reviews.insert({
+            'grade_id': grade_id,
+            'student_id': student['id'],
+            'reason': reason,
+            'status': 'pending',
+            'created_at': '2024-12-14'
+        })
     
     return jsonify({'success': True, 'message': '复核申请已提交'})
 
 
 @student_bp.route('/api/student/evaluations', methods=['GET'])
+@conditional_get('students', 'evaluations', 'course_selections', 'schedules', 'courses', 'teachers', 'users')
 def get_evaluations():
     """获取未完成评教列表"""
     student = get_current_student()
@@ -262,17 +288,19 @@ def submit_evaluation():
     if not evaluation_id or not rating:
         return jsonify({'success': False, 'message': '请填写评分'}), 400
     
-    for evaluation in db.evaluations:
-        if evaluation['id'] == evaluation_id:
-            evaluation['rating'] = rating
-            evaluation['comment'] = comment
-            evaluation['status'] = 'completed'
-            return jsonify({'success': True, 'message': '评教提交成功'})
+    evaluation = db.evaluations.update(evaluation_id, {
+        'rating': rating,
+        'comment': comment,
+        'status': 'completed'
+    })
+    if evaluation:
+        return jsonify({'success': True, 'message': '评教提交成功'})
     
     return jsonify({'success': False, 'message': '评教记录不存在'}), 404
 
 
 @student_bp.route('/api/student/status-changes', methods=['GET'])
+@conditional_get('students', 'status_changes')
 def get_status_changes():
     """获取学籍异动申请列表"""
     student = get_current_student()
@@ -280,20 +308,19 @@ def get_status_changes():
         return jsonify({'success': False, 'message': '未登录或非学生用户'}), 401
     
     result = []
-    for item in db.status_changes:
-        if item['student_id'] == student['id']:
-            result.append({
-                'id': item['id'],
-                'type': item['type'],
-                'reason': item['reason'],
-                'status': item['status'],
-                'status_text': {
-                    'pending': '待审批',
-                    'approved': '已通过',
-                    'rejected': '已拒绝'
-                }.get(item['status'], item['status']),
-                'created_at': item['created_at']
-            })
+    for item in db.status_changes.find('student_id', student['id']):
+        result.append({
+            'id': item['id'],
+            'type': item['type'],
+            'reason': item['reason'],
+            'status': item['status'],
+            'status_text': {
+                'pending': '待审批',
+                'approved': '已通过',
+                'rejected': '已拒绝'
+            }.get(item['status'], item['status']),
+            'created_at': item['created_at']
+        })
     
     return jsonify({'success': True, 'data': result})
 
@@ -312,9 +339,7 @@ def submit_status_change():
     if not change_type or not reason:
         return jsonify({'success': False, 'message': '请填写完整信息'}), 400
     
-    new_id = max(s['id'] for s in db.status_changes) + 1 if db.status_changes else 1
-    db.status_changes.append({
-        'id': new_id,
+    db.status_changes.insert({
         'student_id': student['id'],
         'type': change_type,
         'reason': reason,
@@ -326,6 +351,7 @@ def submit_status_change():
 
 
 @student_bp.route('/api/student/retakes', methods=['GET'])
+@conditional_get('students', 'retake_applications', 'courses')
 def get_retakes():
     """获取重修申请列表"""
     student = get_current_student()
@@ -333,22 +359,21 @@ def get_retakes():
         return jsonify({'success': False, 'message': '未登录或非学生用户'}), 401
     
     result = []
-    for item in db.retake_applications:
-        if item['student_id'] == student['id']:
-            course = db.get_course_by_id(item['course_id'])
-            result.append({
-                'id': item['id'],
-                'course_name': course['name'] if course else '',
-                'course_code': course['code'] if course else '',
-                'reason': item['reason'],
-                'status': item['status'],
-                'status_text': {
-                    'pending': '待审批',
-                    'approved': '已通过',
-                    'rejected': '已拒绝'
-                }.get(item['status'], item['status']),
-                'created_at': item['created_at']
-            })
+    for item in db.retake_applications.find('student_id', student['id']):
+        course = db.get_course_by_id(item['course_id'])
+        result.append({
+            'id': item['id'],
+            'course_name': course['name'] if course else '',
+            'course_code': course['code'] if course else '',
+            'reason': item['reason'],
+            'status': item['status'],
+            'status_text': {
+                'pending': '待审批',
+                'approved': '已通过',
+                'rejected': '已拒绝'
+            }.get(item['status'], item['status']),
+            'created_at': item['created_at']
+        })
     
     return jsonify({'success': True, 'data': result})
 
@@ -367,9 +392,7 @@ def submit_retake():
     if not course_id or not reason:
         return jsonify({'success': False, 'message': '请填写完整信息'}), 400
     
-    new_id = max(r['id'] for r in db.retake_applications) + 1 if db.retake_applications else 1
-    db.retake_applications.append({
-        'id': new_id,
+    db.retake_applications.insert({
         'student_id': student['id'],
         'course_id': course_id,
         'reason': reason,
@@ -381,21 +404,23 @@ def submit_retake():
 
 
 @student_bp.route('/api/student/topics', methods=['GET'])
+@conditional_get('students', 'topic_applications', 'graduation_topics', 'teachers', 'users')
 def get_topics():
     """获取毕设课题列表"""
     student = get_current_student()
     if not student:
         return jsonify({'success': False, 'message': '未登录或非学生用户'}), 401
     
+    # 已申请的课题
+    applied_topic_ids = {app['topic_id'] for app in db.topic_applications.find('student_id', student['id'])}
+    
     result = []
     for topic in db.graduation_topics:
         if topic['status'] == 'open':
             teacher = db.get_teacher_by_id(topic['teacher_id'])
             teacher_user = db.get_user_by_id(teacher['user_id']) if teacher else None
             
-            # 检查是否已申请
-            applied = any(app['student_id'] == student['id'] and app['topic_id'] == topic['id'] 
-                         for app in db.topic_applications)
+            applied = topic['id'] in applied_topic_ids
             
             result.append({
                 'id': topic['id'],
@@ -423,24 +448,24 @@ def apply_topic():
     if not topic_id:
         return jsonify({'success': False, 'message': '请选择课题'}), 400
     
-    # 检查是否已申请
-    for app in db.topic_applications:
-        if app['student_id'] == student['id'] and app['topic_id'] == topic_id:
-            return jsonify({'success': False, 'message': '已申请该课题'}), 400
-    
-    new_id = max(a['id'] for a in db.topic_applications) + 1 if db.topic_applications else 1
-    db.topic_applications.append({
-        'id': new_id,
-        'student_id': student['id'],
-        'topic_id': topic_id,
-        'status': 'pending',
-        'created_at': '2024-12-14'
-    })
+    with db.row_lock('student', student['id']):
+        # 检查是否已申请
+        for app in db.topic_applications.find('student_id', student['id']):
+            if app['topic_id'] == topic_id:
+                return jsonify({'success': False, 'message': '已申请该课题'}), 400
+        
+        db.topic_applications.insert({
+            'student_id': student['id'],
+            'topic_id': topic_id,
+            'status': 'pending',
+            'created_at': '2024-12-14'
+        })
     
     return jsonify({'success': True, 'message': '课题申请已提交'})
 
 
 @student_bp.route('/api/student/my-topic', methods=['GET'])
+@conditional_get('students', 'instructor_relations', 'topic_applications', 'graduation_topics', 'teachers', 'users')
 def get_my_topic():
     """获取我的毕设课题"""
     student = get_current_student()
@@ -448,24 +473,24 @@ def get_my_topic():
         return jsonify({'success': False, 'message': '未登录或非学生用户'}), 401
     
     # 查找已确认的指导关系
-    for relation in db.instructor_relations:
-        if relation['student_id'] == student['id']:
-            topic = db.get_topic_by_id(relation['topic_id'])
-            teacher = db.get_teacher_by_id(relation['teacher_id'])
-            teacher_user = db.get_user_by_id(teacher['user_id']) if teacher else None
-            
-            return jsonify({
-                'success': True,
-                'data': {
-                    'topic': topic,
-                    'teacher_name': teacher_user['name'] if teacher_user else '',
-                    'status': relation['status']
-                }
-            })
+    relation = db.instructor_relations.find_one('student_id', student['id'])
+    if relation:
+        topic = db.get_topic_by_id(relation['topic_id'])
+        teacher = db.get_teacher_by_id(relation['teacher_id'])
+        teacher_user = db.get_user_by_id(teacher['user_id']) if teacher else None
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'topic': topic,
+                'teacher_name': teacher_user['name'] if teacher_user else '',
+                'status': relation['status']
+            }
+        })
     
     # 查找待审批的申请
-    for app in db.topic_applications:
-        if app['student_id'] == student['id'] and app['status'] == 'pending':
+    for app in db.topic_applications.find('student_id', student['id']):
+        if app['status'] == 'pending':
             topic = db.get_topic_by_id(app['topic_id'])
             teacher = db.get_teacher_by_id(topic['teacher_id']) if topic else None
             teacher_user = db.get_user_by_id(teacher['user_id']) if teacher else None
@@ -483,6 +508,7 @@ def get_my_topic():
 
 
 @student_bp.route('/api/student/documents', methods=['GET'])
+@conditional_get('students', 'process_documents')
 def get_documents():
     """获取过程文档列表"""
     student = get_current_student()
@@ -490,15 +516,14 @@ def get_documents():
         return jsonify({'success': False, 'message': '未登录或非学生用户'}), 401
     
     result = []
-    for doc in db.process_documents:
-        if doc['student_id'] == student['id']:
-            result.append({
-                'id': doc['id'],
-                'type': doc['type'],
-                'file_name': doc['file_name'],
-                'status': doc['status'],
-                'submitted_at': doc['submitted_at']
-            })
+    for doc in db.process_documents.find('student_id', student['id']):
+        result.append({
+            'id': doc['id'],
+            'type': doc['type'],
+            'file_name': doc['file_name'],
+            'status': doc['status'],
+            'submitted_at': doc['submitted_at']
+        })
     
     return jsonify({'success': True, 'data': result})
 
@@ -517,9 +542,7 @@ def submit_document():
     if not doc_type or not file_name:
         return jsonify({'success': False, 'message': '请填写完整信息'}), 400
     
-    new_id = max(d['id'] for d in db.process_documents) + 1 if db.process_documents else 1
-    db.process_documents.append({
-        'id': new_id,
+    db.process_documents.insert({
         'student_id': student['id'],
         'type': doc_type,
         'file_name': file_name,
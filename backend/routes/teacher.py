@@ -2,8 +2,11 @@
 教师端 API 路由
 """
 
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, current_app, request, jsonify, session
+from models.grading import check_score, score_to_gpa
 from models.models import db
+from models.roster import import_grades, read_rows
+from routes.conditional import conditional_get
 
 teacher_bp = Blueprint('teacher', __name__)
 
@@ -17,6 +20,7 @@ def get_current_teacher():
 
 
 @teacher_bp.route('/api/teacher/profile', methods=['GET'])
+@conditional_get('users', 'teachers')
 def get_profile():
     """获取教师个人信息"""
     teacher = get_current_teacher()
@@ -37,6 +41,7 @@ def get_profile():
 
 
 @teacher_bp.route('/api/teacher/schedule', methods=['GET'])
+@conditional_get('teachers', 'courses', 'schedules')
 def get_schedule():
     """获取我的排课"""
     teacher = get_current_teacher()
@@ -66,6 +71,7 @@ def get_schedule():
 
 
 @teacher_bp.route('/api/teacher/courses', methods=['GET'])
+@conditional_get('teachers', 'courses')
 def get_courses():
     """获取我教授的课程列表"""
     teacher = get_current_teacher()
@@ -73,22 +79,22 @@ def get_courses():
         return jsonify({'success': False, 'message': '未登录或非教师用户'}), 401
     
     result = []
-    for course in db.courses:
-        if course['teacher_id'] == teacher['id']:
-            result.append({
-                'id': course['id'],
-                'code': course['code'],
-                'name': course['name'],
-                'credit': course['credit'],
-                'hours': course['hours']
-            })
+    for course in db.courses.find('teacher_id', teacher['id']):
+        result.append({
+            'id': course['id'],
+            'code': course['code'],
+            'name': course['name'],
+            'credit': course['credit'],
+            'hours': course['hours']
+        })
     
     return jsonify({'success': True, 'data': result})
 
 
 @teacher_bp.route('/api/teacher/students/<int:schedule_id>', methods=['GET'])
+@conditional_get('teachers', 'schedules', 'courses', 'course_selections', 'students', 'users', 'grades')
 def get_course_students(schedule_id):
-    """获取课程学生列表及成绩"""
+    """获取课程学生列表及成绩，并附成绩统计（均值、中位数、标准差、及格率、10 分一段的分布）"""
     teacher = get_current_teacher()
     if not teacher:
         return jsonify({'success': False, 'message': '未登录或非教师用户'}), 401
@@ -120,7 +126,8 @@ def get_course_students(schedule_id):
         'success': True,
         'data': {
             'course': course,
-            'students': result
+            'students': result,
+            'statistics': db.get_course_grade_statistics(schedule_id)
         }
     })
 
@@ -132,62 +139,68 @@ def enter_grades():
     if not teacher:
         return jsonify({'success': False, 'message': '未登录或非教师用户'}), 401
     
-    data = request.get_json()
+    data = request.get_json() or {}
     grades_data = data.get('grades', [])
     
     if not grades_data:
         return jsonify({'success': False, 'message': '请提供成绩数据'}), 400
+    if not isinstance(grades_data, list):
+        return jsonify({'success': False, 'message': '成绩数据格式错误'}), 400
+    
+    # 整批校验后在一个事务中写入，任一条有误则全部不写入
+    result = db.upsert_grades(teacher['id'], grades_data)
+    if result['errors']:
+        first = result['errors'][0]
+        return jsonify({
+            'success': False,
+            'message': f"第 {first['index'] + 1} 条成绩有误：{first['message']}",
+            'errors': result['errors']
+        }), 400
     
-    for grade_item in grades_data:
-        selection_id = grade_item.get('selection_id')
-        score = grade_item.get('score')
-        
-        if selection_id is None or score is None:
-            continue
-        
-        # 计算 GPA
-        if score >= 90:
-            gpa = 4.0
-        elif score >= 85:
-            gpa = 3.7
-        elif score >= 80:
-            gpa = 3.3
-        elif score >= 75:
-            gpa = 3.0
-        elif score >= 70:
-            gpa = 2.7
-        elif score >= 65:
-            gpa = 2.3
-        elif score >= 60:
-            gpa = 2.0
-        else:
-            gpa = 0.0
-        
-        # 查找现有成绩记录
-        found = False
-        for grade in db.grades:
-            if grade['selection_id'] == selection_id:
-                grade['score'] = score
-                grade['gpa'] = gpa
-                grade['status'] = 'final'
-                found = True
-                break
-        
-        # 如果没有找到，创建新记录
-        if not found:
-            new_id = max(g['id'] for g in db.grades) + 1 if db.grades else 1
-            db.grades.append({
-                'id': new_id,
-                'selection_id': selection_id,
-                'score': score,
-                'gpa': gpa,
-                'status': 'final'
-            })
+    return jsonify({
+        'success': True,
+        'message': f"成绩录入成功（新增 {result['inserted']} 条，更新 {result['updated']} 条）",
+        'data': {'inserted': result['inserted'], 'updated': result['updated']}
+    })
+
+
+@teacher_bp.route('/api/teacher/grades/import/<int:schedule_id>', methods=['POST'])
+def upload_grades(schedule_id):
+    """上传成绩单（CSV / XLSX，表单字段 file）导入课程成绩
+    
+    按学号匹配选课学生，合格的行分批写入，返回导入统计与出错行的原因
+    """
+    teacher = get_current_teacher()
+    if not teacher:
+        return jsonify({'success': False, 'message': '未登录或非教师用户'}), 401
+    
+    schedule = db.get_schedule_by_id(schedule_id)
+    if not schedule:
+        return jsonify({'success': False, 'message': '课程不存在'}), 404
+    course = db.get_course_by_id(schedule['course_id'])
+    if not course or course['teacher_id'] != teacher['id']:
+        return jsonify({'success': False, 'message': '无权访问该课程'}), 403
     
-    return jsonify({'success': True, 'message': '成绩录入成功'})
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return jsonify({'success': False, 'message': '请上传成绩单文件'}), 400
+    
+    try:
+        result = import_grades(db, teacher['id'], schedule_id, read_rows(upload.stream, upload.filename),
+                               chunk_size=current_app.config['GRADE_IMPORT_CHUNK'])
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    message = f"已导入 {result['imported']} 条成绩"
+    if result['error_count']:
+        message += f"，{result['error_count']} 行有误未导入"
+    if result['skipped']:
+        message += f"，{result['skipped']} 行成绩为空已跳过"
+    return jsonify({'success': True, 'message': message, 'data': result})
 
 
 @teacher_bp.route('/api/teacher/reviews', methods=['GET'])
+@conditional_get('teachers', 'grade_reviews', 'grades', 'course_selections', 'schedules', 'courses', 'students', 'users')
 def get_reviews():
     """获取成绩复核申请列表"""
     teacher = get_current_teacher()
@@ -224,42 +237,27 @@ def process_review(review_id):
     
     if action not in ['approve', 'reject']:
         return jsonify({'success': False, 'message': '无效的操作'}), 400
+    error = check_score(new_score) if action == 'approve' and new_score is not None else None
+    if error:
+        return jsonify({'success': False, 'message': error}), 400
     
-    for review in db.grade_reviews:
-        if review['id'] == review_id:
+    review = db.grade_reviews.get(review_id)
+    if review:
+        with db.transaction('grade_reviews', 'grades'):
             if action == 'approve' and new_score is not None:
-                # 更新成绩
-                for grade in db.grades:
-                    if grade['id'] == review['grade_id']:
-                        grade['score'] = new_score
-                        # 重新计算 GPA
-                        if new_score >= 90:
-                            grade['gpa'] = 4.0
-                        elif new_score >= 85:
-                            grade['gpa'] = 3.7
-                        elif new_score >= 80:
-                            grade['gpa'] = 3.3
-                        elif new_score >= 75:
-                            grade['gpa'] = 3.0
-                        elif new_score >= 70:
-                            grade['gpa'] = 2.7
-                        elif new_score >= 65:
-                            grade['gpa'] = 2.3
-                        elif new_score >= 60:
-                            grade['gpa'] = 2.0
-                        else:
-                            grade['gpa'] = 0.0
-                        break
-                review['status'] = 'approved'
+                # 更新成绩，重新计算 GPA
+                db.grades.update(review['grade_id'], {'score': new_score, 'gpa': score_to_gpa(new_score)})
+                db.grade_reviews.update(review_id, {'status': 'approved'})
             else:
-                review['status'] = 'rejected'
-            
-            return jsonify({'success': True, 'message': '复核处理完成'})
+                db.grade_reviews.update(review_id, {'status': 'rejected'})
+        
+        return jsonify({'success': True, 'message': '复核处理完成'})
     
     return jsonify({'success': False, 'message': '复核申请不存在'}), 404
 
 
 @teacher_bp.route('/api/teacher/topics', methods=['GET'])
+@conditional_get('teachers', 'graduation_topics', 'topic_applications')
 def get_topics():
     """获取毕设课题列表"""
     teacher = get_current_teacher()
@@ -286,9 +284,7 @@ def create_topic():
     if not title or not description:
         return jsonify({'success': False, 'message': '请填写完整信息'}), 400
     
-    new_id = max(t['id'] for t in db.graduation_topics) + 1 if db.graduation_topics else 1
-    db.graduation_topics.append({
-        'id': new_id,
+    db.graduation_topics.insert({
         'teacher_id': teacher['id'],
         'title': title,
         'description': description,
@@ -308,23 +304,19 @@ def update_topic(topic_id):
     
     data = request.get_json()
     
-    for topic in db.graduation_topics:
-        if topic['id'] == topic_id and topic['teacher_id'] == teacher['id']:
-            if 'title' in data:
-                topic['title'] = data['title']
-            if 'description' in data:
-                topic['description'] = data['description']
-            if 'max_students' in data:
-                topic['max_students'] = data['max_students']
-            if 'status' in data:
-                topic['status'] = data['status']
-            
-            return jsonify({'success': True, 'message': '课题更新成功'})
+    topic = db.get_topic_by_id(topic_id)
+    if topic and topic['teacher_id'] == teacher['id']:
+        changes = {field: data[field] for field in ('title', 'description', 'max_students', 'status')
+                   if field in data}
+        db.graduation_topics.update(topic_id, changes)
+        
+        return jsonify({'success': True, 'message': '课题更新成功'})
     
     return jsonify({'success': False, 'message': '课题不存在或无权修改'}), 404
 
 
 @teacher_bp.route('/api/teacher/topic-applications', methods=['GET'])
+@conditional_get('teachers', 'graduation_topics', 'topic_applications', 'students', 'users')
 def get_topic_applications():
     """获取课题申请列表"""
     teacher = get_current_teacher()
@@ -332,9 +324,8 @@ def get_topic_applications():
         return jsonify({'success': False, 'message': '未登录或非教师用户'}), 401
     
     result = []
-    for app in db.topic_applications:
-        topic = db.get_topic_by_id(app['topic_id'])
-        if topic and topic['teacher_id'] == teacher['id']:
+    for topic in db.graduation_topics.find('teacher_id', teacher['id']):
+        for app in db.topic_applications.find('topic_id', topic['id']):
             student = db.get_student_by_id(app['student_id'])
             user = db.get_user_by_id(student['user_id']) if student else None
             result.append({
@@ -345,6 +336,7 @@ def get_topic_applications():
                 'status': app['status'],
                 'created_at': app['created_at']
             })
+    result.sort(key=lambda r: r['id'])
     
     return jsonify({'success': True, 'data': result})
 
@@ -362,32 +354,32 @@ def process_topic_application(app_id):
     if action not in ['approve', 'reject']:
         return jsonify({'success': False, 'message': '无效的操作'}), 400
     
-    for app in db.topic_applications:
-        if app['id'] == app_id:
-            topic = db.get_topic_by_id(app['topic_id'])
-            if not topic or topic['teacher_id'] != teacher['id']:
-                return jsonify({'success': False, 'message': '无权处理该申请'}), 403
-            
+    app = db.topic_applications.get(app_id)
+    if app:
+        topic = db.get_topic_by_id(app['topic_id'])
+        if not topic or topic['teacher_id'] != teacher['id']:
+            return jsonify({'success': False, 'message': '无权处理该申请'}), 403
+        
+        with db.transaction('topic_applications', 'instructor_relations'):
             if action == 'approve':
-                app['status'] = 'approved'
+                db.topic_applications.update(app_id, {'status': 'approved'})
                 # 创建指导关系
-                new_id = max(r['id'] for r in db.instructor_relations) + 1 if db.instructor_relations else 1
-                db.instructor_relations.append({
-                    'id': new_id,
+                db.instructor_relations.insert({
                     'student_id': app['student_id'],
                     'teacher_id': teacher['id'],
                     'topic_id': app['topic_id'],
                     'status': 'confirmed'
                 })
             else:
-                app['status'] = 'rejected'
-            
-            return jsonify({'success': True, 'message': '申请处理完成'})
+                db.topic_applications.update(app_id, {'status': 'rejected'})
+        
+        return jsonify({'success': True, 'message': '申请处理完成'})
     
     return jsonify({'success': False, 'message': '申请不存在'}), 404
 
 
 @teacher_bp.route('/api/teacher/students-thesis', methods=['GET'])
+@conditional_get('teachers', 'instructor_relations', 'students', 'users', 'graduation_topics', 'process_documents')
 def get_thesis_students():
     """获取指导的学生列表"""
     teacher = get_current_teacher()
@@ -399,7 +391,7 @@ def get_thesis_students():
     result = []
     for s in students:
         # 获取学生的过程文档
-        docs = [d for d in db.process_documents if d['student_id'] == s['student']['id']] if s['student'] else []
+        docs = db.process_documents.find('student_id', s['student']['id']) if s['student'] else []
         
         result.append({
             'student_id': s['student']['id'] if s['student'] else None,
@@ -414,6 +406,7 @@ def get_thesis_students():
 
 
 @teacher_bp.route('/api/teacher/exams', methods=['GET'])
+@conditional_get('teachers', 'invigilator_assignments', 'exam_arrangements', 'schedules', 'courses')
 def get_exams():
     """获取监考安排"""
     teacher = get_current_teacher()
@@ -61,6 +61,9 @@ export const studentApi = {
     getGrades() {
         return api.get('/student/grades')
     },
+    getRanking(semester) {
+        return api.get('/student/ranking', { params: { semester } })
+    },
     submitGradeReview(gradeId, reason) {
         return api.post('/student/grade-review', { grade_id: gradeId, reason })
     },
@@ -117,6 +120,11 @@ export const teacherApi = {
     enterGrades(grades) {
         return api.post('/teacher/grades', { grades })
     },
+    importGrades(scheduleId, file) {
+        const form = new FormData()
+        form.append('file', file)
+        return api.post(`/teacher/grades/import/${scheduleId}`, form, { timeout: 120000 })
+    },
     getReviews() {
         return api.get('/teacher/reviews')
     },
@@ -152,6 +160,9 @@ export const adminApi = {
     getStatistics() {
         return api.get('/admin/statistics')
     },
+    getGpaAnalytics(params) {
+        return api.get('/admin/analytics/gpa', { params })
+    },
     // 学生管理
     getStudents() {
         return api.get('/admin/students')
@@ -199,6 +210,10 @@ export const adminApi = {
     updateSchedule(scheduleId, data) {
         return api.put(`/admin/schedule/${scheduleId}`, data)
     },
+    autoSchedule(data) {
+        // 求解可能耗时较长，不受默认超时限制
+        return api.post('/admin/schedule/auto', data, { timeout: 300000 })
+    },
     // 考试安排
     getExams() {
         return api.get('/admin/exams')
@@ -206,6 +221,13 @@ export const adminApi = {
     createExam(data) {
         return api.post('/admin/exams', data)
     },
+    autoScheduleExams(data) {
+        // 求解可能耗时较长，不受默认超时限制
+        return api.post('/admin/exams/auto', data, { timeout: 300000 })
+    },
+    getExamConflicts(params) {
+        return api.get('/admin/exams/conflicts', { params })
+    },
     // 监考安排
     getInvigilators() {
         return api.get('/admin/invigilators')
@@ -213,6 +235,12 @@ export const adminApi = {
     createInvigilator(data) {
         return api.post('/admin/invigilators', data)
     },
+    autoAssignInvigilators(data) {
+        return api.post('/admin/invigilators/auto', data)
+    },
+    getJob(id) {
+        return api.get(`/admin/jobs/${id}`)
+    },
     // 借教室审批
     getClassroomBorrow() {
         return api.get('/admin/classroom-borrow')
@@ -220,6 +248,9 @@ export const adminApi = {
     processClassroomBorrow(recordId, action) {
         return api.put(`/admin/classroom-borrow/${recordId}`, { action })
     },
+    getFreeClassrooms(params) {
+        return api.get('/admin/classrooms/free', { params })
+    },
     // 审批中心
     getApprovals() {
         return api.get('/admin/approvals')